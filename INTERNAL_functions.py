@@ -1,89 +1,220 @@
+import os
 import sqlite3 #Imports "sqlite3" giving us the ability to access and change our database
+import screen #Gives us the ability to write a whole page at once
+from card_pool import BUSY_TIMEOUT_MS, get_pool #Gives every function a reused connection instead of a new one each call
+from config2 import Cache, MetricsCollector, RetryPolicy #LRU cache so the same card isn't read from the database over and over
 
 DATABASE = 'DataBase.db' #Defines what I mean by "DATABASE"
 
-def DisplayCards():
-    with sqlite3.connect(DATABASE) as connection: #Connects the function with the database
-        cursor = connection.cursor() #Creates a cursor
-        #Tells the curcor what to get from the database. In this case everything
-        select_query = """
-        SELECT
-            *
-        FROM 'Monster Cards'
-        """
-        cursor.execute(select_query) #Tells the cursor to do "select_query"
-        cards = cursor.fetchall()
-        
-        #Formating the data that the cursor has got from the database
-        print('')
-        print('                         〰〰 CARDS 〰〰')
-        print('╭────┬────────────────┬──────────┬─────────┬───────────┬─────────╮')
-        print('│ ID │ Name           │ Strength │  Speed  │  Stealth  │ Cunning │')
-        print('├────┼────────────────┼──────────┼─────────┼───────────┼─────────┤')
-        for card in cards:
-            print(f"│{card[0]:<4}│{card[1]:<16}│{card[2]:<10}│{card[3]:<9}│{card[4]:<11}│{card[5]:<9}│")
-        print('╰────┴────────────────┴──────────┴─────────┴───────────┴─────────╯')
-        #The ":<4" command tells the code to have 4 characters avalible for use (adds white space in unused characters)
+#The SQL is kept in one place so the connection's statement cache gets the exact same string every time
+PAGE_QUERY = "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" WHERE ID > ? ORDER BY ID LIMIT ?"
+CARD_QUERY = "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" WHERE ID = ?"
+INSERT_QUERY = "INSERT INTO \"Monster Cards\" (name, strength, speed, stealth, cunning) VALUES (?, ?, ?, ?, ?)"
+DELETE_QUERY = "DELETE FROM \"Monster Cards\" WHERE ID = ?"
 
-def EditCards(DATABASE, monstersID, stat, newvalue):
-    stats = {"strength", "speed", "stealth", "cunning"} #Defines what I mean by "stats"
+STATS = ("strength", "speed", "stealth", "cunning") #Defines what I mean by "stats"
+STAT_INDEX = {stat: index for index, stat in enumerate(STATS, start=2)} #Where each stat is in a card's row
+
+PAGE_SIZE = 500 #How many cards are fetched and printed at a time
+
+#Read-through caches, every function that changes a card clears what it made out of date.
+#Changes made by another program can't clear them, the TTL is how long those can go unseen
+CARD_CACHE = Cache(max_size=4096, ttl_seconds=5) #(database, ID) -> card
+SEARCH_CACHE = Cache(max_size=256, ttl_seconds=60) #(database, search) -> cards
+#Timings of every database call, switched on with MONSTARS_TRACE=1 (off it costs well under a microsecond a call)
+METRICS = MetricsCollector(enabled=os.environ.get('MONSTARS_TRACE', '') not in ('', '0'))
+#Card writes are retried when another writer has the database locked, anything else is raised straight away.
+#Every attempt can itself wait BUSY_TIMEOUT_MS for the lock, so no new attempt starts after
+#WRITE_DEADLINE_SECONDS minus that: a write gives up within WRITE_DEADLINE_SECONDS in total
+WRITE_DEADLINE_SECONDS = 10
+WRITE_RETRY = RetryPolicy(max_attempts=10, delay_seconds=0.01, max_delay=0.5,
+                          deadline_seconds=WRITE_DEADLINE_SECONDS - BUSY_TIMEOUT_MS / 1000)
+
+TABLE_TOP = """
+                         〰〰 CARDS 〰〰
+╭────┬────────────────┬──────────┬─────────┬───────────┬─────────╮
+│ ID │ Name           │ Strength │  Speed  │  Stealth  │ Cunning │
+├────┼────────────────┼──────────┼─────────┼───────────┼─────────┤
+"""
+TABLE_BOTTOM = "╰────┴────────────────┴──────────┴─────────┴───────────┴─────────╯\n"
+
+@METRICS.trace('cards.write')
+def WriteCards(DATABASE, work):
+    #Runs work(connection) in one write transaction, the whole transaction is tried again if the database is busy
+    def attempt():
+        with get_pool(DATABASE).transaction(immediate=True) as connect:
+            return work(connect)
+    return WRITE_RETRY.execute(attempt)
+
+def RetryStats():
+    return WRITE_RETRY.stats()
+
+def CardPages(DATABASE, page_size=PAGE_SIZE, start_id=1):
+    #Keyset pagination: each page starts after the last ID of the one before,
+    #so page 1000 costs the same as page 1 and only one page is ever in memory
+    cursor = get_pool(DATABASE).connection().cursor() #Creates a cursor
+    last_id = start_id - 1
+    while True:
+        with METRICS.timed('cards.page'):
+            cursor.execute(PAGE_QUERY, (last_id, page_size))
+            page = cursor.fetchmany(page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0]
+
+def FormatCard(card):
+    #The ":<4" command tells the code to have 4 characters avalible for use (adds white space in unused characters)
+    return f"│{card[0]:<4}│{card[1]:<16}│{card[2]:<10}│{card[3]:<9}│{card[4]:<11}│{card[5]:<9}│\n"
+
+@METRICS.trace('cards.display')
+def DisplayCards(page_size=PAGE_SIZE, start_id=1, paginate=False, DATABASE=DATABASE, out=None):
+    #Formating the data that the cursor has got from the database, one write per page
+    frame = screen.Frame(out=out)
+    frame.write(TABLE_TOP)
+    for page in CardPages(DATABASE, page_size, start_id):
+        frame.write(''.join(map(FormatCard, page)))
+        frame.render() #Shows each page as soon as it is ready
+        if paginate and len(page) == page_size:
+            if input('Press enter for the next page (q to stop): ').strip().lower() == 'q':
+                break
+    frame.write(TABLE_BOTTOM)
+    frame.render()
+
+def CardKey(DATABASE, monstersID):
+    #"7" and 7 are the same card, so the cache key always uses the number when there is one
+    try:
+        return (DATABASE, int(monstersID))
+    except (TypeError, ValueError):
+        return (DATABASE, monstersID)
+
+@METRICS.trace('cards.get')
+def GetCard(DATABASE, monstersID):
+    key = CardKey(DATABASE, monstersID)
+    card = CARD_CACHE.get(key)
+    if card is None:
+        token = CARD_CACHE.token(key) #If the card is changed while it's being read, the old row isn't cached
+        card = get_pool(DATABASE).connection().execute(CARD_QUERY, (monstersID,)).fetchone()
+        if card is not None: #Missing cards aren't cached so a new card shows up straight away
+            CARD_CACHE.set(key, card, token)
+    return card
 
-    if stat not in stats: #Gives user a error message and returns
+@METRICS.trace('cards.exists')
+def CardExists(DATABASE, monstersID):
+    return GetCard(DATABASE, monstersID) is not None #True if there is a card with that ID
+
+def InvalidateCards(DATABASE, monstersID=None):
+    if monstersID is not None:
+        CARD_CACHE.delete(CardKey(DATABASE, monstersID))
+    SEARCH_CACHE.clear() #Any change can move a card in or out of a search
+
+class StagedEdits:
+    #Keeps edits in memory until they are confirmed, so the database is only locked
+    #for the moment it takes to write them and never while someone is typing
+    def __init__(self, DATABASE):
+        self.DATABASE = DATABASE
+        self.pending = {} #ID -> {stat: new value}
+
+    def stage(self, monstersID, stat, newvalue):
+        stat = stat.lower()
+        if stat not in STATS:
+            raise ValueError(f'{stat!r} is not a valid stat')
+        self.pending.setdefault(monstersID, {})[stat] = newvalue
+
+    def diff(self):
+        #One line per change showing what it is now and what it will become
+        lines = []
+        for monstersID, changes in self.pending.items():
+            card = GetCard(self.DATABASE, monstersID)
+            if card is None:
+                lines.append(f'ID {monstersID}: no card with that ID, nothing will change')
+                continue
+            for stat, newvalue in changes.items():
+                lines.append(f'ID {monstersID} ({card[1]}): {stat} {card[STAT_INDEX[stat]]} -> {newvalue}')
+        return '\n'.join(lines)
+
+    @METRICS.trace('cards.apply_edits')
+    def apply(self):
+        #Every pending edit goes in one short transaction, edits that touch the same stats share one statement
+        groups = {}
+        for monstersID, changes in self.pending.items():
+            stats = tuple(sorted(changes))
+            groups.setdefault(stats, []).append(tuple(changes[stat] for stat in stats) + (monstersID,))
+        def update(connect):
+            changed = 0
+            for stats, rows in groups.items():
+                change = f"UPDATE 'Monster Cards' SET {', '.join(f'{stat} = ?' for stat in stats)} WHERE ID = ?"
+                changed += connect.executemany(change, rows).rowcount
+            return changed
+        changed = WriteCards(self.DATABASE, update)
+        for monstersID in self.pending:
+            InvalidateCards(self.DATABASE, monstersID)
+        self.pending = {}
+        return changed
+
+    def discard(self):
+        self.pending = {}
+
+def EditCards(DATABASE, monstersID, stat, newvalue):
+    if stat not in STATS: #Gives user a error message and returns
         print('Not a valid stat, please try again')
         return
     
-    try:
-        connect = sqlite3.connect(DATABASE) #Connects the function with the database
-        cursor = connect.cursor() #Creates a cursor
-
-        change = f"UPDATE 'Monster Cards' SET {stat} = ? WHERE ID = ?"
-        cursor.execute(change, (newvalue, monstersID)) #Changes the database like a .pop or .append
-        question = input('Would you like to commit this? (y/n) ').lower()
-        if question == 'y':
-            connect.commit() #Commits all changes made to the database
-            print('All changes have been commited')
-        else:
-            connect.rollback() #Disregards all changes made from after the previous commit till now
-            print('All changes have been rolled back, nothing commited')
+    edits = StagedEdits(DATABASE) #Nothing is written until the user says yes
+    edits.stage(monstersID, stat, newvalue)
+    print(edits.diff())
+    question = input('Would you like to commit this? (y/n) ').lower()
+    if question == 'y':
+        edits.apply() #Commits all changes made to the database
+        print('All changes have been commited')
+    else:
+        edits.discard() #Disregards the changes, the database was never touched
+        print('All changes have been rolled back, nothing commited')
 
-    finally:
-        connect.close() #Stops the connection with the database
+@METRICS.trace('cards.batch_edit')
+def BatchEditCards(DATABASE, monsterIDs, changes):
+    #Sets the same stats on lots of cards at once, e.g. BatchEditCards(DATABASE, [1, 2], {'speed': 10})
+    edits = StagedEdits(DATABASE)
+    for monstersID in monsterIDs:
+        for stat, newvalue in changes.items():
+            edits.stage(monstersID, stat, newvalue)
+    return edits.apply() #How many cards were changed
+
+@METRICS.trace('cards.insert')
+def InsertCard(DATABASE, name, strength, speed, stealth, cunning):
+    #Commits all changes made to the database
+    cursor = WriteCards(DATABASE, lambda connect: connect.execute(INSERT_QUERY, (name, strength, speed, stealth, cunning)))
+    InvalidateCards(DATABASE)
+    return cursor.lastrowid #The new card's ID
+
+@METRICS.trace('cards.delete')
+def DeleteCard(DATABASE, monsterID):
+    cursor = WriteCards(DATABASE, lambda connect: connect.execute(DELETE_QUERY, (monsterID,))) #Commits all changes made to the database
+    InvalidateCards(DATABASE, monsterID)
+    return cursor.rowcount #1 if the card was there, 0 if it wasn't
 
 def AddCards(DATABASE, name, strength, speed, stealth, cunning):
     try:
-        connect = sqlite3.connect(DATABASE) #Connects the function with the database
-        cursor = connect.cursor()#Creates a cursor
         print("Attempting to insert:", name, strength, speed, stealth, cunning)
-        cursor.execute(
-            "INSERT INTO \"Monster Cards\" (name, strength, speed, stealth, cunning) VALUES (?, ?, ?, ?, ?)", 
-            (name, strength, speed, stealth, cunning)
-        )
-        connect.commit() #Commits all changes made to the database
+        InsertCard(DATABASE, name, strength, speed, stealth, cunning)
         return "Card added successfully."
     except sqlite3.Error as e:
         return f"An error occurred: {e}"
-    finally:
-        if connect:
-            connect.close() #Stops the connection with the database
 
 def RemoveCards(DATABASE, monsterID):
     while True:
         sure = input('Are you sure you want to remove this card? (y/n): ').strip().lower()
         if sure == 'y':
             try:
-                connect = sqlite3.connect(DATABASE) #Connects the function with the database
-                cursor = connect.cursor()#Creates a cursor
-                cursor.execute("DELETE FROM \"Monster Cards\" WHERE ID = ?", (monsterID,))
-                connect.commit() #Commits all changes made to the database
+                DeleteCard(DATABASE, monsterID)
                 print("Card successfully removed")
             except sqlite3.Error as e:
                 print(f"An error occurred: {e}")
-            finally:
-                connect.close() #Stops the connection with the database
             break #Breaks from the loop
         elif sure == 'n':
             print("Operation cancelled")
             break #Breaks from the loop
         else:
             print("Invalid input. Please enter 'y' or 'n'.")
-
@@ -1,151 +1,279 @@
-import os #Imports "os" giving us the ability to "clear" the terminal
-import time #Imports "time" giving us the ability to "sleep" the program
-import sqlite3 #Imports "sqlite3" giving us the ability to access and change our database
+import screen #Gives us the ability to clear, draw and "sleep" without starting new processes
 from SafeSleepClearr import safe_sleep_clear #Connects the 2 files giving us the ability to use whats in SafeSleepClearr
-from INTERNAL_functions import DisplayCards, EditCards, AddCards, RemoveCards #Connects the 2 files
-from config2 import configure #You will need to find out.....
+from state_machine import StateMachine #Runs the menu
+#Everything else is imported by the option that needs it, so the menu shows up without loading
+#the database code (or anything else) first. After the first time an import is just a lookup.
 
 DATABASE = 'DataBase.db' #Defines what I mean by "DATABASE"
 
-#The main function runs all other functions and the home page
-def main():
-    while True:
-        os.system('clear') #Gives the effect that the terminal was cleared
-        print('-- Monstars --\n')
-        print('''    1. Display all cards
+#Asks for the lowest and highest value of a stat, blank means "any"
+def ask_range(stat):
+    bounds = []
+    for end in ('lowest', 'highest'):
+        while True:
+            value = input(f"{end.capitalize()} {stat} (blank for any): ").strip()
+            if not value or value.isdigit():
+                break
+            print('Please enter a whole number, or leave it blank for any') #Asks again instead of guessing
+        bounds.append(int(value) if value else None)
+    return None if bounds == [None, None] else tuple(bounds)
+
+#Asks for every search filter, used by searching and statistics
+def ask_filters():
+    filters = {stat: ask_range(stat) for stat in ('strength', 'speed', 'stealth', 'cunning')}
+    filters['name_prefix'] = input('Name starts with (blank for any): ').strip() or None
+    return filters
+
+#Every screen is a state, each one returns the name of the state to go to next
+MENU_STATES = ('display', 'add', 'edit', 'remove', 'exit', 'evidence', 'search', 'browse', 'statistics', 'metrics')
+
+#What the user can type on the home page and the state it leads to
+MENU_OPTIONS = {
+    '1': 'display', 'Display all cards': 'display',
+    '2': 'add', 'Add cards': 'add',
+    '3': 'edit', 'Edit cards': 'edit',
+    '4': 'remove', 'Remove cards': 'remove',
+    '5': 'exit', 'Exit': 'exit',
+    '6': 'evidence', 'Evidence': 'evidence',
+    '7': 'search', 'Search cards': 'search',
+    '8': 'browse', 'Browse cards': 'browse',
+    '9': 'statistics', 'Statistics': 'statistics',
+    '10': 'metrics', 'Metrics': 'metrics',
+}
+
+#The home page
+def home_page():
+    with screen.Frame(clear=True) as frame: #Clears and draws the whole page in one write
+        frame.line('-- Monstars --\n')
+        frame.line('''    1. Display all cards
     2. Add cards
     3. Edit cards
     4. Remove cards
     5. Exit
-    6. Evidence''')
-        user_opt = input(': ').capitalize()
-
-        if user_opt == '1' or user_opt.lower() == 'Display all cards':
-            safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
-            DisplayCards() #Runs DisplayCards in INTERNAL_functions
-            done = input('exit? (y/n) ').capitalize()
-
-            if done == 'Y':
-                main() #Re-runs main function essentually bringing the user to the beginning
-            elif done == 'N':
-                time.sleep(1) #Sleeps the code for 1 second
-                print('Why did you even type this in the first place...')
-                time.sleep(2.5) #Sleeps the code for 2.5 seconds
-                print('you egg.')
-                safe_sleep_clear(2) #Runs safesleepclearr and sleeps for 2 seconds
-                exit() #Exits the code
-            else:
-                done = input('exit? (y/n) ').capitalize()
-
-        elif user_opt == '2' or user_opt.lower() == 'Add cards':
-            safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
-            print('-- Monstars --\n')
-            name = input("Enter a new monster's name (try to pick one that doesnt exist already): ")
-            if name == "":
-                print('Try within 14 letters')
-                name = input("Enter a new monster's name (try to pick one that doesnt exist already): ")
-            name_len = len(name)
-            if name_len <= 14:
-                pass
-            else:
-                print('Try within 14 letters')
-                name = input("Enter a new monster's name (try to pick one that doesnt exist already): ")
-            strength = int(input("Enter a strength value: "))
-            if 1 <= strength <= 20:
-                pass
-            elif strength == "":
-                print('Try within 1 and 20')
-                strength = int(input("Enter a strength value: "))
-            else:
-                print('Try within 1 and 20')
-                strength = int(input("Enter a strength value: "))
-            speed = int(input("Enter a speed value: "))
-            if 1 <= speed <= 20:
-                pass
-            elif speed == "":
-                print('Try within 1 and 20')
-                speed = int(input("Enter a speed value: "))
-            else:
-                print('Try within 1 and 20')
-                speed = int(input("Enter a speed value: "))
-            stealth = int(input("Enter a stealth value: "))
-            if 1 <= stealth <= 20:
-                pass
-            elif stealth == "":
-                print('Try within 1 and 20')
-                stealth = int(input("Enter a stealth value: "))
-            else:
-                print('Try within 1 and 20')
-                stealth = int(input("Enter a stealth value: "))
-            cunning = int(input("Enter a cunning value: "))
-            if 1 <= cunning <= 20:
-                pass
-            elif cunning == "":
-                print('Try within 1 and 20')
-                cunning = int(input("Enter a cunning value: "))
-            else:
-                print('Try within 1 and 20')
-                cunning = int(input("Enter a cunning value: "))
-            result = AddCards(DATABASE, name, strength, speed, stealth, cunning)
-            print(result) #Prints the final result of AddCards
-
-        elif user_opt == '3' or user_opt.lower() == 'Edit cards':
-            safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
-            print('-- Monstars --\n')
-            monstersID = input("Enter the monster's ID (enter ? to see all cards + IDs): ").strip()
-            if monstersID == "?" or monstersID == "":
-                DisplayCards()
-                monstersID = input("Enter the monster's ID: ").strip()
-            else:
-                try:
-                    monstersID = int(monstersID)
-                except ValueError:
-                    print("Invalid input. Enter a number or '?'")
-                    monstersID = input("Enter the monster's ID: ").strip()
-            connect = sqlite3.connect(DATABASE)
-            cursor = connect.cursor()
-            cursor.execute("SELECT 1 FROM \"Monster Cards\" WHERE ID = ?", (monstersID,))
-            result = cursor.fetchone()
-            if result is None:
-                DisplayCards()
-                print("Please say a monster's ID in the database")
-                monstersID = int(input("Enter the monster's ID: "))
-            else:
-                connect.close()
-            stat = input("Which stat do you want to edit? (Strength, Speed, Stealth, Cunning): ").lower()
-            if stat not in ["strength", "speed", "stealth", "cunning"]:
-                print("Must be within those stats named")
-                stat = input("Which stat do you want to edit? (Strength, Speed, Stealth, Cunning): ").lower()
-            newvalue = input(f'Enter the new value for "{stat}": ') #Inputs the users input from stat
-            newvalue = int(newvalue)
-            if 1 <= newvalue <= 20:
-                pass
-            elif newvalue == "":
-                print('Try within 1 and 20')
-                newvalue = input(f"Enter the new value for {stat}: ")
-            else:
-                print('Try within 1 and 20')
-                newvalue = input(f"Enter the new value for {stat}: ")
-            try:
-                newvalue = int(newvalue) #Gets the program to read newvalue as a interger
-            except ValueError:
-                pass
-            EditCards(DATABASE, monstersID, stat, newvalue) #Runs EditCards in INTERNAL_functions
-
-        elif user_opt == '4' or user_opt == 'Remove cards':
-            safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
-            print('-- Monstars --\n')
-            DisplayCards() #Runs DisplayCards in INTERNAL_functions
-            monsterID = int(input('Please enter the ID you would like to remove: '))
-            RemoveCards(DATABASE, monsterID) #Runs RemoveCards in INTERNAL_functions
-        
-        elif user_opt == '5' or user_opt == 'Exit':
-            exit()
-        
-        elif user_opt == '6' or user_opt == 'Evidence':
-            configure() #Come on.... test it already
-
-
-        else:
-            main()
-main() #Runs the main function
+    6. Evidence
+    7. Search cards
+    8. Browse cards
+    9. Statistics
+    10. Metrics''')
+    user_opt = input(': ').capitalize()
+    return MENU_OPTIONS.get(user_opt, 'menu') #Anything else just shows the home page again
+
+#Option 1
+def display_cards():
+    from INTERNAL_functions import DisplayCards
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    DisplayCards() #Runs DisplayCards in INTERNAL_functions
+    done = input('exit? (y/n) ').capitalize()
+
+    if done == 'Y':
+        return 'menu' #Brings the user back to the beginning
+    elif done == 'N':
+        screen.sleep(1) #Sleeps the code for 1 second
+        print('Why did you even type this in the first place...')
+        screen.sleep(2.5) #Sleeps the code for 2.5 seconds
+        print('you egg.')
+        safe_sleep_clear(2) #Runs safesleepclearr and sleeps for 2 seconds
+        return 'exit' #Exits the code
+    else:
+        done = input('exit? (y/n) ').capitalize()
+    return 'menu'
+
+#Option 2
+def add_cards():
+    from INTERNAL_functions import AddCards
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    print('-- Monstars --\n')
+    name = input("Enter a new monster's name (try to pick one that doesnt exist already): ")
+    if name == "":
+        print('Try within 14 letters')
+        name = input("Enter a new monster's name (try to pick one that doesnt exist already): ")
+    name_len = len(name)
+    if name_len <= 14:
+        pass
+    else:
+        print('Try within 14 letters')
+        name = input("Enter a new monster's name (try to pick one that doesnt exist already): ")
+    strength = int(input("Enter a strength value: "))
+    if 1 <= strength <= 20:
+        pass
+    elif strength == "":
+        print('Try within 1 and 20')
+        strength = int(input("Enter a strength value: "))
+    else:
+        print('Try within 1 and 20')
+        strength = int(input("Enter a strength value: "))
+    speed = int(input("Enter a speed value: "))
+    if 1 <= speed <= 20:
+        pass
+    elif speed == "":
+        print('Try within 1 and 20')
+        speed = int(input("Enter a speed value: "))
+    else:
+        print('Try within 1 and 20')
+        speed = int(input("Enter a speed value: "))
+    stealth = int(input("Enter a stealth value: "))
+    if 1 <= stealth <= 20:
+        pass
+    elif stealth == "":
+        print('Try within 1 and 20')
+        stealth = int(input("Enter a stealth value: "))
+    else:
+        print('Try within 1 and 20')
+        stealth = int(input("Enter a stealth value: "))
+    cunning = int(input("Enter a cunning value: "))
+    if 1 <= cunning <= 20:
+        pass
+    elif cunning == "":
+        print('Try within 1 and 20')
+        cunning = int(input("Enter a cunning value: "))
+    else:
+        print('Try within 1 and 20')
+        cunning = int(input("Enter a cunning value: "))
+    result = AddCards(DATABASE, name, strength, speed, stealth, cunning)
+    print(result) #Prints the final result of AddCards
+    return 'menu'
+
+#Option 3
+def edit_cards():
+    from INTERNAL_functions import DisplayCards, EditCards, CardExists
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    print('-- Monstars --\n')
+    monstersID = input("Enter the monster's ID (enter ? to see all cards + IDs): ").strip()
+    if monstersID == "?" or monstersID == "":
+        DisplayCards()
+        monstersID = input("Enter the monster's ID: ").strip()
+    else:
+        try:
+            monstersID = int(monstersID)
+        except ValueError:
+            print("Invalid input. Enter a number or '?'")
+            monstersID = input("Enter the monster's ID: ").strip()
+    if not CardExists(DATABASE, monstersID): #Checks the ID using the shared connection
+        DisplayCards()
+        print("Please say a monster's ID in the database")
+        monstersID = int(input("Enter the monster's ID: "))
+    stat = input("Which stat do you want to edit? (Strength, Speed, Stealth, Cunning): ").lower()
+    if stat not in ["strength", "speed", "stealth", "cunning"]:
+        print("Must be within those stats named")
+        stat = input("Which stat do you want to edit? (Strength, Speed, Stealth, Cunning): ").lower()
+    newvalue = input(f'Enter the new value for "{stat}": ') #Inputs the users input from stat
+    newvalue = int(newvalue)
+    if 1 <= newvalue <= 20:
+        pass
+    elif newvalue == "":
+        print('Try within 1 and 20')
+        newvalue = input(f"Enter the new value for {stat}: ")
+    else:
+        print('Try within 1 and 20')
+        newvalue = input(f"Enter the new value for {stat}: ")
+    try:
+        newvalue = int(newvalue) #Gets the program to read newvalue as a interger
+    except ValueError:
+        pass
+    EditCards(DATABASE, monstersID, stat, newvalue) #Runs EditCards in INTERNAL_functions
+    return 'menu'
+
+#Option 4
+def remove_cards():
+    from INTERNAL_functions import DisplayCards, RemoveCards
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    print('-- Monstars --\n')
+    DisplayCards() #Runs DisplayCards in INTERNAL_functions
+    monsterID = int(input('Please enter the ID you would like to remove: '))
+    RemoveCards(DATABASE, monsterID) #Runs RemoveCards in INTERNAL_functions
+    return 'menu'
+
+#Option 6
+def evidence():
+    from config2 import configure #You will need to find out.....
+    configure() #Come on.... test it already
+    return 'menu'
+
+#Option 7
+def search_cards():
+    from INTERNAL_functions import FormatCard, TABLE_TOP, TABLE_BOTTOM
+    from card_search import SearchCards, ORDER_COLUMNS #Gives us the ability to search the cards by stat
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    print('-- Monstars --\n')
+    filters = ask_filters()
+    order_by = input(f"Sort by ({', '.join(ORDER_COLUMNS)}): ").strip().lower() or 'id'
+    if order_by not in ORDER_COLUMNS:
+        print('Not something you can sort by, sorting by id')
+        order_by = 'id'
+    descending = input('Highest first? (y/n) ').strip().lower() == 'y'
+    limit = input('How many cards at most? (blank for 50): ').strip()
+    cards = SearchCards(DATABASE, order_by=order_by, descending=descending,
+                        limit=int(limit) if limit.isdigit() else 50, **filters)
+    with screen.Frame() as frame:
+        frame.write(TABLE_TOP + ''.join(map(FormatCard, cards)) + TABLE_BOTTOM)
+    input('Press enter to go back ')
+    return 'menu'
+
+#Option 8
+def browse_cards():
+    from card_viewer import BrowseCards #Only loads curses if someone actually opens the viewer
+    BrowseCards(DATABASE) #Scroll with the arrow keys, q goes back
+    return 'menu'
+
+#Option 9
+def card_statistics():
+    from card_stats import CardStatistics, format_statistics #Gives us the ability to see averages and spreads of the stats
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    print('-- Monstars --\n')
+    filters = ask_filters() if input('Only some of the cards? (y/n) ').strip().lower() == 'y' else {}
+    with screen.Frame() as frame:
+        frame.write(format_statistics(CardStatistics(DATABASE, **filters))) #Worked out by the database, not Python
+    input('Press enter to go back ')
+    return 'menu'
+
+#Option 10
+def show_metrics():
+    from INTERNAL_functions import METRICS
+    safe_sleep_clear(0.1) #Runs safesleepclearr and sleeps for 0.1 seconds
+    print('-- Monstars --\n')
+    if not METRICS.enabled:
+        print('Timing is off, start the program with MONSTARS_TRACE=1 to turn it on')
+    with screen.Frame() as frame:
+        frame.line(METRICS.format()) #How long every database call has taken so far
+    if input('Save as metrics.json? (y/n) ').strip().lower() == 'y':
+        with open('metrics.json', 'w') as file:
+            file.write(METRICS.to_json())
+        print('Saved to metrics.json')
+    input('Press enter to go back ')
+    return 'menu'
+
+SCREENS = {
+    'menu': home_page,
+    'display': display_cards,
+    'add': add_cards,
+    'edit': edit_cards,
+    'remove': remove_cards,
+    'evidence': evidence,
+    'search': search_cards,
+    'browse': browse_cards,
+    'statistics': card_statistics,
+    'metrics': show_metrics,
+}
+
+#The transitions are declared once here: the home page can go to any option, every option goes back
+#to the home page, and displaying the cards can also end the program
+def build_menu():
+    machine = StateMachine()
+    machine.add_state('menu', ['menu'] + list(MENU_STATES))
+    for state in MENU_STATES:
+        machine.add_state(state, ['menu'])
+    machine.add_state('display', ['menu', 'exit'])
+    machine.add_state('exit')
+    machine.set_state('menu')
+    return machine
+
+#The main function runs all other functions and the home page, one loop so the stack never grows
+def main():
+    machine = build_menu()
+    while machine.state != 'exit':
+        next_state = SCREENS[machine.state]()
+        if not machine.transition(next_state):
+            machine.set_state('menu') #Anything unexpected goes back to the home page
+
+if __name__ == '__main__':
+    main() #Runs the main function
@@ -1,15 +1,11 @@
-# SafeSleepClear1.1.py
+# SafeSleepClear1.2.py
 
-import time #Imports "time" giving us the ability to "sleep" the program
-import sys
-import os #Imports "os" giving us the ability to "clear" the terminal
-import select
+import screen #Clears with ANSI codes instead of starting a "clear" process every time
 
 def safe_sleep_clear(seconds=1):
-    time.sleep(seconds) #Sleeps for a certain amount of time (1 by default)
-    while select.select([sys.stdin], [], [], 0)[0]:
-        sys.stdin.read(1)
-    os.system('cls' if os.name == 'nt' else 'clear') #Give the ilussion it clears the terminal
+    screen.sleep(seconds) #Sleeps for a certain amount of time (1 by default, none in fast mode)
+    screen.drain_input() #Throws away anything typed while sleeping in one go
+    screen.clear() #Give the ilussion it clears the terminal
 
 #Original copy made 2024 as a personal project & collaboration.
 #BurntCr1sp, 2025
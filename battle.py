@@ -0,0 +1,152 @@
+import argparse
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from card_pool import get_pool
+from INTERNAL_functions import DATABASE, STATS
+
+#A card with a NULL stat can't be put in an integer array or fight on that stat, so it sits out
+COMPLETE = " AND ".join(f"{stat} IS NOT NULL" for stat in STATS)
+STATS_QUERY = f"SELECT ID, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" WHERE {COMPLETE} ORDER BY ID"
+COUNT_QUERY = f"SELECT COUNT(*), COALESCE(SUM({COMPLETE}), 0) FROM \"Monster Cards\""
+BLOCK_SIZE = 1024 #Cards per side of each block, a block's outcome matrix is BLOCK_SIZE² bytes
+
+#A rule takes the stats of m cards and k cards, shapes (m, 4) and (k, 4), and returns an (m, k)
+#array that is positive where the row card beats the column card, negative where it loses and 0 for a draw.
+#Rules must be antisymmetric (rule(a, b) == -rule(b, a).T) because only half the pairs are computed.
+Rule = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def load_stats(DATABASE: str, chunk_size: int = 65536) -> Tuple[np.ndarray, np.ndarray, int]:
+    #Streams the four stat columns into preallocated arrays, never holding more than one chunk of tuples.
+    #The last value is how many cards were skipped for having a NULL stat
+    connection = get_pool(DATABASE).connection()
+    total, count = connection.execute(COUNT_QUERY).fetchone()
+    ids = np.empty(count, dtype=np.int64)
+    stats = np.empty((count, len(STATS)), dtype=np.int16)
+    cursor = connection.execute(STATS_QUERY)
+    filled = 0
+    while filled < count:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        block = np.array(rows, dtype=np.int64)
+        ids[filled:filled + len(rows)] = block[:, 0]
+        stats[filled:filled + len(rows)] = block[:, 1:]
+        filled += len(rows)
+    return ids[:filled], stats[:filled], total - count
+
+
+def per_stat_wins(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    #Whoever is higher in more of the four stats wins, one 2-D pass per stat keeps it all in int8/int16
+    outcome = np.zeros((len(a), len(b)), dtype=np.int8)
+    for column in range(a.shape[1]):
+        outcome += np.sign(np.subtract.outer(a[:, column], b[:, column]))
+    return np.sign(outcome, out=outcome)
+
+
+def single_stat(stat: str) -> Rule:
+    column = STATS.index(stat.lower())
+
+    def rule(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return np.sign(a[:, column, None] - b[None, :, column]).astype(np.int8)
+
+    rule.score = lambda stats: stats[:, column].astype(np.float64)
+    return rule
+
+
+def weighted_sum(weights: Sequence[float]) -> Rule:
+    #Higher weighted total wins, e.g. weighted_sum([2, 1, 1, 1]) counts Strength twice
+    w = np.asarray(weights, dtype=np.float64)
+    if w.shape != (len(STATS),):
+        raise ValueError(f"need {len(STATS)} weights, one per stat")
+
+    def rule(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return np.sign((a @ w)[:, None] - (b @ w)[None, :]).astype(np.int8)
+
+    rule.score = lambda stats: stats @ w
+    return rule
+
+
+RULES: Dict[str, Rule] = {"per-stat": per_stat_wins}
+RULES.update({stat: single_stat(stat) for stat in STATS})
+
+
+def _score_results(scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    #Rules that boil down to one number per card don't need pairs at all: after sorting,
+    #a card beats everything with a lower score, O(n log n) instead of O(n²)
+    ordered = np.sort(scores)
+    below = np.searchsorted(ordered, scores, side="left")
+    not_above = np.searchsorted(ordered, scores, side="right")
+    wins = below
+    losses = len(scores) - not_above
+    draws = not_above - below - 1 #Minus the card itself
+    return wins.astype(np.int64), losses.astype(np.int64), draws.astype(np.int64)
+
+
+def _blocked_results(stats: np.ndarray, rule: Rule, block_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = len(stats)
+    wins = np.zeros(n, dtype=np.int64)
+    losses = np.zeros(n, dtype=np.int64)
+    for i in range(0, n, block_size):
+        a = stats[i:i + block_size]
+        for j in range(i, n, block_size):
+            outcome = rule(a, stats[j:j + block_size])
+            if i == j:
+                #Only the pairs above the diagonal, so no card fights itself or anyone twice
+                outcome = np.triu(outcome, k=1)
+            won = outcome > 0
+            lost = outcome < 0
+            wins[i:i + block_size] += won.sum(axis=1)
+            losses[i:i + block_size] += lost.sum(axis=1)
+            wins[j:j + block_size] += lost.sum(axis=0)
+            losses[j:j + block_size] += won.sum(axis=0)
+    draws = (n - 1) - wins - losses
+    return wins, losses, draws
+
+
+def win_rates(stats: np.ndarray, rule: Rule = per_stat_wins, block_size: int = BLOCK_SIZE) -> Dict[str, np.ndarray]:
+    #Every card against every other card once, results per card as arrays in the same order as `stats`
+    stats = np.asarray(stats)
+    score = getattr(rule, "score", None)
+    if score is not None:
+        wins, losses, draws = _score_results(score(stats))
+    else:
+        wins, losses, draws = _blocked_results(stats.astype(np.int16), rule, block_size)
+    opponents = max(len(stats) - 1, 1)
+    return {"wins": wins, "losses": losses, "draws": draws, "win_rate": wins / opponents}
+
+
+def BattleReport(DATABASE: str, rule: Rule = per_stat_wins, block_size: int = BLOCK_SIZE) -> Dict[str, Any]:
+    #win_rates for every card with all four stats, "skipped" is how many cards were left out
+    ids, stats, skipped = load_stats(DATABASE)
+    report: Dict[str, Any] = win_rates(stats, rule, block_size)
+    report["id"] = ids
+    report["skipped"] = skipped
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Every card against every other card")
+    parser.add_argument("--db", default=DATABASE)
+    parser.add_argument("--rule", choices=tuple(RULES), default="per-stat")
+    parser.add_argument("--weights", type=float, nargs=4, metavar="W", help="strength speed stealth cunning weights")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    args = parser.parse_args(argv)
+    rule = weighted_sum(args.weights) if args.weights else RULES[args.rule]
+    report = BattleReport(args.db, rule, args.block_size)
+    if report["skipped"]:
+        print(f"Skipped {report['skipped']} card(s) with a missing stat")
+    order = np.argsort(-report["win_rate"], kind="stable")[:args.top]
+    print("ID\twins\tlosses\tdraws\twin rate")
+    for index in order:
+        print(f"{report['id'][index]}\t{report['wins'][index]}\t{report['losses'][index]}\t"
+              f"{report['draws'][index]}\t{report['win_rate'][index]:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+#Benchmarks for the card operations, run with "python -m benchmarks --help"
+from benchmarks.data import build_database, generate_monsters
+from benchmarks.runner import OPERATIONS, compare, run_benchmarks
+
+__all__ = ["OPERATIONS", "build_database", "compare", "generate_monsters", "run_benchmarks"]
@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from benchmarks.runner import OPERATIONS, compare, run_benchmarks
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time the card operations")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="comma separated card counts")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="comma separated operations")
+    parser.add_argument("--repeat", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed calls first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the generated databases here instead of a temp directory")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, 0.10 is 10%%")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    operations = [name for name in args.ops.split(",") if name]
+    try:
+        report = run_benchmarks(sizes, operations, args.repeat, args.warmup, args.seed, args.workdir,
+                                log=lambda line: print(line, file=sys.stderr))
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(json.load(handle), report, args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
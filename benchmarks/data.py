@@ -0,0 +1,47 @@
+import os
+import random
+import sqlite3
+from itertools import islice
+from typing import Iterator, Tuple
+
+from card_import import MAX_NAME_LENGTH, MAX_STAT, MIN_STAT
+from card_search import migrate
+
+SCHEMA = ("CREATE TABLE \"Monster Cards\" (ID INTEGER PRIMARY KEY AUTOINCREMENT, Name TEXT (25), "
+          "Strength INTEGER (25), Speed INTEGER (25), Stealth INTEGER (25), Cunning INTEGER (25))")
+INSERT = "INSERT INTO \"Monster Cards\" (Name, Strength, Speed, Stealth, Cunning) VALUES (?, ?, ?, ?, ?)"
+
+#Names are glued together the same way as the real ones ("Vexscream", "Blazegolem")
+FRONTS = ("Vex", "Dawn", "Blaze", "Web", "Mold", "Vortex", "Rot", "Drunk", "Frost", "Grim", "Ash", "Bone",
+          "Storm", "Mire", "Shade", "Thorn", "Gloom", "Rust", "Venom", "Ember")
+BACKS = ("scream", "mirag", "golem", "snake", "vine", "wing", "thing", "chard", "fang", "maw", "claw",
+         "wraith", "crawler", "hound", "beast", "spine", "howl", "shell", "bug", "lurk")
+
+
+def generate_monsters(count: int, seed: int = 0) -> Iterator[Tuple[str, int, int, int, int]]:
+    #The same seed always gives the same cards, one at a time so a million never sit in memory
+    rng = random.Random(seed)
+    for _ in range(count):
+        name = (rng.choice(FRONTS) + rng.choice(BACKS))[:MAX_NAME_LENGTH]
+        yield (name,) + tuple(rng.randint(MIN_STAT, MAX_STAT) for _ in range(4))
+
+
+def build_database(path: str, count: int, seed: int = 0, chunk_size: int = 50000) -> str:
+    #A fresh card database with `count` generated cards, in WAL mode with the search indexes like the real one
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute(SCHEMA)
+        cards = generate_monsters(count, seed)
+        while True:
+            chunk = list(islice(cards, chunk_size))
+            if not chunk:
+                break
+            connection.executemany(INSERT, chunk)
+        connection.commit()
+        connection.execute("PRAGMA journal_mode = WAL")
+    finally:
+        connection.close()
+    migrate(path) #The indexes and ANALYZE, through the pool like everything else
+    return path
@@ -0,0 +1,63 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+#Cold start budget for getting to the menu: the cumulative time of `import Main` from
+#`python -X importtime -c "import Main"` in a fresh interpreter, Python's own startup isn't counted
+BUDGET_MS = 40.0
+#None of these are needed to show the menu, each one is imported by the option that uses it
+LAZY_MODULES = ("INTERNAL_functions", "card_pool", "card_search", "card_stats", "card_viewer", "sqlite3",
+                "curses", "numpy", "logging", "json", "config", "configure", "config2", "threading")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_imports(module: str = "Main") -> Dict[str, Tuple[int, int]]:
+    #{module: (self µs, cumulative µs)} for everything importing `module` pulled in
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = (int(own), int(cumulative))
+    return imports
+
+
+def check_startup(module: str = "Main", budget_ms: float = BUDGET_MS, runs: int = 5) -> List[str]:
+    #Best of a few runs so one slow disk read doesn't fail it, returns what's wrong (nothing if it's fine)
+    problems = []
+    best = None
+    for _ in range(runs):
+        imports = measure_imports(module)
+        startup = imports[module][1] #Cumulative, so it includes everything Main imported
+        best = startup if best is None else min(best, startup)
+    print(f"import {module}: {best / 1000:.1f}ms (budget {budget_ms:.0f}ms)")
+    slowest = sorted(imports.items(), key=lambda item: -item[1][0])[:10]
+    for name, (own, cumulative) in slowest:
+        print(f"  {own / 1000:>7.2f}ms {name}")
+    if best / 1000 > budget_ms:
+        problems.append(f"import {module} took {best / 1000:.1f}ms, over the {budget_ms:.0f}ms budget")
+    eager = [name for name in LAZY_MODULES if name in imports]
+    if eager:
+        problems.append(f"imported at startup but should wait until they're used: {', '.join(eager)}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.importtime",
+                                     description="Check how long the menu takes to import")
+    parser.add_argument("--module", default="Main")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    problems = check_startup(args.module, args.budget_ms, args.runs)
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import io
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmarks.data import build_database
+from card_pool import get_pool
+from card_search import SearchCards
+from INTERNAL_functions import CARD_CACHE, SEARCH_CACHE, BatchEditCards, DeleteCard, DisplayCards, GetCard, InsertCard
+
+try:
+    import resource
+except ImportError: #Windows
+    resource = None
+
+#Each operation is set up once per database and returns the call that gets timed, it's handed
+#the database, how many cards it started with and a seeded Random. The fraction scales --repeat,
+#showing the whole table is a lot slower than touching one card so it runs fewer times.
+Operation = Callable[[str, int, random.Random, Dict[str, Any]], Callable[[], Any]]
+
+
+def _add(DATABASE: str, size: int, rng: random.Random, shared: Dict[str, Any]) -> Callable[[], Any]:
+    added = shared.setdefault("added", [])
+
+    def call() -> None:
+        added.append(InsertCard(DATABASE, "Benchmark", rng.randint(1, 20), rng.randint(1, 20),
+                                rng.randint(1, 20), rng.randint(1, 20)))
+    return call
+
+
+def _get(DATABASE: str, size: int, rng: random.Random, shared: Dict[str, Any]) -> Callable[[], Any]:
+    CARD_CACHE.clear() #Random IDs from a cold cache, like someone looking up cards for the first time
+    return lambda: GetCard(DATABASE, rng.randint(1, size))
+
+
+def _search(DATABASE: str, size: int, rng: random.Random, shared: Dict[str, Any]) -> Callable[[], Any]:
+    def call() -> None:
+        low = rng.randint(1, 20)
+        SEARCH_CACHE.clear() #There are only 20 different searches, without this it would time the cache
+        SearchCards(DATABASE, speed=(low, low), order_by="strength", descending=True, limit=10)
+    return call
+
+
+def _edit(DATABASE: str, size: int, rng: random.Random, shared: Dict[str, Any]) -> Callable[[], Any]:
+    #What EditCards does once the user says yes, without the prompt
+    return lambda: BatchEditCards(DATABASE, [rng.randint(1, size)], {"speed": rng.randint(1, 20)})
+
+
+def _remove(DATABASE: str, size: int, rng: random.Random, shared: Dict[str, Any]) -> Callable[[], Any]:
+    #Takes away the cards "add" put in, so the table ends up the size it started
+    added = shared.setdefault("added", [])
+    return lambda: DeleteCard(DATABASE, added.pop() if added else rng.randint(1, size))
+
+
+def _display(DATABASE: str, size: int, rng: random.Random, shared: Dict[str, Any]) -> Callable[[], Any]:
+    #The whole table rendered into memory instead of the terminal
+    return lambda: DisplayCards(DATABASE=DATABASE, out=io.StringIO())
+
+
+OPERATIONS: Dict[str, tuple] = {
+    "add": (_add, 1.0),
+    "get": (_get, 1.0),
+    "search": (_search, 1.0),
+    "edit": (_edit, 1.0),
+    "remove": (_remove, 1.0),
+    "display": (_display, 0.02),
+}
+
+
+def percentile(ordered: Sequence[float], percent: float) -> float:
+    #Nearest rank on an already sorted list
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_kib() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak #macOS reports bytes, Linux KiB
+
+
+def time_operation(call: Callable[[], Any], repeat: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        call()
+    timings: List[float] = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        start = clock()
+        call()
+        timings.append(clock() - start)
+    total = sum(timings)
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "ops_per_sec": repeat / total if total else float("inf"),
+        "mean_ms": total / repeat * 1000,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+    }
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = (1000, 100000, 1000000),
+    operations: Optional[Sequence[str]] = None,
+    repeat: int = 200,
+    warmup: int = 20,
+    seed: int = 0,
+    workdir: Optional[str] = None,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    #Builds a throwaway database per size (kept if workdir is given) and times every operation on it
+    operations = list(operations or OPERATIONS)
+    unknown = [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        raise ValueError(f"unknown operations: {', '.join(unknown)}")
+    directory = workdir or tempfile.mkdtemp(prefix="card-bench-")
+    os.makedirs(directory, exist_ok=True)
+    report: Dict[str, Any] = {
+        "meta": {
+            "seed": seed, "repeat": repeat, "warmup": warmup, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform(),
+        },
+        "results": {},
+    }
+    try:
+        for size in sizes:
+            path = os.path.join(directory, f"cards-{size}-{seed}.db")
+            start = time.perf_counter()
+            build_database(path, size, seed)
+            log(f"{size} cards: built in {time.perf_counter() - start:.1f}s")
+            results: Dict[str, Any] = {}
+            shared: Dict[str, Any] = {}
+            for name in operations:
+                setup, fraction = OPERATIONS[name]
+                rng = random.Random(f"{seed}-{size}-{name}")
+                call = setup(path, size, rng, shared)
+                results[name] = time_operation(call, max(1, int(repeat * fraction)),
+                                               max(1, int(warmup * fraction)))
+                log(f"  {name:<8}{results[name]['ops_per_sec']:>12.1f} ops/s"
+                    f"  p50 {results[name]['p50_ms']:.3f}ms  p95 {results[name]['p95_ms']:.3f}ms"
+                    f"  p99 {results[name]['p99_ms']:.3f}ms")
+            results["peak_rss_kib"] = peak_rss_kib() #Peak for the whole run so far, it never goes down
+            report["results"][str(size)] = results
+            get_pool(path).close_all()
+    finally:
+        if workdir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    #Every operation that got more than `threshold` slower, by throughput or p95, sizes/operations
+    #only in one of the two reports are skipped
+    regressions = []
+    for size, results in current["results"].items():
+        for name, now in results.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not isinstance(now, dict) or not isinstance(before, dict):
+                continue
+            if now["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+                regressions.append(f"{size} {name}: {before['ops_per_sec']:.1f} -> {now['ops_per_sec']:.1f} ops/s")
+            if now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                regressions.append(f"{size} {name}: p95 {before['p95_ms']:.3f} -> {now['p95_ms']:.3f} ms")
+    return regressions
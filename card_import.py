@@ -0,0 +1,164 @@
+import csv
+import json
+import sqlite3
+import sys
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from INTERNAL_functions import DATABASE, INSERT_QUERY, InvalidateCards, WriteCards
+
+STATS = ("strength", "speed", "stealth", "cunning")
+MAX_NAME_LENGTH = 14 #Same rules as adding a card from the menu
+MIN_STAT = 1
+MAX_STAT = 20
+MAX_REJECTED_ROWS = 100 #Rejected rows kept for the report, the rest are only counted
+
+
+def read_rows(path: str, file_format: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    #Streams (line number, row) pairs so the whole file never has to be in memory
+    file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    #"-" reads from stdin so another program can pipe cards straight in
+    with (open(sys.stdin.fileno(), newline="", encoding="utf-8", closefd=False) if path == "-"
+          else open(path, newline="", encoding="utf-8")) as handle:
+        if file_format == "csv":
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+        elif file_format == "jsonl":
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"__error__": f"bad JSON: {e.msg}"}
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, {"__error__": "line is not a JSON object"}
+                    continue
+                yield line_number, {str(k).strip().lower(): v for k, v in row.items()}
+        else:
+            raise ValueError(f"Unknown import format: {file_format}")
+
+
+def validate_card(row: Dict[str, Any]) -> Tuple[Optional[Tuple[Any, ...]], Optional[str]]:
+    #Returns (values ready to insert, None) or (None, reason it was rejected)
+    if "__error__" in row:
+        return None, row["__error__"]
+    name = row.get("name")
+    if not isinstance(name, str) or not name.strip():
+        return None, "missing name"
+    name = name.strip()
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"name longer than {MAX_NAME_LENGTH} letters"
+    values: List[Any] = [name]
+    for stat in STATS:
+        raw = row.get(stat)
+        if isinstance(raw, bool): #JSON true/false would otherwise pass as 1/0
+            return None, f"{stat} is not a whole number"
+        try:
+            value = int(raw)
+        except (TypeError, ValueError, OverflowError): #OverflowError is JSON's 1e400 or Infinity
+            return None, f"{stat} is not a whole number"
+        if isinstance(raw, float) and raw != value:
+            return None, f"{stat} is not a whole number"
+        if not MIN_STAT <= value <= MAX_STAT:
+            return None, f"{stat} must be within {MIN_STAT} and {MAX_STAT}"
+        values.append(value)
+    return tuple(values), None
+
+
+def _chunks(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ImportCards(
+    DATABASE: str,
+    path: str,
+    file_format: Optional[str] = None,
+    chunk_size: int = 1000,
+    batch_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    #chunk_size is how many rows are validated and handed to executemany at once,
+    #batch_size is how many rows go in each transaction (None means the whole file is one transaction)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    chunks = _chunks(read_rows(path, file_format), chunk_size)
+    inserted = 0
+    rejected = 0
+    rejected_rows: List[Tuple[int, str]] = []
+    finished = False
+    start = time.perf_counter()
+
+    def write(connect: sqlite3.Connection) -> int:
+        #One transaction's worth: chunks until batch_size rows are in or the file runs out
+        nonlocal rejected, finished
+        written = 0
+        for chunk in chunks:
+            good = []
+            for line_number, row in chunk:
+                values, reason = validate_card(row)
+                if values is None:
+                    rejected += 1
+                    if len(rejected_rows) < MAX_REJECTED_ROWS:
+                        rejected_rows.append((line_number, reason))
+                else:
+                    good.append(values)
+            if good:
+                try:
+                    connect.executemany(INSERT_QUERY, good)
+                except sqlite3.OperationalError as e:
+                    #The rows have been read and can't be read again, so unlike a busy BEGIN
+                    #this transaction can't just be retried
+                    raise sqlite3.DatabaseError(f"import stopped after {inserted} cards: {e}") from e
+                written += len(good)
+            if batch_size is not None and written >= batch_size:
+                return written
+        finished = True
+        return written
+
+    try:
+        while not finished:
+            inserted += WriteCards(DATABASE, write) #Only the rows since the last commit are lost on an error
+    finally:
+        InvalidateCards(DATABASE)
+    elapsed = time.perf_counter() - start
+    return {
+        "inserted": inserted,
+        "rejected": rejected,
+        "rejected_rows": rejected_rows, #Only the first MAX_REJECTED_ROWS
+        "seconds": elapsed,
+        "rows_per_second": inserted / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python card_import.py FILE [csv|jsonl] [batch size]")
+        return 2
+    path = argv[0]
+    file_format = argv[1] if len(argv) > 1 else None
+    batch_size = int(argv[2]) if len(argv) > 2 else None
+    try:
+        report = ImportCards(DATABASE, path, file_format, batch_size=batch_size)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"An error occurred: {e}")
+        return 1
+    print(f"Imported {report['inserted']} cards in {report['seconds']:.3f}s ({report['rows_per_second']:.0f} rows/sec)")
+    print(f"Rejected {report['rejected']} rows")
+    for line_number, reason in report["rejected_rows"]:
+        print(f"  line {line_number}: {reason}")
+    if report["rejected"] > len(report["rejected_rows"]):
+        print(f"  ... and {report['rejected'] - len(report['rejected_rows'])} more")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
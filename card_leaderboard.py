@@ -0,0 +1,277 @@
+import heapq
+import re
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from card_pool import get_pool
+from INTERNAL_functions import DATABASE, METRICS, STATS, WriteCards
+
+#A leaderboard ranks cards by a weighted total of their stats, e.g. weights (2, 1, 1, 1) counts Strength twice.
+#In the database each one is a virtual generated column power_<name> on "Monster Cards" with an index on it
+#(the index holds the computed scores, so top K reads K index entries), plus a score -> how many cards
+#table kept by triggers so a card's rank is a sum over the distinct scores above it, not over the cards.
+#PowerLeaderboard further down does the same in memory for simulations.
+BOARDS_TABLE = "Card Leaderboards"
+COUNTS_TABLE = "Card Power Counts"
+NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]{0,30}$")
+TOP_QUERY = "SELECT ID, Name, Strength, Speed, Stealth, Cunning, {column} FROM \"Monster Cards\" " \
+            "ORDER BY {column} DESC, ID LIMIT ?"
+
+
+class LeaderboardError(Exception):
+    pass
+
+
+def power_expression(weights: Sequence[float], row: str = "") -> str:
+    #The score as SQL, a NULL stat adds nothing (scores as 0)
+    if len(weights) != len(STATS):
+        raise LeaderboardError(f"need {len(STATS)} weights, one per stat")
+    prefix = f"{row}." if row else ""
+    return " + ".join(f"{float(weight)!r} * COALESCE({prefix}{stat}, 0)" for weight, stat in zip(weights, STATS))
+
+
+def _names(name: str) -> Dict[str, str]:
+    if not NAME_PATTERN.match(name):
+        raise LeaderboardError("leaderboard names are lower case letters, digits and _, starting with a letter")
+    return {"column": f"power_{name}", "index": f"idx_monster_cards_power_{name}",
+            "insert": f"leaderboard_{name}_insert", "delete": f"leaderboard_{name}_delete",
+            "update": f"leaderboard_{name}_update"}
+
+
+def _count_change(name: str, weights: Sequence[float], sign: str, row: str) -> str:
+    score = power_expression(weights, row)
+    statements = []
+    if sign == "+":
+        statements.append(f"INSERT OR IGNORE INTO \"{COUNTS_TABLE}\" (board, score, cards) VALUES ('{name}', {score}, 0);")
+    statements.append(f"UPDATE \"{COUNTS_TABLE}\" SET cards = cards {sign} 1 WHERE board = '{name}' AND score = {score};")
+    return "\n    ".join(statements)
+
+
+def create_leaderboard(DATABASE: str, name: str, weights: Sequence[float]) -> None:
+    #Adds the column, its index, the triggers and fills the score counts, all in one transaction
+    names = _names(name)
+    weights = [float(weight) for weight in weights]
+    expression = power_expression(weights)
+
+    def create(connect: Any) -> None:
+        connect.execute(f"CREATE TABLE IF NOT EXISTS \"{BOARDS_TABLE}\" (name TEXT PRIMARY KEY, "
+                        + ", ".join(f"{stat} REAL NOT NULL" for stat in STATS) + ")")
+        connect.execute(f"CREATE TABLE IF NOT EXISTS \"{COUNTS_TABLE}\" (board TEXT NOT NULL, score REAL NOT NULL, "
+                        "cards INTEGER NOT NULL, PRIMARY KEY (board, score)) WITHOUT ROWID")
+        if connect.execute(f"SELECT 1 FROM \"{BOARDS_TABLE}\" WHERE name = ?", (name,)).fetchone():
+            raise LeaderboardError(f"there is already a leaderboard called {name!r}")
+        connect.execute(f"INSERT INTO \"{BOARDS_TABLE}\" VALUES (?, ?, ?, ?, ?)", [name] + weights)
+        connect.execute(f"ALTER TABLE \"Monster Cards\" ADD COLUMN {names['column']} REAL "
+                        f"GENERATED ALWAYS AS ({expression}) VIRTUAL")
+        connect.execute(f"CREATE INDEX {names['index']} ON \"Monster Cards\" ({names['column']} DESC, ID)")
+        connect.execute(f"""CREATE TRIGGER {names['insert']} AFTER INSERT ON "Monster Cards" BEGIN
+    {_count_change(name, weights, "+", "NEW")}
+END""")
+        connect.execute(f"""CREATE TRIGGER {names['delete']} AFTER DELETE ON "Monster Cards" BEGIN
+    {_count_change(name, weights, "-", "OLD")}
+END""")
+        connect.execute(f"""CREATE TRIGGER {names['update']} AFTER UPDATE OF {", ".join(STATS)} ON "Monster Cards" BEGIN
+    {_count_change(name, weights, "-", "OLD")}
+    {_count_change(name, weights, "+", "NEW")}
+END""")
+        connect.execute(f"INSERT INTO \"{COUNTS_TABLE}\" (board, score, cards) SELECT ?, {names['column']}, COUNT(*) "
+                        f"FROM \"Monster Cards\" GROUP BY {names['column']}", (name,))
+    WriteCards(DATABASE, create)
+
+
+def drop_leaderboard(DATABASE: str, name: str) -> None:
+    names = _board(DATABASE, name)
+
+    def drop(connect: Any) -> None:
+        for trigger in ("insert", "delete", "update"):
+            connect.execute(f"DROP TRIGGER IF EXISTS {names[trigger]}")
+        connect.execute(f"DROP INDEX IF EXISTS {names['index']}")
+        columns = [row[1] for row in connect.execute("PRAGMA table_xinfo(\"Monster Cards\")")]
+        if names["column"] in columns:
+            connect.execute(f"ALTER TABLE \"Monster Cards\" DROP COLUMN {names['column']}")
+        connect.execute(f"DELETE FROM \"{COUNTS_TABLE}\" WHERE board = ?", (name,))
+        connect.execute(f"DELETE FROM \"{BOARDS_TABLE}\" WHERE name = ?", (name,))
+    WriteCards(DATABASE, drop)
+
+
+def leaderboards(DATABASE: str) -> Dict[str, Tuple[float, ...]]:
+    #name -> weights
+    connection = get_pool(DATABASE).connection()
+    exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                (BOARDS_TABLE,)).fetchone()
+    if not exists:
+        return {}
+    return {row[0]: tuple(row[1:]) for row in connection.execute(f"SELECT * FROM \"{BOARDS_TABLE}\" ORDER BY name")}
+
+
+_known: Dict[str, Tuple[int, Dict[str, Tuple[float, ...]]]] = {} #Database -> (schema_version, leaderboards)
+
+
+def _board(DATABASE: str, name: str) -> Dict[str, str]:
+    #_names for a leaderboard that exists, so a made up name never reaches the SQL. A leaderboard only
+    #comes or goes with its column, which changes schema_version, so the list is only read again after that
+    names = _names(name)
+    version = get_pool(DATABASE).connection().execute("PRAGMA schema_version").fetchone()[0]
+    known = _known.get(DATABASE)
+    if known is None or known[0] != version:
+        known = _known[DATABASE] = (version, leaderboards(DATABASE))
+    if name not in known[1]:
+        raise LeaderboardError(f"there is no leaderboard called {name!r}")
+    return names
+
+
+@METRICS.trace('cards.leaderboard_top')
+def TopCards(DATABASE: str, name: str, k: int = 10) -> List[Tuple[Any, ...]]:
+    #The k highest scoring cards (ties in ID order), each a card row with its score on the end
+    query = TOP_QUERY.format(column=_board(DATABASE, name)["column"])
+    return get_pool(DATABASE).connection().execute(query, (k,)).fetchall()
+
+
+@METRICS.trace('cards.leaderboard_rank')
+def CardRank(DATABASE: str, name: str, monstersID: int) -> Optional[Tuple[int, float]]:
+    #(rank, score) where rank is 1 + how many cards score higher (so ties share a rank), None if there's no card
+    column = _board(DATABASE, name)["column"]
+    connection = get_pool(DATABASE).connection()
+    row = connection.execute(f"SELECT {column} FROM \"Monster Cards\" WHERE ID = ?",
+                             (monstersID,)).fetchone()
+    if row is None:
+        return None
+    above = connection.execute(f"SELECT COALESCE(SUM(cards), 0) FROM \"{COUNTS_TABLE}\" WHERE board = ? AND score > ?",
+                               (name, row[0])).fetchone()[0]
+    return above + 1, row[0]
+
+
+class PowerLeaderboard:
+    #In memory version for simulations that change stats thousands of times a second. Every change is
+    #O(log n): the new score goes on a max-heap and old entries are skipped (and every so often cleared out)
+    #when they come to the top. Scores are also counted by value, so rank() costs one pass over the
+    #distinct scores (a few hundred at most with whole number weights) rather than over every card.
+    def __init__(self, weights: Sequence[float] = (1, 1, 1, 1)) -> None:
+        if len(weights) != len(STATS):
+            raise LeaderboardError(f"need {len(STATS)} weights, one per stat")
+        self.weights = tuple(float(weight) for weight in weights)
+        self._stats: Dict[int, List[int]] = {}
+        self._scores: Dict[int, float] = {}
+        self._versions: Dict[int, int] = {}
+        self._counts: Dict[float, int] = {}
+        self._heap: List[Tuple[float, int, int]] = [] #(-score, ID, version)
+
+    @classmethod
+    def from_cards(cls, cards: Iterable[Sequence[Any]], weights: Sequence[float] = (1, 1, 1, 1)) -> "PowerLeaderboard":
+        #Card rows as the database gives them (ID, Name, Strength, Speed, Stealth, Cunning)
+        board = cls(weights)
+        for card in cards:
+            board.set(card[0], card[2:6])
+        return board
+
+    def score_of(self, stats: Sequence[int]) -> float:
+        return sum(weight * (value or 0) for weight, value in zip(self.weights, stats))
+
+    def _count(self, score: float, change: int) -> None:
+        left = self._counts.get(score, 0) + change
+        if left:
+            self._counts[score] = left
+        else:
+            del self._counts[score]
+
+    def set(self, monster_id: int, stats: Sequence[int]) -> float:
+        #Adds the card or replaces all its stats, returns its new score
+        if monster_id in self._scores:
+            self._count(self._scores[monster_id], -1)
+        self._stats[monster_id] = list(stats)
+        score = self.score_of(stats)
+        self._scores[monster_id] = score
+        self._count(score, 1)
+        version = self._versions.get(monster_id, 0) + 1
+        self._versions[monster_id] = version
+        heapq.heappush(self._heap, (-score, monster_id, version))
+        if len(self._heap) > 2 * len(self._scores) + 64:
+            self._compact()
+        return score
+
+    def set_stat(self, monster_id: int, stat: str, value: int) -> float:
+        stats = list(self._stats[monster_id])
+        stats[STATS.index(stat.lower())] = value
+        return self.set(monster_id, stats)
+
+    def remove(self, monster_id: int) -> bool:
+        if monster_id not in self._scores:
+            return False
+        self._count(self._scores.pop(monster_id), -1)
+        del self._stats[monster_id]
+        self._versions[monster_id] += 1 #Its heap entries are all stale now
+        return True
+
+    def _compact(self) -> None:
+        #Drops every stale entry, O(n)
+        self._heap = [(-score, monster_id, self._versions[monster_id]) for monster_id, score in self._scores.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int = 10) -> List[Tuple[int, float]]:
+        #(ID, score) of the k best, ties in ID order. Pops valid entries then pushes them back, O(k log n)
+        found: List[Tuple[float, int, int]] = []
+        while self._heap and len(found) < k:
+            entry = heapq.heappop(self._heap)
+            _, monster_id, version = entry
+            if self._versions.get(monster_id) == version and monster_id in self._scores:
+                found.append(entry)
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        return [(monster_id, -negative) for negative, monster_id, _ in found]
+
+    def rank(self, monster_id: int) -> Optional[int]:
+        score = self._scores.get(monster_id)
+        if score is None:
+            return None
+        return 1 + sum(count for value, count in self._counts.items() if value > score)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, monster_id: int) -> bool:
+        return monster_id in self._scores
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Usage: python card_leaderboard.py [--db DATABASE] create NAME W1 W2 W3 W4 | top NAME [K] | "
+             "rank NAME ID | drop NAME | list")
+    database = DATABASE
+    if argv[:1] == ["--db"] and len(argv) > 1:
+        database, argv = argv[1], argv[2:]
+    if not argv:
+        print(usage)
+        return 2
+    command, rest = argv[0], argv[1:]
+    try:
+        if command == "create" and len(rest) == 5:
+            create_leaderboard(database, rest[0], [float(weight) for weight in rest[1:]])
+            print(f"Created leaderboard {rest[0]}")
+        elif command == "top" and len(rest) in (1, 2):
+            k = int(rest[1]) if len(rest) == 2 else 10
+            for place, card in enumerate(TopCards(database, rest[0], k), start=1):
+                print(f"{place}\t{card[0]}\t{card[1]}\t{card[-1]:g}")
+        elif command == "rank" and len(rest) == 2:
+            result = CardRank(database, rest[0], int(rest[1]))
+            if result is None:
+                print(f"No card with ID {rest[1]}")
+                return 1
+            print(f"Card {rest[1]} is ranked {result[0]} with {result[1]:g}")
+        elif command == "drop" and len(rest) == 1:
+            drop_leaderboard(database, rest[0])
+            print(f"Dropped leaderboard {rest[0]}")
+        elif command == "list" and not rest:
+            for name, weights in leaderboards(database).items():
+                print(f"{name}\t" + "\t".join(f"{stat}={weight:g}" for stat, weight in zip(STATS, weights)))
+        else:
+            print(usage)
+            return 2
+    except (LeaderboardError, ValueError, sqlite3.Error) as e:
+        print(f"An error occurred: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
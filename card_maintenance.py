@@ -0,0 +1,110 @@
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from card_pool import get_pool
+from config2 import Scheduler
+from INTERNAL_functions import (
+    CARD_CACHE, DATABASE, METRICS, SEARCH_CACHE, InvalidateCards, WriteCards,
+)
+
+#Housekeeping for a long running process (like card_server.py), done on the scheduler's thread so
+#nobody waiting on the menu or a request ever pays for it. Intervals are in seconds, None turns a task off.
+REFRESH_QUERY = "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" WHERE ID IN ({})"
+REFRESH_CHUNK = 500 #Stays well under SQLite's limit on "?"s in one statement
+
+
+@METRICS.trace("maintenance.optimize")
+def optimize(DATABASE: str) -> None:
+    #Lets SQLite re-ANALYZE whatever tables it thinks have changed enough, usually nothing
+    get_pool(DATABASE).connection().execute("PRAGMA optimize")
+
+
+@METRICS.trace("maintenance.analyze")
+def analyze(DATABASE: str) -> None:
+    #Fresh statistics for the planner, it writes sqlite_stat1 so it goes through the write retries
+    WriteCards(DATABASE, lambda connect: connect.execute("ANALYZE \"Monster Cards\""))
+
+
+@METRICS.trace("maintenance.checkpoint")
+def checkpoint(DATABASE: str, mode: str = "PASSIVE") -> Tuple[int, int, int]:
+    #Copies the WAL back into the database file so it doesn't keep growing. PASSIVE never waits on
+    #readers or writers. Returns (busy, pages in the WAL, pages copied)
+    return tuple(get_pool(DATABASE).connection().execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+
+@METRICS.trace("maintenance.refresh_caches")
+def refresh_caches(DATABASE: str) -> int:
+    #Another process can change the cards behind this one's back, so every cached card is checked
+    #against the database (a few hundred at a time) and fixed or dropped. Returns how many were stale.
+    #peek() and replace() leave the hit/miss counts and the LRU order alone, and a card this process changes
+    #while it's being checked keeps whatever its writer left (the token is out of date by then)
+    SEARCH_CACHE.purge_expired()
+    CARD_CACHE.purge_expired()
+    keys = [key for key in CARD_CACHE.keys() if key[0] == DATABASE and isinstance(key[1], int)]
+    connection = get_pool(DATABASE).connection()
+    stale = 0
+    for start in range(0, len(keys), REFRESH_CHUNK):
+        ids = [monstersID for _, monstersID in keys[start:start + REFRESH_CHUNK]]
+        tokens = {monstersID: CARD_CACHE.token((DATABASE, monstersID)) for monstersID in ids}
+        query = REFRESH_QUERY.format(", ".join("?" * len(ids)))
+        fresh = {card[0]: card for card in connection.execute(query, ids)}
+        for monstersID in ids:
+            key = (DATABASE, monstersID)
+            cached = CARD_CACHE.peek(key)
+            card = fresh.get(monstersID)
+            if cached is None or cached == card:
+                continue
+            stale += 1
+            if card is None:
+                InvalidateCards(DATABASE, monstersID)
+            elif CARD_CACHE.replace(key, card, tokens[monstersID]):
+                SEARCH_CACHE.clear()
+    return stale
+
+
+def schedule_maintenance(
+    DATABASE: str,
+    scheduler: Optional[Scheduler] = None,
+    optimize_every: Optional[float] = 3600,
+    analyze_every: Optional[float] = 6 * 3600,
+    checkpoint_every: Optional[float] = 60,
+    refresh_every: Optional[float] = 30,
+    start: bool = True,
+) -> Scheduler:
+    #Adds the tasks (the first run of each is one interval from now) and starts the scheduler's thread
+    scheduler = scheduler or Scheduler()
+    tasks = (
+        (optimize, optimize_every),
+        (analyze, analyze_every),
+        (checkpoint, checkpoint_every),
+        (refresh_caches, refresh_every),
+    )
+    for task, every in tasks:
+        if every is not None:
+            scheduler.schedule(task, every, DATABASE, every=every, name=f"{task.__name__} {DATABASE}")
+    if start:
+        scheduler.start()
+    return scheduler
+
+
+def run_once(DATABASE: str) -> Dict[str, object]:
+    #Every task straight away, for a cron job or a quick tidy up by hand
+    return {
+        "optimize": optimize(DATABASE),
+        "analyze": analyze(DATABASE),
+        "checkpoint": checkpoint(DATABASE, "TRUNCATE"),
+        "stale_cache_entries": refresh_caches(DATABASE),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    database = argv[0] if argv else DATABASE
+    for task, result in run_once(database).items():
+        if result is not None:
+            print(f"{task}: {result}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
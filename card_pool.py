@@ -0,0 +1,125 @@
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+TABLE_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Monster Cards'"
+BUSY_TIMEOUT_MS = 1000 #How long one statement waits for a lock, WriteCards' retries wait longer than that in total
+
+
+#Each thread gets its own long lived connection so the schema is only parsed once,
+#the page cache stays warm and sqlite3's statement cache actually gets reused
+class ConnectionPool:
+    def __init__(
+        self,
+        database: str,
+        cache_size_kib: int = 8192,
+        cached_statements: int = 256,
+        warm: bool = True,
+        journal_mode: str = "WAL",
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+    ) -> None:
+        self.database = database
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        self.warm = warm
+        self.journal_mode = journal_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self) -> sqlite3.Connection:
+        #check_same_thread is off only so close_all() can close every connection at exit,
+        #each connection is still only handed out to the thread that opened it
+        connection = sqlite3.connect(
+            self.database,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+        )
+        #SQLite itself waits up to busy_timeout for a lock before giving up with "database is locked",
+        #and in WAL mode readers never block the writer (or the other way round)
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if self.journal_mode:
+            connection.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        connection.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}") #Negative means KiB instead of pages
+        connection.execute("PRAGMA temp_store = MEMORY")
+        if self.warm and connection.execute(TABLE_EXISTS).fetchone():
+            #Counting the rows walks every table page once, pulling them into the page cache.
+            #A brand new database has no card table yet, so there is nothing to warm
+            connection.execute("SELECT COUNT(*) FROM \"Monster Cards\"").fetchone()
+        return connection
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            with self._lock:
+                self.hits += 1
+            return connection
+        connection = self._open()
+        self._local.connection = connection
+        with self._lock:
+            self.misses += 1
+            self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        #Commits if the block finishes, rolls back if anything goes wrong.
+        #immediate takes the write lock up front, so a busy database is waited on (busy_timeout) at BEGIN
+        #instead of failing straight away halfway through when a read lock can't be upgraded
+        connection = self.connection()
+        if immediate and not connection.in_transaction:
+            connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "open": len(self._connections)}
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database: str) -> ConnectionPool:
+    #One shared pool per database path
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = ConnectionPool(database)
+            _pools[database] = pool
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    with _pools_lock:
+        return {database: pool.stats() for database, pool in _pools.items()}
+
+
+@atexit.register
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,192 @@
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from card_pool import get_pool
+from INTERNAL_functions import DATABASE, METRICS, SEARCH_CACHE, WriteCards
+
+STAT_COLUMNS = {"strength": "Strength", "speed": "Speed", "stealth": "Stealth", "cunning": "Cunning"}
+ORDER_COLUMNS = dict(STAT_COLUMNS, id="ID", name="Name")
+SCHEMA_VERSION = 2 #Stored in PRAGMA user_version once the indexes exist
+
+#Each stat gets its own index so a range on any one of them is a SEARCH instead of a SCAN,
+#Name uses NOCASE so a prefix search can be case insensitive and still use the index,
+#sorting by Name compares it as it is stored so that needs a plain index of its own
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_monster_cards_strength ON \"Monster Cards\" (Strength)",
+    "CREATE INDEX IF NOT EXISTS idx_monster_cards_speed ON \"Monster Cards\" (Speed)",
+    "CREATE INDEX IF NOT EXISTS idx_monster_cards_stealth ON \"Monster Cards\" (Stealth)",
+    "CREATE INDEX IF NOT EXISTS idx_monster_cards_cunning ON \"Monster Cards\" (Cunning)",
+    "CREATE INDEX IF NOT EXISTS idx_monster_cards_name ON \"Monster Cards\" (Name COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_monster_cards_name_order ON \"Monster Cards\" (Name)",
+)
+
+Range = Optional[Tuple[Optional[int], Optional[int]]]
+
+_migrated = set()
+
+
+def migrate(DATABASE: str) -> None:
+    #Safe to run more than once, ANALYZE gives the planner the stats it needs to pick the best index
+    def upgrade(connect: Any) -> None:
+        if connect.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return #Another program got there first
+        for statement in INDEXES:
+            connect.execute(statement)
+        connect.execute("ANALYZE \"Monster Cards\"")
+        connect.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    version = get_pool(DATABASE).connection().execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        WriteCards(DATABASE, upgrade) #Waits for (and retries past) other writers like every card write
+    _migrated.add(DATABASE)
+
+
+def ensure_migrated(DATABASE: str) -> None:
+    #migrate() checks the schema with a PRAGMA every time, after the first call this is only a set lookup
+    if DATABASE not in _migrated:
+        migrate(DATABASE)
+
+
+#NOCASE only folds A-Z to a-z, the prefix is folded the same way (so "É" still only matches "É")
+NOCASE_FOLD = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _prefix_bounds(prefix: str) -> Tuple[str, str]:
+    #"vex" becomes ["vex", "vey") which is a range the name index can jump straight to
+    low = prefix.translate(NOCASE_FOLD)
+    successor = chr(ord(low[-1]) + 1)
+    if "A" <= successor <= "Z":
+        #Only after "@": NOCASE would read "A" as "a", far past every name starting with "...@".
+        #"[" is the first character after "@" that NOCASE leaves alone
+        successor = "["
+    return low, low[:-1] + successor
+
+
+def build_where(
+    strength: Range = None,
+    speed: Range = None,
+    stealth: Range = None,
+    cunning: Range = None,
+    name_prefix: Optional[str] = None,
+) -> Tuple[str, List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    for stat, bounds in (("strength", strength), ("speed", speed), ("stealth", stealth), ("cunning", cunning)):
+        if bounds is None:
+            continue
+        low, high = bounds
+        column = STAT_COLUMNS[stat]
+        if low is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(int(low))
+        if high is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(int(high))
+    if name_prefix:
+        low, high = _prefix_bounds(name_prefix)
+        clauses.append("Name >= ? COLLATE NOCASE AND Name < ? COLLATE NOCASE")
+        params.extend((low, high))
+    return " AND ".join(clauses), params
+
+
+def build_search_query(
+    strength: Range = None,
+    speed: Range = None,
+    stealth: Range = None,
+    cunning: Range = None,
+    name_prefix: Optional[str] = None,
+    order_by: Optional[str] = None,
+    descending: bool = False,
+    limit: int = 50,
+) -> Tuple[str, List[Any]]:
+    order_key = (order_by or "id").lower()
+    if order_key not in ORDER_COLUMNS:
+        raise ValueError(f"Can't sort by {order_by!r}, pick one of {', '.join(ORDER_COLUMNS)}")
+    where, params = build_where(strength, speed, stealth, cunning, name_prefix)
+    order_column = ORDER_COLUMNS[order_key]
+    if where:
+        #The unary + stops the planner walking the whole table (or ORDER BY index) in order when
+        #a filter index would touch far fewer rows, the matches are sorted afterwards instead
+        order_column = "+" + order_column
+    direction = "DESC" if descending else "ASC"
+    sql = "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\""
+    if where:
+        sql += " WHERE " + where
+    tiebreak = f", {'+' if where else ''}ID {direction}" if order_key != "id" else ""
+    sql += f" ORDER BY {order_column} {direction}{tiebreak} LIMIT ?"
+    params.append(int(limit))
+    return sql, params
+
+
+@METRICS.trace('cards.search')
+def SearchCards(DATABASE: str, **filters: Any) -> List[Tuple[Any, ...]]:
+    ensure_migrated(DATABASE)
+    sql, params = build_search_query(**filters)
+    key = (DATABASE, sql, tuple(params))
+    cards = SEARCH_CACHE.get(key)
+    if cards is None:
+        token = SEARCH_CACHE.token(key)
+        cards = get_pool(DATABASE).connection().execute(sql, params).fetchall()
+        SEARCH_CACHE.set(key, cards, token)
+    return list(cards)
+
+
+def explain(DATABASE: str, **filters: Any) -> List[str]:
+    ensure_migrated(DATABASE)
+    sql, params = build_search_query(**filters)
+    rows = get_pool(DATABASE).connection().execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan: Sequence[str]) -> List[str]:
+    #A SCAN that doesn't go through an index reads every row of the table
+    return [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+
+
+def full_sorts(plan: Sequence[str]) -> List[str]:
+    #Without a filter the rows have to come out of an index (or the table) already in order,
+    #a temp B-tree means every row is read and sorted before the LIMIT is applied
+    return [step for step in plan if step.startswith("USE TEMP B-TREE")]
+
+
+def check_plans(DATABASE: str) -> Dict[str, List[str]]:
+    #Runs EXPLAIN QUERY PLAN over every single filter and sort combination (and every sort on its own),
+    #returns the ones that would read the whole table (an empty dict means all good)
+    failures: Dict[str, List[str]] = {}
+    for order_by in ORDER_COLUMNS:
+        for descending in (False, True):
+            case = {"order_by": order_by, "descending": descending}
+            plan = explain(DATABASE, **case)
+            if full_sorts(plan):
+                failures[repr(case)] = plan
+    cases: List[Dict[str, Any]] = [{"name_prefix": "a"}]
+    for stat in STAT_COLUMNS:
+        cases.append({stat: (15, None)})
+        cases.append({stat: (None, 5)})
+        cases.append({stat: (5, 15)})
+    cases.append({"speed": (15, None), "stealth": (None, 5)})
+    for case in list(cases):
+        for order_by in ORDER_COLUMNS:
+            cases.append(dict(case, order_by=order_by, descending=True))
+    for case in cases:
+        plan = explain(DATABASE, **case)
+        scans = full_scans(plan)
+        if scans:
+            failures[repr(case)] = plan
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    database = argv[0] if argv else DATABASE
+    migrate(database)
+    failures = check_plans(database)
+    for case, plan in failures.items():
+        print(f"Full table scan for {case}: {plan}")
+    if failures:
+        return 1
+    print("Every search uses an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
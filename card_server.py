@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from card_import import MAX_STAT, MIN_STAT, validate_card
+from card_maintenance import schedule_maintenance
+from card_pool import get_pool
+from card_search import ORDER_COLUMNS, SearchCards
+from card_stats import CardStatistics
+from card_writer import WriteQueue
+from INTERNAL_functions import (
+    DATABASE, PAGE_QUERY, PAGE_SIZE, STATS, BatchEditCards, DeleteCard, GetCard, InsertCard,
+)
+
+#A small HTTP/1.1 JSON service over the card functions. The event loop only parses and writes,
+#every SQLite call runs on a bounded thread pool and card_pool gives each of those threads its own connection.
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 100
+MAX_INTEGER = 2 ** 63 - 1 #The biggest whole number SQLite takes as a parameter
+CARD_FIELDS = ("id", "name") + STATS
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body", "keep_alive")
+
+    def __init__(self, method: str, target: str, version: str, headers: Dict[str, str], body: bytes) -> None:
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip("/") or "/"
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+        connection = headers.get("connection", "").lower()
+        #HTTP/1.1 keeps the connection open unless asked not to, HTTP/1.0 only if asked to
+        self.keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, f"body is not valid JSON: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return data
+
+
+def card_record(card: Tuple) -> Dict[str, Any]:
+    return dict(zip(CARD_FIELDS, card))
+
+
+def _int(query: Dict[str, str], key: str, default: Optional[int] = None) -> Optional[int]:
+    if key not in query:
+        return default
+    try:
+        value = int(query[key])
+    except ValueError:
+        raise HTTPError(400, f"{key} must be a whole number")
+    if not -MAX_INTEGER <= value <= MAX_INTEGER:
+        raise HTTPError(400, f"{key} is out of range")
+    return value
+
+
+def _filters(query: Dict[str, str]) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {"name_prefix": query.get("name_prefix") or None}
+    for stat in STATS:
+        low, high = _int(query, f"min_{stat}"), _int(query, f"max_{stat}")
+        if low is not None or high is not None:
+            filters[stat] = (low, high)
+    return filters
+
+
+def _page(DATABASE: str, after_id: int, size: int) -> List[Tuple]:
+    #One keyset page per executor call, so no cursor is ever shared between threads
+    return get_pool(DATABASE).connection().execute(PAGE_QUERY, (after_id, size)).fetchall()
+
+
+class CardServer:
+    def __init__(self, DATABASE: str = DATABASE, workers: int = 4, group_commit: bool = False,
+                 synchronous: str = "NORMAL", maintenance: bool = True) -> None:
+        self.DATABASE = DATABASE
+        self.maintenance = maintenance
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cards-db")
+        #With group commit, writes from every connection share transactions on the WriteQueue's thread
+        self.writes = WriteQueue(DATABASE, synchronous=synchronous) if group_commit else None
+
+    async def db(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        #Requests on one connection are answered in the order they arrive, which is all pipelining needs
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                try:
+                    await self.dispatch(request, writer)
+                except HTTPError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, request.keep_alive)
+                except sqlite3.Error as e:
+                    await self.send_json(writer, 500, {"error": str(e)}, request.keep_alive)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    #Anything else is a bug, but the client still gets an answer. Whatever state the
+                    #handler left behind, the connection isn't trusted with another request
+                    await self.send_json(writer, 500, {"error": f"internal error: {type(e).__name__}"}, False)
+                    break
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_line(self, reader: asyncio.StreamReader, status: int, message: str) -> bytes:
+        try:
+            return await reader.readline()
+        except ValueError: #A line longer than the reader's limit (64 KiB), readline has already thrown it away
+            raise HTTPError(status, message)
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        line = await self.read_line(reader, 400, "request line too long")
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "bad request line")
+        headers: Dict[str, str] = {}
+        while True:
+            header = await self.read_line(reader, 431, "header line too long")
+            if header in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, "too many headers")
+            name, _, value = header.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(400, "bad Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413, f"body bigger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, version.upper(), headers, body)
+
+    async def send(self, writer: asyncio.StreamWriter, status: int, body: bytes, keep_alive: bool,
+                   content_type: str = "application/json") -> None:
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def send_json(self, writer: asyncio.StreamWriter, status: int, data: Any, keep_alive: bool) -> None:
+        await self.send(writer, status, json.dumps(data, separators=(",", ":")).encode(), keep_alive)
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        parts = request.path.strip("/").split("/")
+        if parts == ["cards"]:
+            if request.method == "GET":
+                return await self.list_cards(request, writer)
+            if request.method == "POST":
+                return await self.add_card(request, writer)
+        elif len(parts) == 2 and parts[0] == "cards":
+            try:
+                monster_id = int(parts[1])
+            except ValueError:
+                raise HTTPError(404, "card IDs are whole numbers")
+            if not -MAX_INTEGER <= monster_id <= MAX_INTEGER:
+                raise HTTPError(404, f"no card with ID {monster_id}")
+            handlers = {"GET": self.get_card, "PATCH": self.edit_card, "DELETE": self.remove_card}
+            if request.method in handlers:
+                return await handlers[request.method](request, writer, monster_id)
+        elif parts == ["search"] and request.method == "GET":
+            return await self.search(request, writer)
+        elif parts == ["stats"] and request.method == "GET":
+            return await self.stats(request, writer)
+        else:
+            raise HTTPError(404, f"nothing at {request.path}")
+        raise HTTPError(405, f"{request.method} not allowed on {request.path}")
+
+    async def list_cards(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        #Streamed as chunked NDJSON one page at a time, so the first cards arrive straight away
+        #and a huge table never has to be in memory
+        page_size = max(1, min(_int(request.query, "page_size", PAGE_SIZE), 10000))
+        after_id = _int(request.query, "start_id", 1) - 1
+        remaining = _int(request.query, "limit")
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n"
+                      f"Connection: {'keep-alive' if request.keep_alive else 'close'}\r\n\r\n").encode("latin-1"))
+        try:
+            while remaining is None or remaining > 0:
+                size = page_size if remaining is None else min(page_size, remaining)
+                page = await self.db(_page, self.DATABASE, after_id, size)
+                if not page:
+                    break
+                chunk = "".join(json.dumps(card_record(card), separators=(",", ":")) + "\n" for card in page).encode()
+                writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+                await writer.drain()
+                after_id = page[-1][0]
+                if remaining is not None:
+                    remaining -= len(page)
+                if len(page) < size:
+                    break
+        except sqlite3.Error:
+            #The 200 and some of the body are already out, so there's no sending an error response now.
+            #Dropping the connection without the last chunk tells the client the list is incomplete
+            writer.transport.abort()
+            raise ConnectionAbortedError("listing the cards failed part way through")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def get_card(self, request: Request, writer: asyncio.StreamWriter, monster_id: int) -> None:
+        card = await self.db(GetCard, self.DATABASE, monster_id)
+        if card is None:
+            raise HTTPError(404, f"no card with ID {monster_id}")
+        await self.send_json(writer, 200, card_record(card), request.keep_alive)
+
+    async def add_card(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        values, reason = validate_card({key.lower(): value for key, value in request.json().items()})
+        if values is None:
+            raise HTTPError(400, reason)
+        if self.writes is not None:
+            monster_id = await asyncio.wrap_future(self.writes.insert(*values))
+        else:
+            monster_id = await self.db(InsertCard, self.DATABASE, *values)
+        await self.send_json(writer, 201, {"id": monster_id}, request.keep_alive)
+
+    async def edit_card(self, request: Request, writer: asyncio.StreamWriter, monster_id: int) -> None:
+        changes = {key.lower(): value for key, value in request.json().items()}
+        for stat, value in changes.items():
+            if stat not in STATS:
+                raise HTTPError(400, f"{stat!r} is not a valid stat")
+            if type(value) is not int or not MIN_STAT <= value <= MAX_STAT:
+                raise HTTPError(400, f"{stat} must be within {MIN_STAT} and {MAX_STAT}")
+        if not changes:
+            raise HTTPError(400, "nothing to change")
+        if self.writes is not None:
+            changed = await asyncio.wrap_future(self.writes.edit(monster_id, changes))
+        else:
+            changed = await self.db(BatchEditCards, self.DATABASE, [monster_id], changes)
+        if not changed:
+            raise HTTPError(404, f"no card with ID {monster_id}")
+        await self.send_json(writer, 200, {"changed": changed}, request.keep_alive)
+
+    async def remove_card(self, request: Request, writer: asyncio.StreamWriter, monster_id: int) -> None:
+        if self.writes is not None:
+            removed = await asyncio.wrap_future(self.writes.delete(monster_id))
+        else:
+            removed = await self.db(DeleteCard, self.DATABASE, monster_id)
+        if not removed:
+            raise HTTPError(404, f"no card with ID {monster_id}")
+        await self.send_json(writer, 200, {"removed": removed}, request.keep_alive)
+
+    async def search(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        order_by = request.query.get("order_by", "id").lower()
+        if order_by not in ORDER_COLUMNS:
+            raise HTTPError(400, f"order_by must be one of {', '.join(ORDER_COLUMNS)}")
+        descending = request.query.get("desc", "").lower() in ("1", "true", "yes")
+        limit = max(1, min(_int(request.query, "limit", 50), 10000))
+        cards = await self.db(SearchCards, self.DATABASE, order_by=order_by, descending=descending,
+                              limit=limit, **_filters(request.query))
+        await self.send_json(writer, 200, [card_record(card) for card in cards], request.keep_alive)
+
+    async def stats(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        report = await self.db(CardStatistics, self.DATABASE, **_filters(request.query))
+        await self.send_json(writer, 200, report, request.keep_alive)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving {self.DATABASE} on http://{host}:{port}")
+        #Checkpoints, PRAGMA optimize and cache refreshes happen on the scheduler's own thread
+        scheduler = schedule_maintenance(self.DATABASE) if self.maintenance else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if scheduler is not None:
+                scheduler.stop()
+            if self.writes is not None:
+                self.writes.close()
+            self.executor.shutdown(wait=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP/JSON service for the Monstars cards")
+    parser.add_argument("--db", default=DATABASE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="threads (and SQLite connections) for database work")
+    parser.add_argument("--group-commit", action="store_true", help="commit writes in batches on one writer thread")
+    parser.add_argument("--synchronous", choices=("OFF", "NORMAL", "FULL", "EXTRA"), default="NORMAL",
+                        help="durability of group commits (default: %(default)s)")
+    parser.add_argument("--no-maintenance", action="store_true", help="don't run background housekeeping")
+    args = parser.parse_args(argv)
+    try:
+        server = CardServer(args.db, args.workers, args.group_commit, args.synchronous, not args.no_maintenance)
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import mmap
+import os
+import struct
+import sys
+from typing import Any, List, Optional
+
+import numpy as np
+
+from card_import import MAX_NAME_LENGTH
+from card_pool import get_pool
+from card_store import MISSING_NAME, MISSING_STAT
+from INTERNAL_functions import DATABASE, INSERT_QUERY, InvalidateCards, WriteCards
+
+EXPORT_QUERY = "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" ORDER BY ID"
+
+#File layout: a 16 byte header then one fixed width record per card, all little endian
+#  header: magic "MCRD", format version (u16), record size (u16), card count (u64)
+#  record: ID (u32), name (14 bytes UTF-8, zero padded), strength, speed, stealth, cunning (u8 each)
+#Since version 2 a NULL is stored the way CardStore stores it: a stat of MISSING_STAT (255) or a name
+#of 0xFF bytes. Version 1 files had no NULLs and are still read
+MAGIC = b"MCRD"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+STAT_FIELDS = ("strength", "speed", "stealth", "cunning")
+HEADER = struct.Struct("<4sHHQ")
+RECORD_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("name", f"S{MAX_NAME_LENGTH}"),
+    ("strength", "u1"),
+    ("speed", "u1"),
+    ("stealth", "u1"),
+    ("cunning", "u1"),
+])
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def ExportSnapshot(DATABASE: str, path: str, chunk_size: int = 65536) -> int:
+    #Streams the table out chunk_size rows at a time, the count goes in the header once it is known.
+    #One ordered scan rather than CardPages, which starts at ID 1 and would leave out an ID 0
+    count = 0
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, 0))
+            cursor = get_pool(DATABASE).connection().execute(EXPORT_QUERY)
+            for page in iter(lambda: cursor.fetchmany(chunk_size), []):
+                names = [MISSING_NAME if card[1] is None else card[1].encode("utf-8") for card in page]
+                too_long = [name for name in names if len(name) > MAX_NAME_LENGTH]
+                if too_long:
+                    raise SnapshotError(f"name longer than {MAX_NAME_LENGTH} bytes: {too_long[0]!r}")
+                records = np.empty(len(page), dtype=RECORD_DTYPE)
+                try:
+                    records["id"] = [card[0] for card in page]
+                    records["name"] = names
+                    for index, stat in enumerate(STAT_FIELDS, start=2):
+                        values = [card[index] for card in page]
+                        if MISSING_STAT in values: #Would read back as a NULL
+                            raise ValueError(f"{stat} of {MISSING_STAT} is too big")
+                        records[stat] = [MISSING_STAT if value is None else value for value in values]
+                except (OverflowError, ValueError, TypeError) as e:
+                    raise SnapshotError(f"card doesn't fit the snapshot format: {e}") from e
+                handle.write(records.tobytes())
+                count += len(page)
+            handle.seek(0)
+            handle.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, count))
+        os.replace(tmp_path, path) #A half written snapshot never replaces a good one
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+class Snapshot:
+    #Maps the file and hands out views of it, nothing is read or copied until it's used.
+    #Keep the Snapshot open (or use it in a with block) for as long as the views are needed:
+    #close() releases every raw() view, and arrays taken from records (slices, etc.) keep the
+    #mapping alive on their own until they're gone, so none of them ever points at unmapped memory.
+    def __init__(self, path: str) -> None:
+        self._views: List[memoryview] = []
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: #An empty file can't be mapped
+            self._file.close()
+            raise SnapshotError(f"{path} is empty")
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"{path} is too short to be a snapshot")
+        magic, version, record_size, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f"{path} is not a card snapshot")
+        if version not in READABLE_VERSIONS or record_size != RECORD_DTYPE.itemsize:
+            self.close()
+            raise SnapshotError(f"{path} is snapshot version {version}, this reads version {VERSION}")
+        if HEADER.size + count * record_size > len(self._mmap):
+            self.close()
+            raise SnapshotError(f"{path} is cut short")
+        self.version = version
+        self.count = count
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+
+    def raw(self) -> memoryview:
+        #The records as plain bytes, for code that doesn't want NumPy. Released by close(), copy it to keep it
+        with memoryview(self._mmap) as whole:
+            view = whole[HEADER.size:HEADER.size + self.count * RECORD_DTYPE.itemsize]
+        self._views.append(view)
+        return view
+
+    def card(self, index: int) -> tuple:
+        record = self.records[index]
+        return _card(self.version, record["id"].item(), record["name"].item(),
+                     [record[stat].item() for stat in STAT_FIELDS])
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        self._views = []
+        self.records = None
+        if getattr(self, "_mmap", None) is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass #Someone still has an array from records, the mapping goes when the last one does
+            self._mmap = None
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _card(version: int, monster_id: int, name: bytes, stats: List[int]) -> tuple:
+    #One record as a database row, with the NULLs put back
+    if version >= 2:
+        name = None if name == MISSING_NAME else name
+        stats = [None if value == MISSING_STAT else value for value in stats]
+    return (monster_id, None if name is None else name.decode("utf-8"), *stats)
+
+
+def _insert_records(connection, records: np.ndarray, version: int, keep_ids: bool, chunk_size: int) -> None:
+    query = INSERT_QUERY
+    if keep_ids:
+        query = "INSERT INTO \"Monster Cards\" (ID, name, strength, speed, stealth, cunning) VALUES (?, ?, ?, ?, ?, ?)"
+    for start in range(0, len(records), chunk_size):
+        block = records[start:start + chunk_size]
+        columns = zip(*(block[stat].tolist() for stat in STAT_FIELDS))
+        cards = [_card(version, *record) for record in zip(block["id"].tolist(), block["name"].tolist(), columns)]
+        connection.executemany(query, cards if keep_ids else [card[1:] for card in cards])
+
+
+def ImportSnapshot(DATABASE: str, path: str, keep_ids: bool = False, chunk_size: int = 65536) -> int:
+    #Loads a snapshot into the card table in one transaction, new IDs unless keep_ids is set
+    with Snapshot(path) as snapshot:
+        #The records are all still in the file, so a busy database just means trying the whole thing again
+        WriteCards(DATABASE, lambda connect: _insert_records(connect, snapshot.records, snapshot.version,
+                                                             keep_ids, chunk_size))
+        count = snapshot.count
+    InvalidateCards(DATABASE)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] not in ("export", "import", "info"):
+        print("Usage: python card_snapshot.py export|import|info FILE [DATABASE]")
+        return 2
+    command, path = argv[0], argv[1]
+    database = argv[2] if len(argv) > 2 else DATABASE
+    try:
+        if command == "export":
+            print(f"Wrote {ExportSnapshot(database, path)} cards to {path}")
+        elif command == "import":
+            print(f"Imported {ImportSnapshot(database, path)} cards from {path}")
+        else:
+            with Snapshot(path) as snapshot:
+                print(f"{path}: version {snapshot.version}, {snapshot.count} cards")
+    except (OSError, SnapshotError) as e:
+        print(f"An error occurred: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
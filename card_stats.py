@@ -0,0 +1,120 @@
+import math
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from card_pool import get_pool
+from card_search import STAT_COLUMNS, build_where, ensure_migrated
+from config2 import DataAggregator
+from INTERNAL_functions import DATABASE, METRICS
+
+PERCENTILES = (25, 50, 75, 90, 99)
+
+
+def _percentiles(histogram: Sequence[Tuple[int, int]], count: int, percentiles: Sequence[int]) -> Dict[str, Optional[int]]:
+    #Nearest-rank percentiles straight from (value, how many cards have it) pairs sorted by value,
+    #stats only take a handful of values so this never needs the rows themselves
+    result: Dict[str, Optional[int]] = {}
+    for percentile in percentiles:
+        if count == 0:
+            result[f"p{percentile}"] = None
+            continue
+        rank = max(1, math.ceil(percentile / 100 * count))
+        seen = 0
+        for value, amount in histogram:
+            seen += amount
+            if seen >= rank:
+                result[f"p{percentile}"] = value
+                break
+    return result
+
+
+@METRICS.trace('cards.statistics')
+def CardStatistics(DATABASE: str, percentiles: Sequence[int] = PERCENTILES, **filters: Any) -> Dict[str, Dict[str, Any]]:
+    #count, mean, min, max, population standard deviation and percentiles for each stat,
+    #over every card or only the ones matching the same filters SearchCards takes
+    if not any(value is not None for value in filters.values()):
+        from card_summary import CardSummary, summary_installed #Imported here, card_summary imports this file
+        if summary_installed(DATABASE):
+            return CardSummary(DATABASE, percentiles) #Kept up to date by triggers, no scan needed
+    ensure_migrated(DATABASE) #The stat indexes make the GROUP BYs below index only scans
+    where, params = build_where(**filters)
+    where_sql = f" WHERE {where}" if where else ""
+    connection = get_pool(DATABASE).connection()
+    #A card with no value for a stat (NULL) is left out of that stat's numbers, count included
+    columns = ", ".join(
+        f"COUNT({column}), AVG({column}), MIN({column}), MAX({column}), SUM({column} * {column})"
+        for column in STAT_COLUMNS.values()
+    )
+    totals = connection.execute(f"SELECT {columns} FROM \"Monster Cards\"{where_sql}", params).fetchone()
+    report: Dict[str, Dict[str, Any]] = {}
+    for index, (stat, column) in enumerate(STAT_COLUMNS.items()):
+        count, mean, low, high, sum_squares = totals[index * 5:5 + index * 5]
+        if count:
+            variance = max(0.0, sum_squares / count - mean * mean)
+            std = math.sqrt(variance)
+        else:
+            std = None
+        not_null = f"{where_sql} AND {column} IS NOT NULL" if where else f" WHERE {column} IS NOT NULL"
+        histogram = connection.execute(
+            f"SELECT {column}, COUNT(*) FROM \"Monster Cards\"{not_null} GROUP BY {column} ORDER BY {column}", params
+        ).fetchall()
+        report[stat] = {"count": count, "mean": mean, "min": low, "max": high, "std": std}
+        report[stat].update(_percentiles(histogram, count, percentiles))
+    return report
+
+
+def aggregate_cards(cards: Iterable[Sequence[Any]], aggregators: Optional[Dict[str, DataAggregator]] = None,
+                    first_stat: int = 2) -> Dict[str, DataAggregator]:
+    #For cards that aren't in the database (an import file, a snapshot, a stream), one pass in constant memory.
+    #first_stat is where the stats start in each row, 2 for database rows. Pass the same aggregators
+    #to keep adding, or DataAggregator.merge() ones built elsewhere.
+    aggregators = aggregators or {stat: DataAggregator() for stat in STAT_COLUMNS}
+    columns = [(aggregators[stat], first_stat + index) for index, stat in enumerate(STAT_COLUMNS)]
+    for card in cards:
+        for aggregator, index in columns:
+            value = card[index]
+            if value is not None: #Left out of that stat, the same as CardStatistics does in SQL
+                aggregator.add_value(value)
+    return aggregators
+
+
+def StreamStatistics(aggregators: Dict[str, DataAggregator],
+                     percentiles: Sequence[int] = PERCENTILES) -> Dict[str, Dict[str, Any]]:
+    #The same report as CardStatistics, from aggregate_cards(). Percentiles come from the quantile sketch,
+    #they're exact until a few hundred cards and within about half a percent of rank after that
+    report: Dict[str, Dict[str, Any]] = {}
+    for stat, aggregator in aggregators.items():
+        count = aggregator.count()
+        report[stat] = {"count": count, "mean": aggregator.mean() if count else None,
+                        "min": aggregator.min() if count else None, "max": aggregator.max() if count else None,
+                        "std": aggregator.std() if count else None}
+        report[stat].update({f"p{percentile}": aggregator.percentile(percentile) if count else None
+                             for percentile in percentiles})
+    return report
+
+
+def format_statistics(report: Dict[str, Dict[str, Any]]) -> str:
+    fields = [field for field in next(iter(report.values()))]
+    lines = ["stat      " + "".join(f"{field:>9}" for field in fields)]
+    for stat, values in report.items():
+        cells = []
+        for field in fields:
+            value = values[field]
+            if value is None:
+                cells.append(f"{'-':>9}")
+            elif isinstance(value, float):
+                cells.append(f"{value:>9.2f}")
+            else:
+                cells.append(f"{value:>9}")
+        lines.append(f"{stat:<10}" + "".join(cells))
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    sys.stdout.write(format_statistics(CardStatistics(argv[0] if argv else DATABASE)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
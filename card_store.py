@@ -0,0 +1,214 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from card_import import MAX_NAME_LENGTH
+from INTERNAL_functions import PAGE_SIZE, STATS, CardPages
+
+#A card in a CardStore costs 4 bytes of ID, 4 bytes of stats and a 14 byte name slot (22 bytes in total)
+#instead of a tuple of Python objects, so a few million cards fit in tens of megabytes
+#NULLs (a card with no value for a stat, or no name) are stored as values a real card can't have:
+#MISSING_STAT in a stat's array and a name slot of 0xFF bytes, which is never valid UTF-8
+MAX_ID = 2 ** 32 - 1 #What fits in array('I')
+MISSING_STAT = 255
+MAX_STORED_STAT = MISSING_STAT - 1
+MISSING_NAME = b"\xff" * MAX_NAME_LENGTH
+
+
+class Card:
+    #A lightweight view of one card in a CardStore, reading or setting a stat goes straight to the arrays
+    #(a new value is checked first, the same way add() checks it).
+    #Views point at a position, so get them again after add() or remove() moves cards around
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: "CardStore", index: int) -> None:
+        self._store = store
+        self._index = index
+
+    @property
+    def id(self) -> int:
+        return self._store.ids[self._index]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._store.name_at(self._index)
+
+    @property
+    def strength(self) -> Optional[int]:
+        value = self._store.strength[self._index]
+        return None if value == MISSING_STAT else value
+
+    @strength.setter
+    def strength(self, value: Optional[int]) -> None:
+        self._store.strength[self._index] = self._store._check_stat("strength", value)
+
+    @property
+    def speed(self) -> Optional[int]:
+        value = self._store.speed[self._index]
+        return None if value == MISSING_STAT else value
+
+    @speed.setter
+    def speed(self, value: Optional[int]) -> None:
+        self._store.speed[self._index] = self._store._check_stat("speed", value)
+
+    @property
+    def stealth(self) -> Optional[int]:
+        value = self._store.stealth[self._index]
+        return None if value == MISSING_STAT else value
+
+    @stealth.setter
+    def stealth(self, value: Optional[int]) -> None:
+        self._store.stealth[self._index] = self._store._check_stat("stealth", value)
+
+    @property
+    def cunning(self) -> Optional[int]:
+        value = self._store.cunning[self._index]
+        return None if value == MISSING_STAT else value
+
+    @cunning.setter
+    def cunning(self, value: Optional[int]) -> None:
+        self._store.cunning[self._index] = self._store._check_stat("cunning", value)
+
+    def as_tuple(self) -> tuple:
+        #Same shape as a row from the database
+        return (self.id, self.name, self.strength, self.speed, self.stealth, self.cunning)
+
+    def __repr__(self) -> str:
+        return f"Card{self.as_tuple()!r}"
+
+
+class CardStore:
+    #Struct of arrays: IDs in one array('I') kept sorted, each stat in its own array('B') (one byte per card)
+    #and names in one bytearray of fixed 14 byte slots, card i's name starting at byte 14 * i
+    __slots__ = ("ids", "strength", "speed", "stealth", "cunning", "_names")
+
+    def __init__(self) -> None:
+        self.ids = array("I")
+        self.strength = array("B")
+        self.speed = array("B")
+        self.stealth = array("B")
+        self.cunning = array("B")
+        self._names = bytearray()
+
+    @classmethod
+    def load(cls, DATABASE: str, page_size: int = PAGE_SIZE) -> "CardStore":
+        #Bulk load in ID order, one page of rows in memory at a time
+        store = cls()
+        for page in CardPages(DATABASE, page_size):
+            store.extend(page)
+        return store
+
+    def _encode_name(self, name: Optional[str]) -> bytes:
+        if name is None:
+            return MISSING_NAME
+        if not isinstance(name, str):
+            raise ValueError(f"name must be text, got {name!r}")
+        data = name.encode("utf-8")
+        if len(data) > MAX_NAME_LENGTH:
+            raise ValueError(f"name longer than {MAX_NAME_LENGTH} bytes: {name!r}")
+        return data.ljust(MAX_NAME_LENGTH, b"\0")
+
+    @staticmethod
+    def _check_stat(stat: str, value: Optional[int]) -> int:
+        #The value as it's stored, None (NULL) becomes MISSING_STAT
+        if value is None:
+            return MISSING_STAT
+        if not isinstance(value, int) or not 0 <= value <= MAX_STORED_STAT:
+            raise ValueError(f"{stat} must be a whole number within 0 and {MAX_STORED_STAT}, got {value!r}")
+        return value
+
+    def _check_row(self, card: Sequence) -> Tuple[int, bytes, List[int]]:
+        #Everything about a card is checked before any column is touched, so a bad card can't leave
+        #the columns different lengths
+        monster_id, name, *stats = card
+        if not isinstance(monster_id, int) or not 0 <= monster_id <= MAX_ID:
+            raise ValueError(f"ID must be a whole number within 0 and {MAX_ID}, got {monster_id!r}")
+        if len(stats) != len(STATS):
+            raise ValueError(f"a card needs an ID, a name and {len(STATS)} stats")
+        return monster_id, self._encode_name(name), [self._check_stat(*pair) for pair in zip(STATS, stats)]
+
+    def extend(self, cards: Iterable[Sequence]) -> None:
+        #Cards must come in increasing ID order after everything already stored (as CardPages gives them).
+        #The whole batch is checked first, if any card is bad nothing is added
+        rows = [self._check_row(card) for card in cards]
+        last_id = self.ids[-1] if self.ids else -1
+        for monster_id, _, _ in rows:
+            if monster_id <= last_id:
+                raise ValueError("cards must be added in increasing ID order, use add() for anything else")
+            last_id = monster_id
+        self._names += b"".join(name for _, name, _ in rows)
+        self.ids.extend(monster_id for monster_id, _, _ in rows)
+        for index, column in enumerate((self.strength, self.speed, self.stealth, self.cunning)):
+            column.extend(stats[index] for _, _, stats in rows)
+
+    def add(self, monster_id: int, name: Optional[str], strength: Optional[int], speed: Optional[int],
+            stealth: Optional[int], cunning: Optional[int]) -> Card:
+        monster_id, encoded, stats = self._check_row((monster_id, name, strength, speed, stealth, cunning))
+        index = bisect_left(self.ids, monster_id)
+        if index < len(self.ids) and self.ids[index] == monster_id:
+            raise KeyError(f"there is already a card with ID {monster_id}")
+        slot = index * MAX_NAME_LENGTH
+        self._names[slot:slot] = encoded
+        self.ids.insert(index, monster_id)
+        for column, value in zip((self.strength, self.speed, self.stealth, self.cunning), stats):
+            column.insert(index, value)
+        return Card(self, index)
+
+    def index_of(self, monster_id: int) -> Optional[int]:
+        #Binary search over the sorted IDs, so no per-card dict is needed
+        index = bisect_left(self.ids, monster_id)
+        if index < len(self.ids) and self.ids[index] == monster_id:
+            return index
+        return None
+
+    def get(self, monster_id: int) -> Optional[Card]:
+        index = self.index_of(monster_id)
+        return None if index is None else Card(self, index)
+
+    def name_at(self, index: int) -> Optional[str]:
+        slot = index * MAX_NAME_LENGTH
+        data = bytes(self._names[slot:slot + MAX_NAME_LENGTH])
+        if data == MISSING_NAME:
+            return None
+        return data.rstrip(b"\0").decode("utf-8")
+
+    def column(self, stat: str) -> array:
+        #The stat's array itself, e.g. numpy.frombuffer(store.column("speed"), dtype=numpy.uint8) shares its memory.
+        #NULLs are MISSING_STAT in it, mask them out before doing sums
+        stat = stat.lower()
+        if stat not in STATS:
+            raise ValueError(f"{stat!r} is not a valid stat")
+        return getattr(self, stat)
+
+    def edit(self, monstersID: int, stat: str, newvalue: Optional[int]) -> bool:
+        #The in-memory version of EditCards, returns False if there is no card with that ID
+        column = self.column(stat)
+        stored = self._check_stat(stat.lower(), newvalue)
+        index = self.index_of(monstersID)
+        if index is None:
+            return False
+        column[index] = stored
+        return True
+
+    def remove(self, monsterID: int) -> bool:
+        index = self.index_of(monsterID)
+        if index is None:
+            return False
+        slot = index * MAX_NAME_LENGTH
+        del self._names[slot:slot + MAX_NAME_LENGTH]
+        for column in (self.ids, self.strength, self.speed, self.stealth, self.cunning):
+            del column[index]
+        return True
+
+    def nbytes(self) -> int:
+        arrays = (self.ids, self.strength, self.speed, self.stealth, self.cunning)
+        return sum(column.itemsize * len(column) for column in arrays) + len(self._names)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Card]:
+        return (Card(self, index) for index in range(len(self.ids)))
+
+    def __contains__(self, monster_id: int) -> bool:
+        return self.index_of(monster_id) is not None
@@ -0,0 +1,238 @@
+import math
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+from card_pool import get_pool
+from card_stats import PERCENTILES, _percentiles
+from INTERNAL_functions import DATABASE, METRICS, STATS, WriteCards
+
+#A one row table of running totals plus a (stat, value) -> how many cards histogram, kept up to date by
+#triggers on "Monster Cards". Whoever writes the cards (this program or not) keeps them right, and
+#questions like "how many cards" or "average Strength" are answered without reading a single card.
+SUMMARY_TABLE = "Card Summary"
+HISTOGRAM_TABLE = "Card Stat Histogram"
+TRIGGERS = ("card_summary_insert", "card_summary_delete", "card_summary_update")
+#Every card counts towards "cards", but a stat's count, sum and squares only take the cards that have that stat
+#(like COUNT and SUM in SQL), so a NULL doesn't pull the mean down as if it were a 0
+COLUMNS = ["cards"] + [f"{stat}_{total}" for stat in STATS for total in ("count", "sum", "squares")]
+
+
+def _totals(sign: str, row: str) -> str:
+    #"cards = cards + 1, strength_count = strength_count + (NEW.strength IS NOT NULL), ..." for one row going in or out
+    parts = [f"cards = cards {sign} 1"]
+    for stat in STATS:
+        value = f"COALESCE({row}.{stat}, 0)"
+        parts.append(f"{stat}_count = {stat}_count {sign} ({row}.{stat} IS NOT NULL)")
+        parts.append(f"{stat}_sum = {stat}_sum {sign} {value}")
+        parts.append(f"{stat}_squares = {stat}_squares {sign} {value} * {value}")
+    return f"UPDATE \"{SUMMARY_TABLE}\" SET {', '.join(parts)} WHERE id = 1;"
+
+
+def _histogram(sign: str, row: str) -> str:
+    statements = []
+    for stat in STATS:
+        if sign == "+":
+            statements.append(f"INSERT OR IGNORE INTO \"{HISTOGRAM_TABLE}\" (stat, value, cards) "
+                              f"SELECT '{stat}', {row}.{stat}, 0 WHERE {row}.{stat} IS NOT NULL;")
+        statements.append(f"UPDATE \"{HISTOGRAM_TABLE}\" SET cards = cards {sign} 1 "
+                          f"WHERE stat = '{stat}' AND value = {row}.{stat};")
+    return "\n    ".join(statements)
+
+
+SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS \"{SUMMARY_TABLE}\" (id INTEGER PRIMARY KEY CHECK (id = 1), "
+    + ", ".join(f"{column} INTEGER NOT NULL" for column in COLUMNS) + ")",
+    f"CREATE TABLE IF NOT EXISTS \"{HISTOGRAM_TABLE}\" (stat TEXT NOT NULL, value INTEGER NOT NULL, "
+    "cards INTEGER NOT NULL, PRIMARY KEY (stat, value)) WITHOUT ROWID",
+    f"""CREATE TRIGGER IF NOT EXISTS card_summary_insert AFTER INSERT ON "Monster Cards" BEGIN
+    {_totals("+", "NEW")}
+    {_histogram("+", "NEW")}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS card_summary_delete AFTER DELETE ON "Monster Cards" BEGIN
+    {_totals("-", "OLD")}
+    {_histogram("-", "OLD")}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS card_summary_update AFTER UPDATE OF {", ".join(STATS)} ON "Monster Cards" BEGIN
+    {_totals("-", "OLD")}
+    {_histogram("-", "OLD")}
+    {_totals("+", "NEW")}
+    {_histogram("+", "NEW")}
+END""",
+]
+
+#What the summary should hold, worked out the slow way by reading every card
+SCAN_TOTALS = "SELECT COUNT(*), " + ", ".join(
+    f"COUNT({stat}), COALESCE(SUM({stat}), 0), COALESCE(SUM({stat} * {stat}), 0)" for stat in STATS) + " FROM \"Monster Cards\""
+SCAN_HISTOGRAM = " UNION ALL ".join(
+    f"SELECT '{stat}', {stat}, COUNT(*) FROM \"Monster Cards\" WHERE {stat} IS NOT NULL GROUP BY {stat}"
+    for stat in STATS)
+
+#The triggers, a per-stat count column (which a summary installed by an older version doesn't have) and the tables
+INSTALLED_QUERY = ("SELECT (SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?, ?)), "
+                   "(SELECT COUNT(*) FROM pragma_table_info(?) WHERE name = ?), "
+                   "(SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?))")
+INSTALLED_PARAMS = TRIGGERS + (SUMMARY_TABLE, f"{STATS[0]}_count", SUMMARY_TABLE, HISTOGRAM_TABLE)
+
+_installed: Dict[str, int] = {} #Database -> its schema_version when the summary was last found
+
+
+def summary_installed(DATABASE: str) -> bool:
+    #schema_version goes up whenever anything (this program or another) changes the schema,
+    #so the summary is only looked for again after something could have dropped it
+    connection = get_pool(DATABASE).connection()
+    version = connection.execute("PRAGMA schema_version").fetchone()[0]
+    if _installed.get(DATABASE) == version:
+        return True
+    triggers, columns, tables = connection.execute(INSTALLED_QUERY, INSTALLED_PARAMS).fetchone()
+    if triggers == len(TRIGGERS) and columns == 1 and tables == 2:
+        _installed[DATABASE] = version
+        return True
+    _installed.pop(DATABASE, None)
+    if triggers and tables < 2:
+        #Another program dropped a table and left the triggers, which would make every card write fail
+        WriteCards(DATABASE, _drop_orphaned)
+    return False
+
+
+def _fill(connect: Any) -> None:
+    connect.execute(f"DELETE FROM \"{SUMMARY_TABLE}\"")
+    connect.execute(f"DELETE FROM \"{HISTOGRAM_TABLE}\"")
+    totals = connect.execute(SCAN_TOTALS).fetchone()
+    connect.execute(f"INSERT INTO \"{SUMMARY_TABLE}\" (id, {', '.join(COLUMNS)}) "
+                    f"VALUES (1, {', '.join('?' * len(totals))})", totals)
+    connect.execute(f"INSERT INTO \"{HISTOGRAM_TABLE}\" (stat, value, cards) {SCAN_HISTOGRAM}")
+
+
+def _drop(connect: Any) -> None:
+    for trigger in TRIGGERS:
+        connect.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    connect.execute(f"DROP TABLE IF EXISTS \"{SUMMARY_TABLE}\"")
+    connect.execute(f"DROP TABLE IF EXISTS \"{HISTOGRAM_TABLE}\"")
+
+
+def _drop_orphaned(connect: Any) -> None:
+    #Checked again inside the write transaction, someone may have reinstalled the summary since
+    triggers, _, tables = connect.execute(INSTALLED_QUERY, INSTALLED_PARAMS).fetchone()
+    if triggers and tables < 2:
+        _drop(connect)
+
+
+def install_summary(DATABASE: str) -> None:
+    #Safe to run more than once. The tables, triggers and first fill go in one transaction,
+    #so no write can slip in between the scan and the triggers starting to count
+    def install(connect: Any) -> None:
+        columns = {row[1] for row in connect.execute(f"PRAGMA table_info(\"{SUMMARY_TABLE}\")")}
+        if columns and not columns.issuperset(COLUMNS):
+            _drop(connect) #Installed by an older version, it's put back the new way and counted again
+        for statement in SCHEMA:
+            connect.execute(statement)
+        if connect.execute(f"SELECT COUNT(*) FROM \"{SUMMARY_TABLE}\"").fetchone()[0] == 0:
+            _fill(connect)
+    WriteCards(DATABASE, install)
+
+
+def rebuild_summary(DATABASE: str) -> None:
+    #Throws the totals away and counts every card again
+    install_summary(DATABASE)
+    WriteCards(DATABASE, _fill)
+
+
+def drop_summary(DATABASE: str) -> None:
+    WriteCards(DATABASE, _drop)
+    _installed.pop(DATABASE, None)
+
+
+def check_summary(DATABASE: str) -> List[str]:
+    #Compares the summary with a full scan, returns what doesn't match (nothing if it's right).
+    #Both are read in one transaction so a write in between can't show up as a difference
+    if not summary_installed(DATABASE):
+        return ["the summary isn't installed (or was installed by an older version)"]
+    connection = get_pool(DATABASE).connection()
+    problems = []
+    #sqlite3 doesn't start one for SELECTs by itself. Inside a caller's transaction the reads already
+    #agree, and that transaction is the caller's to end
+    own_transaction = not connection.in_transaction
+    if own_transaction:
+        connection.execute("BEGIN")
+    try:
+        stored = connection.execute(f"SELECT * FROM \"{SUMMARY_TABLE}\" WHERE id = 1").fetchone()
+        actual = connection.execute(SCAN_TOTALS).fetchone()
+        stored_histogram = set(connection.execute(
+            f"SELECT stat, value, cards FROM \"{HISTOGRAM_TABLE}\" WHERE cards != 0").fetchall())
+        actual_histogram = set(connection.execute(SCAN_HISTOGRAM).fetchall())
+    finally:
+        if own_transaction:
+            connection.commit()
+    if stored is None:
+        return ["the summary row is missing"]
+    for name, have, want in zip(COLUMNS, stored[1:], actual):
+        if have != want:
+            problems.append(f"{name} is {have}, should be {want}")
+    for stat, value, cards in sorted(stored_histogram - actual_histogram, key=str):
+        problems.append(f"histogram {stat}={value} has {cards} card(s) that don't match the table")
+    for stat, value, cards in sorted(actual_histogram - stored_histogram, key=str):
+        problems.append(f"histogram {stat}={value} should have {cards} card(s)")
+    return problems
+
+
+def CardCount(DATABASE: str) -> int:
+    return get_pool(DATABASE).connection().execute(f"SELECT cards FROM \"{SUMMARY_TABLE}\" WHERE id = 1").fetchone()[0]
+
+
+@METRICS.trace('cards.summary')
+def CardSummary(DATABASE: str, percentiles: Sequence[int] = PERCENTILES) -> Dict[str, Dict[str, Any]]:
+    #The same report as CardStatistics for the whole table, from one summary row and a histogram row per
+    #distinct stat value (20 or so per stat), however many cards there are
+    connection = get_pool(DATABASE).connection()
+    row = connection.execute(f"SELECT * FROM \"{SUMMARY_TABLE}\" WHERE id = 1").fetchone()
+    histograms: Dict[str, List] = {stat: [] for stat in STATS}
+    for stat, value, cards in connection.execute(
+            f"SELECT stat, value, cards FROM \"{HISTOGRAM_TABLE}\" WHERE cards > 0 ORDER BY stat, value"):
+        histograms[stat].append((value, cards))
+    report: Dict[str, Dict[str, Any]] = {}
+    for index, stat in enumerate(STATS):
+        count, total, squares = row[2 + index * 3:5 + index * 3]
+        histogram = histograms[stat]
+        mean = total / count if count else None
+        std = math.sqrt(max(0.0, squares / count - mean * mean)) if count else None
+        report[stat] = {"count": count, "mean": mean, "min": histogram[0][0] if histogram else None,
+                        "max": histogram[-1][0] if histogram else None, "std": std}
+        report[stat].update(_percentiles(histogram, sum(cards for _, cards in histogram), percentiles))
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ("install", "check", "rebuild", "drop", "show"):
+        print("Usage: python card_summary.py install|check|rebuild|drop|show [DATABASE]")
+        return 2
+    command = argv[0]
+    database = argv[1] if len(argv) > 1 else DATABASE
+    if command == "install":
+        install_summary(database)
+        print("Summary installed")
+    elif command == "rebuild":
+        rebuild_summary(database)
+        print("Summary rebuilt")
+    elif command == "drop":
+        drop_summary(database)
+        print("Summary dropped")
+    elif command == "check":
+        problems = check_summary(database)
+        for problem in problems:
+            print(problem)
+        if problems:
+            print("Run 'python card_summary.py rebuild' to fix it")
+            return 1
+        print("Summary matches the cards")
+    else:
+        if not summary_installed(database):
+            print("The summary isn't installed, run 'python card_summary.py install' first")
+            return 1
+        from card_stats import format_statistics
+        sys.stdout.write(format_statistics(CardSummary(database)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
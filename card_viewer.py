@@ -0,0 +1,176 @@
+import sys
+from typing import List, Optional, Tuple
+
+from card_pool import get_pool
+from INTERNAL_functions import DATABASE, PAGE_QUERY, FormatCard, TABLE_TOP, TABLE_BOTTOM
+
+#Keyset queries in both directions, so every fetch costs the same however far into the table it is
+BEFORE_QUERY = "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" WHERE ID < ? ORDER BY ID DESC LIMIT ?"
+LAST_ID = 2 ** 63 - 1 #Bigger than any SQLite rowid
+
+Card = Tuple
+
+
+class CardWindow:
+    #Holds the visible rows plus at most `margin` rows either side of them and nothing else,
+    #so memory and the work per keystroke stay the same for 100 cards or 10 million
+    def __init__(self, DATABASE: str, height: int, margin: Optional[int] = None) -> None:
+        self.DATABASE = DATABASE
+        self.height = max(1, height)
+        self.margin = margin if margin is not None else self.height
+        self.rows: List[Card] = []
+        self.offset = 0 #Index in self.rows of the first visible row
+        self.jump(1)
+
+    def _after(self, monster_id: int, count: int) -> List[Card]:
+        return get_pool(self.DATABASE).connection().execute(PAGE_QUERY, (monster_id, count)).fetchmany(count)
+
+    def _before(self, monster_id: int, count: int) -> List[Card]:
+        rows = get_pool(self.DATABASE).connection().execute(BEFORE_QUERY, (monster_id, count)).fetchmany(count)
+        rows.reverse()
+        return rows
+
+    def visible(self) -> List[Card]:
+        return self.rows[self.offset:self.offset + self.height]
+
+    def jump(self, monster_id: int) -> None:
+        #Shows the first card with an ID at or after monster_id (or the last screen if there isn't one)
+        after = self._after(monster_id - 1, self.height + self.margin)
+        if len(after) < self.height:
+            self.end()
+            return
+        before = self._before(after[0][0], self.margin)
+        self.rows = before + after
+        self.offset = len(before)
+
+    def home(self) -> None:
+        self.jump(1)
+
+    def end(self) -> None:
+        self.rows = self._before(LAST_ID, self.height + self.margin)
+        self.offset = max(0, len(self.rows) - self.height)
+
+    def scroll(self, delta: int) -> None:
+        if not self.rows:
+            self.jump(1)
+            return
+        target = self.offset + delta
+        if delta > 0 and target + self.height > len(self.rows):
+            #Lazily pulls in the next page once the screen gets near the end of what is loaded
+            needed = target + self.height - len(self.rows)
+            self.rows.extend(self._after(self.rows[-1][0], needed + self.margin))
+        elif delta < 0 and target < 0:
+            extra = self._before(self.rows[0][0], -target + self.margin)
+            self.rows[:0] = extra
+            target += len(extra)
+        target = max(0, min(target, len(self.rows) - self.height))
+        #Forget anything more than `margin` rows away from the screen
+        start = max(0, target - self.margin)
+        stop = target + self.height + self.margin
+        self.rows = self.rows[start:stop]
+        self.offset = target - start
+
+    def resize(self, height: int) -> None:
+        first = self.visible()
+        self.height = max(1, height)
+        self.margin = max(self.margin, self.height)
+        self.jump(first[0][0] if first else 1)
+
+
+def parse_id(text: str) -> Optional[int]:
+    #A card ID typed by the user, None if it isn't one. Nothing past LAST_ID can be a card,
+    #and SQLite can't take a bigger number as a parameter at all
+    text = text.strip()
+    if not text.isdecimal():
+        return None
+    monster_id = int(text)
+    return monster_id if monster_id <= LAST_ID else None
+
+
+def _header_lines() -> List[str]:
+    return TABLE_TOP.strip("\n").split("\n")
+
+
+def browse(stdscr, DATABASE: str) -> None:
+    import curses
+
+    curses.curs_set(0)
+    header = _header_lines()
+    footer_text = " ↑/↓ scroll  PgUp/PgDn page  Home/End  / jump to ID  q quit"
+    bottom = TABLE_BOTTOM.rstrip("\n")
+
+    def body_height() -> int:
+        return max(1, curses.LINES - len(header) - 2)
+
+    window = CardWindow(DATABASE, body_height())
+    drawn: List[Optional[str]] = []
+    status: List[Optional[str]] = [None] #Shown instead of the footer until the next key
+
+    def draw() -> None:
+        #Only lines that are different from last time are sent to the terminal
+        lines = header + [FormatCard(card).rstrip("\n") for card in window.visible()]
+        lines += [""] * (len(header) + window.height - len(lines))
+        lines += [bottom, status[0] or footer_text]
+        drawn.extend([None] * (len(lines) - len(drawn)))
+        for row, text in enumerate(lines):
+            if row >= curses.LINES:
+                break
+            if drawn[row] != text:
+                stdscr.move(row, 0)
+                stdscr.clrtoeol()
+                stdscr.addnstr(row, 0, text, curses.COLS - 1)
+                drawn[row] = text
+        stdscr.refresh()
+
+    def ask_id() -> str:
+        curses.echo()
+        curses.curs_set(1)
+        stdscr.move(curses.LINES - 1, 0)
+        stdscr.clrtoeol()
+        stdscr.addstr(curses.LINES - 1, 0, "Jump to ID: ")
+        text = stdscr.getstr().decode(errors="ignore")
+        curses.noecho()
+        curses.curs_set(0)
+        drawn[-1:] = [None] #The footer needs drawing again
+        return text
+
+    keys = {
+        curses.KEY_DOWN: lambda: window.scroll(1), ord("j"): lambda: window.scroll(1),
+        curses.KEY_UP: lambda: window.scroll(-1), ord("k"): lambda: window.scroll(-1),
+        curses.KEY_NPAGE: lambda: window.scroll(window.height), ord(" "): lambda: window.scroll(window.height),
+        curses.KEY_PPAGE: lambda: window.scroll(-window.height),
+        curses.KEY_HOME: window.home, ord("g"): window.home,
+        curses.KEY_END: window.end, ord("G"): window.end,
+    }
+    while True:
+        draw()
+        key = stdscr.getch()
+        status[0] = None
+        if key in (ord("q"), ord("Q")):
+            return
+        if key == curses.KEY_RESIZE:
+            curses.update_lines_cols()
+            stdscr.clear()
+            drawn.clear()
+            window.resize(body_height())
+        elif key == ord("/"):
+            text = ask_id()
+            monster_id = parse_id(text)
+            if monster_id is not None:
+                window.jump(monster_id)
+            elif text.strip(): #Nothing typed just goes back
+                status[0] = " Invalid ID, type a card's ID number (any key to go on)"
+        elif key in keys:
+            keys[key]()
+
+
+def BrowseCards(DATABASE: str = DATABASE) -> None:
+    import curses
+    import locale
+
+    locale.setlocale(locale.LC_ALL, "") #So the box drawing characters come out right
+    curses.wrapper(browse, DATABASE)
+
+
+if __name__ == "__main__":
+    BrowseCards(sys.argv[1] if len(sys.argv) > 1 else DATABASE)
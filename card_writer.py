@@ -0,0 +1,232 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from card_pool import get_pool
+from config2 import is_transient_error
+from INTERNAL_functions import (
+    DELETE_QUERY, INSERT_QUERY, METRICS, STATS, WRITE_RETRY, InvalidateCards,
+)
+
+#Opt-in group commit: every write normally pays for its own commit (an fsync), a WriteQueue
+#collects whatever writes arrive within max_delay_ms (or max_batch of them) and commits them together.
+#Each write gets a Future that's resolved only once its batch is committed.
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+Operation = Callable[..., Any] #Called as operation(connection, *args) inside the batch's transaction
+_STOP = object()
+_queues: "weakref.WeakSet[WriteQueue]" = weakref.WeakSet()
+
+
+def _insert(connect: sqlite3.Connection, name: str, strength: int, speed: int, stealth: int, cunning: int) -> int:
+    return connect.execute(INSERT_QUERY, (name, strength, speed, stealth, cunning)).lastrowid
+
+
+def _edit(connect: sqlite3.Connection, monstersID: int, changes: Dict[str, int]) -> int:
+    stats = tuple(sorted(changes))
+    change = f"UPDATE 'Monster Cards' SET {', '.join(f'{stat} = ?' for stat in stats)} WHERE ID = ?"
+    return connect.execute(change, tuple(changes[stat] for stat in stats) + (monstersID,)).rowcount
+
+
+def _delete(connect: sqlite3.Connection, monsterID: int) -> int:
+    return connect.execute(DELETE_QUERY, (monsterID,)).rowcount
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        DATABASE: str,
+        max_batch: int = 500,
+        max_delay_ms: float = 5.0,
+        synchronous: str = "NORMAL",
+    ) -> None:
+        #synchronous is SQLite's durability setting for the writer's connection: in WAL mode NORMAL can lose
+        #the last few commits on power loss (never on a crash of this program), FULL/EXTRA fsync every commit
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}")
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.DATABASE = DATABASE
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.synchronous = synchronous
+        self.batches = 0
+        self.operations = 0
+        self.largest_batch = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="card-writer", daemon=True)
+        self._thread.start()
+        _queues.add(self)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(self, operation: Operation, *args: Any) -> Future:
+        future: Future = Future()
+        #Checked and queued under the lock close() takes, so nothing can land behind the stop marker
+        #after the writer's last look at the queue and never be answered
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("this WriteQueue has been closed")
+            self._queue.put((future, operation, args))
+        return future
+
+    def insert(self, name: str, strength: int, speed: int, stealth: int, cunning: int) -> Future:
+        #Resolves to the new card's ID
+        return self.submit(_insert, name, strength, speed, stealth, cunning)
+
+    def edit(self, monstersID: int, changes: Dict[str, int]) -> Future:
+        #Resolves to 1 if the card was changed, 0 if there is no card with that ID
+        changes = {stat.lower(): value for stat, value in changes.items()}
+        for stat in changes:
+            if stat not in STATS:
+                raise ValueError(f"{stat!r} is not a valid stat")
+        if not changes:
+            raise ValueError("nothing to change")
+        return self.submit(_edit, monstersID, changes)
+
+    def delete(self, monsterID: int) -> Future:
+        #Resolves to 1 if the card was there, 0 if it wasn't
+        return self.submit(_delete, monsterID)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        #Waits until everything submitted before this call is committed
+        barrier: Future = Future()
+        with self._close_lock:
+            closing = self._closed
+            if not closing:
+                self._queue.put((barrier, None, ()))
+        if closing: #Everything was queued before the stop marker, the writer commits it all before it ends
+            self._thread.join(timeout)
+            return
+        barrier.result(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        #Commits whatever is still queued, then stops the writer thread
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "operations": self.operations, "largest_batch": self.largest_batch,
+                "queued": self._queue.qsize()}
+
+    def __enter__(self) -> "WriteQueue":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _collect(self, first: Any) -> Tuple[List[Tuple[Future, Operation, tuple]], bool]:
+        #Everything that turns up within max_delay of the first write, up to max_batch writes
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        connection = get_pool(self.DATABASE).connection() #The writer thread's own connection
+        connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stopping = self._collect(item)
+            self._commit(batch)
+        while True: #Anything submitted while stopping still gets written
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._commit([item])
+
+    def _commit(self, batch: List[Tuple[Future, Operation, tuple]]) -> None:
+        writes = [(future, operation, args) for future, operation, args in batch
+                  if operation is not None and future.set_running_or_notify_cancel()]
+        barriers = [future for future, operation, _ in batch if operation is None]
+        if writes:
+            try:
+                with METRICS.timed("writer.commit"):
+                    outcomes = WRITE_RETRY.execute(self._write, writes)
+            except BaseException as error: #The whole batch failed (or stayed busy past the retry deadline)
+                for future, _, _ in writes:
+                    future.set_exception(error)
+            else:
+                self._invalidate(writes)
+                for (future, _, _), (ok, value) in zip(writes, outcomes):
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                self.batches += 1
+                self.operations += len(writes)
+                self.largest_batch = max(self.largest_batch, len(writes))
+                METRICS.increment("writer.operations", len(writes))
+        for barrier in barriers:
+            barrier.set_result(None)
+
+    def _write(self, writes: List[Tuple[Future, Operation, tuple]]) -> List[Tuple[bool, Any]]:
+        #One transaction for the batch, each write in its own savepoint so a bad one (e.g. a constraint error)
+        #only undoes itself. A busy database raises out of here and WRITE_RETRY runs the whole batch again.
+        outcomes: List[Tuple[bool, Any]] = []
+        with get_pool(self.DATABASE).transaction(immediate=True) as connect:
+            for _, operation, args in writes:
+                connect.execute("SAVEPOINT card_write")
+                try:
+                    outcomes.append((True, operation(connect, *args)))
+                except Exception as error:
+                    if isinstance(error, sqlite3.Error) and is_transient_error(error):
+                        raise
+                    connect.execute("ROLLBACK TO card_write")
+                    outcomes.append((False, error))
+                connect.execute("RELEASE card_write")
+        return outcomes
+
+    def _invalidate(self, writes: List[Tuple[Future, Operation, tuple]]) -> None:
+        for _, operation, args in writes:
+            if operation is _edit or operation is _delete:
+                InvalidateCards(self.DATABASE, args[0])
+        InvalidateCards(self.DATABASE)
+
+
+_default_queues: Dict[str, WriteQueue] = {}
+_default_lock = threading.Lock()
+
+
+def get_write_queue(DATABASE: str, **options: Any) -> WriteQueue:
+    #One shared queue per database, options only count the first time
+    with _default_lock:
+        write_queue = _default_queues.get(DATABASE)
+        if write_queue is None or write_queue.closed:
+            write_queue = _default_queues[DATABASE] = WriteQueue(DATABASE, **options)
+        return write_queue
+
+
+@atexit.register
+def close_queues() -> None:
+    #Registered after card_pool's close_pools, so it runs first and every queued write is committed
+    #before the connections are closed
+    for write_queue in list(_queues):
+        write_queue.close()
@@ -0,0 +1,252 @@
+import argparse
+import json
+import shlex
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from card_import import MAX_STAT, MIN_STAT, ImportCards, read_rows, validate_card
+from card_search import ORDER_COLUMNS, SearchCards
+from card_stats import CardStatistics, StreamStatistics, aggregate_cards
+from INTERNAL_functions import (
+    DATABASE, METRICS, PAGE_SIZE, STATS, BatchEditCards, CardPages, DeleteCard, GetCard, InsertCard,
+)
+
+#Headless version of the menu for scripts: no input(), no sleeps and no clearing the screen
+CARD_FIELDS = ("id", "name") + STATS
+
+
+class CommandError(Exception):
+    pass
+
+
+def card_record(card: Sequence[Any]) -> Dict[str, Any]:
+    return dict(zip(CARD_FIELDS, card))
+
+
+def write_records(records: Iterable[Dict[str, Any]], fields: Sequence[str], fmt: str, out=None) -> None:
+    #JSON is one object per line so big listings can be read as they arrive, TSV starts with a header
+    out = out or sys.stdout
+    if fmt == "json":
+        out.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+    else:
+        lines = ["\t".join(fields)] if fmt == "tsv-header" else []
+        lines.extend("\t".join(str(record.get(field, "")) for field in fields) for record in records)
+        out.write("".join(line + "\n" for line in lines))
+
+
+def stat_value(text: str) -> int:
+    value = int(text)
+    if not MIN_STAT <= value <= MAX_STAT:
+        raise argparse.ArgumentTypeError(f"must be within {MIN_STAT} and {MAX_STAT}")
+    return value
+
+
+def cmd_list(args: argparse.Namespace) -> None:
+    remaining = args.limit
+    first = True
+    for page in CardPages(args.db, args.page_size, args.start_id):
+        if remaining is not None:
+            page = page[:remaining]
+            remaining -= len(page)
+        write_records(map(card_record, page), CARD_FIELDS, args.table_format if first else args.format)
+        first = False
+        if remaining is not None and remaining <= 0:
+            break
+    if first:
+        write_records([], CARD_FIELDS, args.table_format)
+
+
+def cmd_get(args: argparse.Namespace) -> None:
+    cards = [GetCard(args.db, monster_id) for monster_id in args.ids]
+    missing = [monster_id for monster_id, card in zip(args.ids, cards) if card is None]
+    write_records((card_record(card) for card in cards if card is not None), CARD_FIELDS, args.table_format)
+    if missing:
+        raise CommandError(f"no card with ID {', '.join(map(str, missing))}")
+
+
+def cmd_add(args: argparse.Namespace) -> None:
+    values, reason = validate_card(dict(zip(("name",) + STATS, [args.name] + args.stats)))
+    if values is None:
+        raise CommandError(reason)
+    monster_id = InsertCard(args.db, *values)
+    write_records([{"ok": True, "id": monster_id}], ("ok", "id"), args.table_format)
+
+
+def cmd_edit(args: argparse.Namespace) -> None:
+    changes = {stat: getattr(args, stat) for stat in STATS if getattr(args, stat) is not None}
+    if not changes:
+        raise CommandError("nothing to change, pass at least one of --strength/--speed/--stealth/--cunning")
+    changed = BatchEditCards(args.db, args.ids, changes)
+    write_records([{"ok": True, "changed": changed}], ("ok", "changed"), args.table_format)
+
+
+def cmd_remove(args: argparse.Namespace) -> None:
+    removed = sum(DeleteCard(args.db, monster_id) for monster_id in args.ids)
+    write_records([{"ok": True, "removed": removed}], ("ok", "removed"), args.table_format)
+
+
+def filters_from(args: argparse.Namespace) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {"name_prefix": args.name_prefix}
+    for stat in STATS:
+        low, high = getattr(args, f"min_{stat}"), getattr(args, f"max_{stat}")
+        if low is not None or high is not None:
+            filters[stat] = (low, high)
+    return filters
+
+
+def cmd_search(args: argparse.Namespace) -> None:
+    cards = SearchCards(args.db, order_by=args.order_by, descending=args.desc, limit=args.limit, **filters_from(args))
+    write_records(map(card_record, cards), CARD_FIELDS, args.table_format)
+
+
+def cmd_stats(args: argparse.Namespace) -> None:
+    if args.from_file:
+        #Straight from a CSV/JSONL file (or stdin) without importing it, rows that wouldn't import are skipped
+        values = (values for values, _ in (validate_card(row) for _, row in read_rows(args.from_file, args.file_format))
+                  if values is not None)
+        report = StreamStatistics(aggregate_cards(values, first_stat=1))
+    else:
+        report = CardStatistics(args.db, **filters_from(args))
+    records = [dict(stat=stat, **values) for stat, values in report.items()]
+    write_records(records, tuple(records[0]), args.table_format)
+
+
+def cmd_import(args: argparse.Namespace) -> None:
+    report = ImportCards(args.db, args.file, args.file_format, batch_size=args.batch_size)
+    report["rejected_rows"] = [{"line": line, "reason": reason} for line, reason in report["rejected_rows"]]
+    if args.format == "json":
+        write_records([report], (), "json")
+    else:
+        fields = ("inserted", "rejected", "seconds", "rows_per_second")
+        write_records([report], fields, args.table_format)
+
+
+def cmd_metrics(args: argparse.Namespace) -> None:
+    #Timings of the database calls made so far in this process, so mostly useful at the end of a batch
+    snapshot = METRICS.snapshot()
+    if args.format == "json":
+        write_records([snapshot], (), "json")
+    else:
+        fields = ("operation", "count", "total_ms", "mean_ms", "p50_ms", "p99_ms", "max_ms")
+        write_records((dict(operation=key, **timing) for key, timing in snapshot["timings"].items()),
+                      fields, args.table_format)
+
+
+def cmd_batch(args: argparse.Namespace) -> None:
+    #One command per stdin line, so a script can run thousands of operations in one process
+    parser = build_parser()
+    failures = 0
+    for line_number, line in enumerate(sys.stdin, start=1):
+        try:
+            words = shlex.split(line)
+        except ValueError as e: #e.g. "No closing quotation", only this line fails
+            sys.stderr.write(f"error: line {line_number}: {e}\n")
+            failures += 1
+            continue
+        if not words or words[0].startswith("#"):
+            continue
+        if words[0] == "batch":
+            raise CommandError("batch can't be nested")
+        failures += run(words, parser, defaults=args) != 0
+    if failures:
+        raise CommandError(f"{failures} command(s) failed")
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
+    for stat in STATS:
+        parser.add_argument(f"--min-{stat}", type=int)
+        parser.add_argument(f"--max-{stat}", type=int)
+    parser.add_argument("--name-prefix")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cards_cli.py", description="Scriptable Monstars card commands")
+    parser.add_argument("--db", default=DATABASE, help="card database (default: %(default)s)")
+    parser.add_argument("--format", choices=("json", "tsv"), default="json", help="output format")
+    parser.add_argument("--no-header", action="store_true", help="leave the header line off TSV output")
+    parser.add_argument("--trace", action="store_true", help="time every database call (see the metrics command)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    listing = commands.add_parser("list", help="list cards in ID order")
+    listing.add_argument("--start-id", type=int, default=1)
+    listing.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    listing.add_argument("--limit", type=int)
+    listing.set_defaults(func=cmd_list)
+
+    get = commands.add_parser("get", help="show cards by ID")
+    get.add_argument("ids", type=int, nargs="+")
+    get.set_defaults(func=cmd_get)
+
+    add = commands.add_parser("add", help="add one card")
+    add.add_argument("name")
+    add.add_argument("stats", nargs=4, metavar="STAT", help="strength speed stealth cunning")
+    add.set_defaults(func=cmd_add)
+
+    edit = commands.add_parser("edit", help="change stats on one or more cards")
+    edit.add_argument("ids", type=int, nargs="+")
+    for stat in STATS:
+        edit.add_argument(f"--{stat}", type=stat_value)
+    edit.set_defaults(func=cmd_edit)
+
+    remove = commands.add_parser("remove", help="remove cards by ID")
+    remove.add_argument("ids", type=int, nargs="+")
+    remove.set_defaults(func=cmd_remove)
+
+    search = commands.add_parser("search", help="search cards by stat ranges and name")
+    add_filter_arguments(search)
+    search.add_argument("--order-by", choices=tuple(ORDER_COLUMNS), default="id")
+    search.add_argument("--desc", action="store_true")
+    search.add_argument("--limit", type=int, default=50)
+    search.set_defaults(func=cmd_search)
+
+    stats = commands.add_parser("stats", help="count, mean, min, max, std and percentiles of each stat")
+    add_filter_arguments(stats)
+    stats.add_argument("--from-file", metavar="FILE", help="a CSV or JSONL file ('-' for stdin) instead of the database")
+    stats.add_argument("--file-format", choices=("csv", "jsonl"))
+    stats.set_defaults(func=cmd_stats)
+
+    importer = commands.add_parser("import", help="bulk import a CSV or JSONL file ('-' for stdin)")
+    importer.add_argument("file")
+    importer.add_argument("--file-format", choices=("csv", "jsonl"))
+    importer.add_argument("--batch-size", type=int)
+    importer.set_defaults(func=cmd_import)
+
+    metrics = commands.add_parser("metrics", help="count, total, p50 and p99 time of each database call so far")
+    metrics.set_defaults(func=cmd_metrics)
+
+    batch = commands.add_parser("batch", help="run one command per line read from stdin")
+    batch.set_defaults(func=cmd_batch)
+    return parser
+
+
+def run(argv: List[str], parser: Optional[argparse.ArgumentParser] = None,
+        defaults: Optional[argparse.Namespace] = None) -> int:
+    parser = parser or build_parser()
+    if defaults is not None:
+        #Commands inside a batch use the batch's --db/--format unless they give their own
+        argv = ["--db", defaults.db, "--format", defaults.format] + (["--no-header"] if defaults.no_header else []) + argv
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return int(e.code or 0)
+    if args.trace:
+        METRICS.enabled = True
+    args.table_format = "tsv" if args.format == "tsv" and args.no_header else (
+        "tsv-header" if args.format == "tsv" else "json")
+    try:
+        args.func(args)
+    except (CommandError, ValueError, OSError, sqlite3.Error) as e:
+        sys.stderr.write(f"error: {e}\n")
+        return 1
+    finally:
+        sys.stdout.flush()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return run(sys.argv[1:] if argv is None else argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import math
 import os
 import sys
 import time
@@ -23,7 +24,24 @@ class DataProcessor:
 
 
 def calculate_statistics(data: List[Union[int, float]]) -> Dict[str, float]:
-    return {}
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    low = high = 0.0
+    for value in data:
+        count += 1
+        if count == 1:
+            low = high = value
+        elif value < low:
+            low = value
+        elif value > high:
+            high = value
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+    if not count:
+        return {}
+    return {"count": float(count), "mean": mean, "min": float(low), "max": float(high), "std": math.sqrt(m2 / count)}
 
 
 def normalize_values(values: List[float]) -> List[float]:
@@ -90,8 +108,9 @@ def main():
     processor.save_results(data, "destination_placeholder")
 
 
-for _ in range(10):
-    main()
+if __name__ == "__main__": #Only when run directly, importing this file runs nothing
+    for _ in range(10):
+        main()
 
 
 # ANSI escape codes for colors and effects
@@ -1,9 +1,15 @@
 from typing import Any, Dict, List, Optional, Union, Callable, Tuple
+import functools
+import heapq
+import math
 import threading
 import time
-import logging
 import time
 import os
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from state_machine import StateMachine #Lives on its own so the menu can have it without the rest of this file
 
 
 class ConfigLoader:
@@ -38,12 +44,13 @@ class DataValidator:
 
 
 class LoggerManager:
-    _loggers: Dict[str, logging.Logger] = {}
+    _loggers: Dict[str, "logging.Logger"] = {}
 
     @classmethod
-    def get_logger(cls, name: str) -> logging.Logger:
+    def get_logger(cls, name: str) -> "logging.Logger":
         if name in cls._loggers:
             return cls._loggers[name]
+        import logging #Only loaded by the first logger, it's slow to import and the menu never needs it
         logger = logging.getLogger(name)
         logger.setLevel(logging.INFO)
         logger.addHandler(logging.NullHandler())
@@ -113,33 +120,164 @@ class ConfigManager:
         return key in self._settings
 
 
+class QuantileSketch:
+    #KLL style sketch: a stack of compactors, level h holding items that each stand for 2**h values.
+    #When the sketch is full a level is sorted and every other item moves up a level, so memory stays
+    #around 3k items however many values go in, and quantiles are within about 1/k (in rank) of exact.
+    #Two sketches merge by stacking their levels, so work can be split over threads or processes.
+    __slots__ = ("k", "count", "_levels", "_flip")
+
+    def __init__(self, k: int = 200) -> None:
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.count = 0
+        self._levels: List[List[float]] = [[]]
+        self._flip = 0 #Alternates which half of a compacted level survives, so no side is favoured
+
+    def _capacity(self, level: int) -> int:
+        #The top level gets k items, each level below it two thirds of the one above
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self._levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self._levels)))
+
+    def add(self, value: float) -> None:
+        self._levels[0].append(value)
+        self.count += 1
+        if len(self._levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def _compress(self) -> None:
+        while self._size() >= self._max_size():
+            for level, items in enumerate(self._levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self._levels):
+                        self._levels.append([])
+                    items.sort()
+                    keep = [items.pop()] if len(items) % 2 else [] #An odd one out waits for the next time
+                    self._flip ^= 1
+                    self._levels[level + 1].extend(items[self._flip::2])
+                    self._levels[level] = keep
+                    break
+
+    def merge(self, other: "QuantileSketch") -> None:
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self.count += other.count
+        self._compress()
+
+    def _weighted(self) -> List[Tuple[float, int]]:
+        return sorted((value, 1 << level) for level, items in enumerate(self._levels) for value in items)
+
+    def quantile(self, q: float) -> float:
+        #The smallest value with at least q of everything at or below it, q from 0 to 1
+        if not self.count:
+            return 0.0
+        weighted = self._weighted()
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+    def rank(self, value: float) -> float:
+        #Roughly what fraction of the values are at or below value
+        weighted = self._weighted()
+        total = sum(weight for _, weight in weighted)
+        return sum(weight for item, weight in weighted if item <= value) / total if total else 0.0
+
+    def __len__(self) -> int:
+        return self._size()
+
+
 class DataAggregator:
-    def __init__(self) -> None:
-        self._values: List[float] = []
+    #Streaming summary of a list of numbers that is never kept: count, mean and variance (Welford),
+    #min, max and a QuantileSketch. Memory doesn't grow with the number of values, and aggregators
+    #built in different threads or processes (they pickle) can be merged.
+    def __init__(self, sketch_size: int = 200) -> None:
+        self._sketch_size = sketch_size
+        self.reset()
 
     def add_value(self, value: float) -> None:
-        self._values.append(value)
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+        self._sketch.add(value)
+
+    def update(self, values: Any) -> None:
+        for value in values:
+            self.add_value(value)
+
+    def merge(self, other: "DataAggregator") -> None:
+        #Chan et al.'s pairwise combination, exact for the count, mean and variance
+        if not other._count:
+            return
+        if not self._count:
+            self._count, self._mean, self._m2 = other._count, other._mean, other._m2
+            self._min, self._max = other._min, other._max
+        else:
+            count = self._count + other._count
+            delta = other._mean - self._mean
+            self._mean += delta * other._count / count
+            self._m2 += other._m2 + delta * delta * self._count * other._count / count
+            self._count = count
+            self._min = min(self._min, other._min)
+            self._max = max(self._max, other._max)
+        self._sketch.merge(other._sketch)
 
     def count(self) -> int:
-        return len(self._values)
+        return self._count
 
     def mean(self) -> float:
-        if not self._values:
+        return self._mean if self._count else 0.0
+
+    def variance(self, sample: bool = False) -> float:
+        if self._count < (2 if sample else 1):
             return 0.0
-        return sum(self._values) / len(self._values)
+        return self._m2 / (self._count - 1 if sample else self._count)
+
+    def std(self, sample: bool = False) -> float:
+        return math.sqrt(self.variance(sample))
 
     def max(self) -> float:
-        if not self._values:
-            return 0.0
-        return max(self._values)
+        return self._max if self._max is not None else 0.0
 
     def min(self) -> float:
-        if not self._values:
-            return 0.0
-        return min(self._values)
+        return self._min if self._min is not None else 0.0
+
+    def quantile(self, q: float) -> float:
+        return self._sketch.quantile(q)
+
+    def percentile(self, percent: float) -> float:
+        return self._sketch.quantile(percent / 100)
+
+    def summary(self, percentiles: Tuple[float, ...] = (50, 90, 99)) -> Dict[str, float]:
+        result = {"count": self._count, "mean": self.mean(), "std": self.std(), "min": self.min(), "max": self.max()}
+        result.update({f"p{percent:g}": self.percentile(percent) for percent in percentiles})
+        return result
 
     def reset(self) -> None:
-        self._values.clear()
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min: Optional[float] = None
+        self._max: Optional[float] = None
+        self._sketch = QuantileSketch(self._sketch_size)
 
 
 def flatten_list(nested_list: List[List[Any]]) -> List[Any]:
@@ -205,26 +343,126 @@ class Timer:
 
 
 class Cache:
-    def __init__(self, max_size: int = 100) -> None:
-        self._store: Dict[Any, Any] = {}
-        self._order: List[Any] = []
+    def __init__(self, max_size: int = 100, ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._store: "OrderedDict[Any, Tuple[Any, Optional[float]]]" = OrderedDict()
         self._max_size = max_size
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        #Bumped by delete() (per key) and clear() (everything), see token()
+        self._epoch = 0
+        self._generations: Dict[Any, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def token(self, key: Any) -> Tuple[int, int]:
+        #Take one before reading the value that's going to be cached. If the key is deleted (or the cache
+        #cleared) before set(key, value, token) then the value may already be out of date and isn't stored
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
 
-    def set(self, key: Any, value: Any) -> None:
-        if key in self._store:
-            self._order.remove(key)
-        elif len(self._order) >= self._max_size:
-            oldest = self._order.pop(0)
-            self._store.pop(oldest, None)
-        self._store[key] = value
-        self._order.append(key)
+    def set(self, key: Any, value: Any, token: Optional[Tuple[int, int]] = None) -> bool:
+        #Returns False if token is out of date and nothing was stored
+        expires_at = self._clock() + self._ttl if self._ttl is not None else None
+        with self._lock:
+            if token is not None and token != (self._epoch, self._generations.get(key, 0)):
+                return False
+            if key in self._store:
+                self._store.move_to_end(key)
+            elif len(self._store) >= self._max_size:
+                self._store.popitem(last=False)
+                self.evictions += 1
+            self._store[key] = (value, expires_at)
+            return True
+
+    def replace(self, key: Any, value: Any, token: Optional[Tuple[int, int]] = None) -> bool:
+        #Like set() for a key that's already cached, but it keeps its place in the LRU order.
+        #Returns False (and stores nothing) if the key isn't cached any more or token is out of date
+        expires_at = self._clock() + self._ttl if self._ttl is not None else None
+        with self._lock:
+            if token is not None and token != (self._epoch, self._generations.get(key, 0)):
+                return False
+            if key not in self._store:
+                return False
+            self._store[key] = (value, expires_at) #Assigning to an existing key doesn't move it
+            return True
 
     def get(self, key: Any, default: Any = None) -> Any:
-        return self._store.get(key, default)
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._store[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._store.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Any, default: Any = None) -> Any:
+        #Like get() but it isn't counted as a hit or miss and doesn't make the key recently used,
+        #for housekeeping that looks at every entry
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= self._clock()):
+                return default
+            return entry[0]
+
+    def delete(self, key: Any) -> bool:
+        with self._lock:
+            if len(self._generations) >= 4 * self._max_size:
+                self._new_epoch() #Keeps the generations from growing forever, any token taken before is stale
+            self._generations[key] = self._generations.get(key, 0) + 1
+            return self._store.pop(key, None) is not None
 
     def clear(self) -> None:
-        self._store.clear()
-        self._order.clear()
+        with self._lock:
+            self._store.clear()
+            self._new_epoch()
+
+    def _new_epoch(self) -> None:
+        self._epoch += 1
+        self._generations.clear()
+
+    def keys(self) -> List[Any]:
+        #A copy, so it's safe to change the cache while going through them
+        with self._lock:
+            return list(self._store)
+
+    def purge_expired(self) -> int:
+        #Expired entries are normally only dropped when someone asks for them, this drops them all now
+        if self._ttl is None:
+            return 0
+        now = self._clock()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._store.items() if expires_at <= now]
+            for key in expired:
+                del self._store[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._store)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._store),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
 
 
 def generate_sequence(start: int, end: int, step: int = 1) -> List[int]:
@@ -237,30 +475,6 @@ def merge_dicts(a: Dict[Any, Any], b: Dict[Any, Any]) -> Dict[Any, Any]:
     return result
 
 
-class StateMachine:
-    def __init__(self) -> None:
-        self._state: Optional[str] = None
-        self._transitions: Dict[str, List[str]] = {}
-
-    def add_state(self, state: str, transitions: Optional[List[str]] = None) -> None:
-        self._transitions[state] = transitions or []
-
-    def set_state(self, state: str) -> None:
-        if state in self._transitions:
-            self._state = state
-
-    def can_transition(self, state: str) -> bool:
-        if self._state is None:
-            return False
-        return state in self._transitions.get(self._state, [])
-
-    def transition(self, state: str) -> bool:
-        if self.can_transition(state):
-            self._state = state
-            return True
-        return False
-
-
 class Formatter:
     @staticmethod
     def to_upper(text: str) -> str:
@@ -402,20 +616,93 @@ class SignalHandler:
             self._signals[name](*args, **kwargs)
 
 
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+def is_transient_error(error: BaseException) -> bool:
+    #Only "database is locked"/busy is worth trying again, anything else would fail the same way next time
+    import sqlite3 #Already loaded by whoever is talking to a database
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED) #The low byte is the primary result code
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
 class RetryPolicy:
-    def __init__(self, max_attempts: int = 3, delay_seconds: float = 1.0) -> None:
+    #Retries func while it fails with a transient error, waiting a random time up to
+    #delay_seconds * 2**attempt (capped at max_delay) in between so writers stop colliding in lockstep.
+    #Gives up by re-raising the last error after max_attempts or once deadline_seconds have passed,
+    #anything that isn't transient is re-raised straight away.
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        delay_seconds: float = 1.0,
+        max_delay: float = 30.0,
+        deadline_seconds: Optional[float] = None,
+        retryable: Callable[[BaseException], bool] = is_transient_error,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional["random.Random"] = None,
+    ) -> None:
         self.max_attempts = max_attempts
         self.delay_seconds = delay_seconds
+        self.max_delay = max_delay
+        self.deadline_seconds = deadline_seconds
+        self.retryable = retryable
+        self._sleep = sleep
+        self._clock = clock
+        if rng is None:
+            import random
+            rng = random.Random()
+        self._rng = rng
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.recovered = 0 #Calls that failed at least once and then worked
+        self.gave_up = 0
+        self.waited = 0.0
+
+    def backoff(self, attempt: int) -> float:
+        #"Full jitter": anywhere between 0 and the exponential cap
+        return self._rng.uniform(0, min(self.max_delay, self.delay_seconds * 2 ** attempt))
 
     def execute(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        start = self._clock()
         attempt = 0
-        while attempt < self.max_attempts:
+        with self._lock:
+            self.calls += 1
+        while True:
             try:
-                return func(*args, **kwargs)
-            except Exception:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                if not self.retryable(error):
+                    raise
                 attempt += 1
-                time.sleep(self.delay_seconds)
-        return None
+                delay = self.backoff(attempt - 1)
+                if self.deadline_seconds is not None:
+                    delay = min(delay, self.deadline_seconds - (self._clock() - start))
+                if attempt >= self.max_attempts or delay < 0:
+                    with self._lock:
+                        self.gave_up += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+                    self.waited += delay
+                self._sleep(delay)
+            else:
+                if attempt:
+                    with self._lock:
+                        self.recovered += 1
+                return result
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "recovered": self.recovered,
+                    "gave_up": self.gave_up, "waited_seconds": self.waited}
 
 
 class PipelineStep:
@@ -439,32 +726,315 @@ class Pipeline:
         return data
 
 
+class Histogram:
+    #HDR style: bucket boundaries grow with the value, 2**precision buckets per power of two, so every
+    #recorded value is kept to within 1/2**precision (about 3% by default) whether it's 1µs or 10s,
+    #in a few hundred buckets at most. Values are whole numbers (the collector records nanoseconds).
+    __slots__ = ("precision", "count", "total", "min", "max", "_counts")
+
+    def __init__(self, precision: int = 5) -> None:
+        self.precision = precision
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self._counts: Dict[int, int] = {}
+
+    def _index(self, value: int) -> int:
+        exact = 1 << (self.precision + 1)
+        if value < exact: #Small values get a bucket each
+            return value
+        shift = value.bit_length() - self.precision - 1
+        return exact + ((shift - 1) << self.precision) + (value >> shift) - (1 << self.precision)
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        exact = 1 << (self.precision + 1)
+        if index < exact:
+            return index, index
+        shift, offset = divmod(index - exact, 1 << self.precision)
+        shift += 1
+        low = (offset + (1 << self.precision)) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = max(0, int(value))
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min(max((low + high) // 2, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        if other.precision != self.precision:
+            raise ValueError("can only merge histograms with the same precision")
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+
+class _Timing:
+    __slots__ = ("_metrics", "_key", "_start")
+
+    def __init__(self, metrics: "MetricsCollector", key: str) -> None:
+        self._metrics = metrics
+        self._key = key
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._metrics._record_ns(self._key, time.perf_counter_ns() - self._start)
+
+
+_NOT_TIMING = nullcontext() #Shared by every timed() block while metrics are off
+
+
 class MetricsCollector:
-    def __init__(self) -> None:
+    #Counters plus a latency Histogram per key. When enabled is False, timed() and trace() cost one
+    #attribute check per call and nothing is recorded.
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
         self._metrics: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
 
     def record(self, key: str, value: float) -> None:
-        self._metrics[key] = value
+        #value is in seconds, get() still gives back the latest one
+        with self._lock:
+            self._metrics[key] = value
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.record(value * 1e9)
+
+    def _record_ns(self, key: str, nanoseconds: int) -> None:
+        with self._lock:
+            self._metrics[key] = nanoseconds / 1e9
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.record(nanoseconds)
+
+    def increment(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
 
     def get(self, key: str) -> float:
         return self._metrics.get(key, 0.0)
 
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def histogram(self, key: str) -> Optional[Histogram]:
+        return self._histograms.get(key)
+
+    def timed(self, key: str) -> Any:
+        #with metrics.timed("key"): ... times the block
+        return _Timing(self, key) if self.enabled else _NOT_TIMING
+
+    def trace(self, key: str) -> Callable[[Callable], Callable]:
+        #Decorator version of timed(), errors are timed too and counted under "<key>.errors"
+        def decorate(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    self.increment(key + ".errors")
+                    raise
+                finally:
+                    self._record_ns(key, time.perf_counter_ns() - start)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = {
+                key: {
+                    "count": histogram.count,
+                    "total_ms": histogram.total / 1e6,
+                    "mean_ms": histogram.total / histogram.count / 1e6,
+                    "p50_ms": histogram.percentile(50) / 1e6,
+                    "p99_ms": histogram.percentile(99) / 1e6,
+                    "max_ms": histogram.max / 1e6,
+                }
+                for key, histogram in sorted(self._histograms.items()) if histogram.count
+            }
+            return {"enabled": self.enabled, "timings": timings, "counters": dict(sorted(self._counters.items()))}
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        import json
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def format(self) -> str:
+        #A plain text table of the timings, slowest in total first
+        snapshot = self.snapshot()
+        lines = [f"{'operation':<24}{'count':>8}{'total ms':>12}{'p50 ms':>10}{'p99 ms':>10}"]
+        for key, timing in sorted(snapshot["timings"].items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{key:<24}{timing['count']:>8}{timing['total_ms']:>12.3f}"
+                         f"{timing['p50_ms']:>10.3f}{timing['p99_ms']:>10.3f}")
+        for key, value in snapshot["counters"].items():
+            lines.append(f"{key:<24}{value:>8}")
+        return "\n".join(lines)
+
     def reset(self) -> None:
-        self._metrics.clear()
+        with self._lock:
+            self._metrics.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class ScheduledTask:
+    __slots__ = ("func", "args", "every", "deadline", "cancelled", "runs", "last_error", "name")
+
+    def __init__(self, func: Callable, args: tuple, deadline: float, every: Optional[float], name: str) -> None:
+        self.func = func
+        self.args = args
+        self.every = every
+        self.deadline = deadline
+        self.cancelled = False
+        self.runs = 0
+        self.last_error: Optional[BaseException] = None
+        self.name = name
+
+    def cancel(self) -> None:
+        #O(1), the entry stays in the heap and is thrown away when it comes to the top
+        self.cancelled = True
+
+    def __repr__(self) -> str:
+        return f"ScheduledTask({self.name!r}, every={self.every}, runs={self.runs}, cancelled={self.cancelled})"
 
 
 class Scheduler:
-    def __init__(self) -> None:
-        self._tasks: List[Tuple[Callable, float]] = []
+    #Tasks sit in a min-heap keyed on when they're due, so scheduling and running the next one are O(log n)
+    #however many tasks there are. Times are seconds from now. Run due tasks yourself with run_pending(),
+    #or start() a background thread that sleeps until the next deadline.
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._heap: List[Tuple[float, int, ScheduledTask]] = []
+        self._sequence = 0 #Breaks ties so tasks due at the same moment run in the order they were added
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def schedule(self, task: Callable, run_after_seconds: float = 0.0, *args: Any,
+                 every: Optional[float] = None, name: Optional[str] = None) -> ScheduledTask:
+        #every=N runs it again N seconds after each run finishes, until it's cancelled
+        if every is not None and every <= 0:
+            raise ValueError("every must be more than 0 seconds")
+        scheduled = ScheduledTask(task, args, self._clock() + run_after_seconds, every,
+                                  name or getattr(task, "__name__", repr(task)))
+        with self._condition:
+            self._push(scheduled)
+            self._condition.notify() #The new task might be due before whatever the thread is waiting for
+        return scheduled
+
+    def _push(self, scheduled: ScheduledTask) -> None:
+        self._sequence += 1
+        heapq.heappush(self._heap, (scheduled.deadline, self._sequence, scheduled))
+
+    def _pop_due(self, now: float) -> Optional[ScheduledTask]:
+        while self._heap:
+            deadline, _, scheduled = self._heap[0]
+            if scheduled.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if deadline > now:
+                return None
+            heapq.heappop(self._heap)
+            return scheduled
+        return None
 
-    def schedule(self, task: Callable, run_after_seconds: float) -> None:
-        self._tasks.append((task, run_after_seconds))
+    def _run(self, scheduled: ScheduledTask) -> None:
+        #A failing task is recorded and logged, it never takes the scheduler down with it
+        try:
+            scheduled.func(*scheduled.args)
+            scheduled.last_error = None
+        except Exception as error:
+            scheduled.last_error = error
+            LoggerManager.get_logger("scheduler").exception("Scheduled task %s failed", scheduled.name)
+        scheduled.runs += 1
+        if scheduled.every is not None and not scheduled.cancelled:
+            with self._condition:
+                scheduled.deadline = self._clock() + scheduled.every
+                self._push(scheduled)
+
+    def run_pending(self) -> int:
+        #Runs every task that is due now, returns how many ran
+        ran = 0
+        while True:
+            with self._condition:
+                scheduled = self._pop_due(self._clock())
+            if scheduled is None:
+                return ran
+            self._run(scheduled)
+            ran += 1
 
     def run_all(self) -> None:
-        now = time.time()
-        for task, run_after in self._tasks:
-            if run_after <= now:
-                task()
+        self.run_pending()
+
+    def next_deadline(self) -> Optional[float]:
+        with self._condition:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def start(self) -> None:
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    now = self._clock()
+                    scheduled = self._pop_due(now)
+                    if scheduled is not None:
+                        break
+                    deadline = self._heap[0][0] if self._heap else None
+                    self._condition.wait(None if deadline is None else deadline - now)
+                if self._stopping:
+                    return
+            self._run(scheduled) #Outside the lock so tasks can schedule or cancel other tasks
+
+    def __len__(self) -> int:
+        with self._condition:
+            return sum(1 for _, _, scheduled in self._heap if not scheduled.cancelled)
 
 
 class Validator:
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+from typing import Optional, TextIO
+
+#ANSI codes, clearing the screen this way costs a few bytes instead of starting a "clear" process
+CLEAR_SCREEN = "\033[2J"
+CURSOR_HOME = "\033[H"
+CLEAR = CLEAR_SCREEN + CURSOR_HOME
+
+#Every pause in the menus is multiplied by this, MONSTARS_FAST=1 turns them all off
+SLEEP_SCALE = 0.0 if os.environ.get("MONSTARS_FAST") else float(os.environ.get("MONSTARS_SLEEP_SCALE", "1"))
+
+
+def set_sleep_scale(scale: float) -> None:
+    global SLEEP_SCALE
+    SLEEP_SCALE = scale
+
+
+def sleep(seconds: float) -> None:
+    if seconds > 0 and SLEEP_SCALE > 0:
+        time.sleep(seconds * SLEEP_SCALE)
+
+
+def drain_input(stream: Optional[TextIO] = None) -> None:
+    #Throws away anything typed while the program was busy, only for a real terminal
+    #(piped input is what a script wants us to read, so that is left alone)
+    stream = stream or sys.stdin
+    try:
+        if not stream.isatty():
+            return
+        fd = stream.fileno()
+    except (AttributeError, ValueError, OSError):
+        return
+    try:
+        import termios
+    except ImportError: #Windows
+        import msvcrt
+        while msvcrt.kbhit():
+            msvcrt.getwch()
+        return
+    termios.tcflush(fd, termios.TCIFLUSH) #Drops the whole pending buffer in one call
+
+
+def clear(out: Optional[TextIO] = None) -> None:
+    out = out or sys.stdout
+    out.write(CLEAR)
+    out.flush()
+
+
+class Frame:
+    #Collects everything for one screen and writes it in one go, optionally clearing first
+    def __init__(self, clear: bool = False, out: Optional[TextIO] = None) -> None:
+        self.clear = clear
+        self.out = out
+        self._parts = []
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+
+    def line(self, text: str = "") -> None:
+        self._parts.append(text + "\n")
+
+    def render(self) -> None:
+        out = self.out or sys.stdout
+        out.write((CLEAR if self.clear else "") + "".join(self._parts))
+        out.flush()
+        self._parts = []
+        self.clear = False
+
+    def __enter__(self) -> "Frame":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.render()
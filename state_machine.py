@@ -0,0 +1,31 @@
+from typing import Dict, List, Optional
+
+
+#The menu's states and which ones each can go to, in a module of its own so Main can start
+#without loading config2
+class StateMachine:
+    def __init__(self) -> None:
+        self._state: Optional[str] = None
+        self._transitions: Dict[str, List[str]] = {}
+
+    @property
+    def state(self) -> Optional[str]:
+        return self._state
+
+    def add_state(self, state: str, transitions: Optional[List[str]] = None) -> None:
+        self._transitions[state] = transitions or []
+
+    def set_state(self, state: str) -> None:
+        if state in self._transitions:
+            self._state = state
+
+    def can_transition(self, state: str) -> bool:
+        if self._state is None:
+            return False
+        return state in self._transitions.get(self._state, [])
+
+    def transition(self, state: str) -> bool:
+        if self.can_transition(state):
+            self._state = state
+            return True
+        return False
@@ -0,0 +1,30 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT) #The modules live at the top of the repo, not in a package
+
+SCHEMA = ("CREATE TABLE \"Monster Cards\" (ID INTEGER PRIMARY KEY AUTOINCREMENT, Name TEXT (25), "
+          "Strength INTEGER (25), Speed INTEGER (25), Stealth INTEGER (25), Cunning INTEGER (25))")
+
+
+@pytest.fixture
+def database(tmp_path):
+    #A copy of the shipped database, so tests never touch the real one
+    path = str(tmp_path / "cards.db")
+    shutil.copy(os.path.join(ROOT, "DataBase.db"), path)
+    return path
+
+
+@pytest.fixture
+def empty_database(tmp_path):
+    #Just the card table, no cards
+    import sqlite3
+    path = str(tmp_path / "empty.db")
+    connection = sqlite3.connect(path)
+    connection.execute(SCHEMA)
+    connection.close()
+    return path
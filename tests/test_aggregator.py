@@ -0,0 +1,88 @@
+import math
+import pickle
+import random
+import statistics
+
+from config2 import DataAggregator, QuantileSketch
+
+
+def exact_rank(ordered, value):
+    return sum(1 for item in ordered if item <= value) / len(ordered)
+
+
+def test_small_sketch_is_exact():
+    values = list(range(1, 101))
+    sketch = QuantileSketch(k=200)
+    for value in random.Random(2).sample(values, len(values)):
+        sketch.add(value)
+    assert sketch.quantile(0.5) == 50
+    assert sketch.quantile(0.99) == 99
+    assert sketch.quantile(1.0) == 100
+    assert sketch.rank(25) == 0.25
+
+
+def test_quantiles_stay_within_rank_error():
+    rng = random.Random(4)
+    values = [rng.gauss(0, 1) for _ in range(50000)]
+    ordered = sorted(values)
+    sketch = QuantileSketch(k=200)
+    for value in values:
+        sketch.add(value)
+    assert sketch.count == len(values)
+    assert len(sketch) < 3 * 200 #Memory doesn't grow with the values
+    for q in (0.01, 0.25, 0.5, 0.75, 0.9, 0.99):
+        assert abs(exact_rank(ordered, sketch.quantile(q)) - q) < 0.02, q
+
+
+def test_merged_sketches_stay_within_rank_error():
+    rng = random.Random(6)
+    parts = [[rng.random() * (part + 1) for _ in range(10000)] for part in range(4)]
+    merged = QuantileSketch(k=200)
+    for part in parts:
+        sketch = QuantileSketch(k=200)
+        for value in part:
+            sketch.add(value)
+        merged.merge(sketch)
+    ordered = sorted(value for part in parts for value in part)
+    assert merged.count == len(ordered)
+    for q in (0.1, 0.5, 0.9):
+        assert abs(exact_rank(ordered, merged.quantile(q)) - q) < 0.02, q
+
+
+def test_aggregator_matches_statistics():
+    values = [random.Random(8).uniform(-50, 50) for _ in range(5000)]
+    aggregator = DataAggregator()
+    aggregator.update(values)
+    assert aggregator.count() == len(values)
+    assert math.isclose(aggregator.mean(), statistics.fmean(values), abs_tol=1e-9)
+    assert math.isclose(aggregator.variance(), statistics.pvariance(values))
+    assert math.isclose(aggregator.std(sample=True), statistics.stdev(values))
+    assert aggregator.min() == min(values)
+    assert aggregator.max() == max(values)
+
+
+def test_merge_matches_one_pass():
+    rng = random.Random(10)
+    values = [rng.randint(1, 20) for _ in range(3000)]
+    whole = DataAggregator()
+    whole.update(values)
+    merged = DataAggregator()
+    merged.merge(DataAggregator()) #Merging an empty one changes nothing
+    for start in range(0, len(values), 700):
+        part = DataAggregator()
+        part.update(values[start:start + 700])
+        merged.merge(pickle.loads(pickle.dumps(part))) #As if it came back from another process
+    assert merged.count() == whole.count()
+    assert math.isclose(merged.mean(), whole.mean())
+    assert math.isclose(merged.variance(), whole.variance())
+    assert (merged.min(), merged.max()) == (whole.min(), whole.max())
+    ordered = sorted(values)
+    assert abs(exact_rank(ordered, merged.percentile(50)) - 0.5) < 0.05
+
+
+def test_empty_aggregator():
+    aggregator = DataAggregator()
+    assert aggregator.count() == 0
+    assert aggregator.mean() == 0.0
+    assert aggregator.std() == 0.0
+    assert aggregator.percentile(50) == 0.0
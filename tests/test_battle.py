@@ -0,0 +1,87 @@
+import numpy as np
+
+from battle import BattleReport, load_stats, per_stat_wins, single_stat, weighted_sum, win_rates
+from card_pool import get_pool
+from INTERNAL_functions import InsertCard
+
+
+def brute_force(stats, beats):
+    #Every pair fought one at a time in plain Python
+    n = len(stats)
+    wins, losses, draws = [0] * n, [0] * n, [0] * n
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            result = beats(stats[i], stats[j])
+            if result > 0:
+                wins[i] += 1
+            elif result < 0:
+                losses[i] += 1
+            else:
+                draws[i] += 1
+    return wins, losses, draws
+
+
+def sign(value):
+    return (value > 0) - (value < 0)
+
+
+def assert_matches(report, expected):
+    for key, values in zip(("wins", "losses", "draws"), expected):
+        assert report[key].tolist() == values, key
+
+
+def test_rules_match_brute_force():
+    stats = np.random.default_rng(5).integers(1, 21, size=(150, 4), dtype=np.int16)
+    rows = stats.tolist()
+    weights = (2, 1, 1, 0.5)
+    cases = [
+        (per_stat_wins, lambda a, b: sign(sum(sign(x - y) for x, y in zip(a, b)))),
+        (single_stat("stealth"), lambda a, b: sign(a[2] - b[2])),
+        (weighted_sum(weights), lambda a, b: sign(sum(w * (x - y) for w, x, y in zip(weights, a, b)))),
+    ]
+    for rule, beats in cases:
+        expected = brute_force(rows, beats)
+        for block_size in (7, 64, 1024): #Blocks that split the cards unevenly, evenly and not at all
+            assert_matches(win_rates(stats, rule, block_size), expected)
+
+
+def test_score_shortcut_matches_the_pairs():
+    #Rules with a score skip the pairs, the same rule without it has to agree
+    stats = np.random.default_rng(9).integers(1, 21, size=(300, 4), dtype=np.int16)
+    for rule in (single_stat("speed"), weighted_sum((1, 2, 3, 4))):
+        paired = win_rates(stats, lambda a, b: rule(a, b), block_size=40)
+        scored = win_rates(stats, rule)
+        for key in ("wins", "losses", "draws", "win_rate"):
+            assert np.array_equal(paired[key], scored[key]), key
+
+
+def test_every_card_fights_everyone_else_once():
+    stats = np.random.default_rng(1).integers(1, 21, size=(97, 4), dtype=np.int16)
+    report = win_rates(stats, per_stat_wins, block_size=10)
+    assert (report["wins"] + report["losses"] + report["draws"] == 96).all()
+    assert report["wins"].sum() == report["losses"].sum()
+
+
+def test_report_follows_the_database(database):
+    cards = get_pool(database).connection().execute(
+        "SELECT ID, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\" ORDER BY ID").fetchall()
+    ids, stats, skipped = load_stats(database, chunk_size=3)
+    assert skipped == 0
+    assert ids.tolist() == [card[0] for card in cards]
+    assert stats.tolist() == [list(card[1:]) for card in cards]
+    report = BattleReport(database)
+    assert_matches(report, brute_force([list(card[1:]) for card in cards],
+                                       lambda a, b: sign(sum(sign(x - y) for x, y in zip(a, b)))))
+
+
+def test_cards_with_a_null_stat_sit_out(database):
+    full = InsertCard(database, "Full", 1, 2, 3, 4)
+    blank = InsertCard(database, "Blank", 5, None, 5, 5)
+    ids, stats, skipped = load_stats(database)
+    assert skipped == 1
+    assert full in ids.tolist() and blank not in ids.tolist()
+    report = BattleReport(database)
+    assert report["skipped"] == 1
+    assert len(report["wins"]) == len(ids)
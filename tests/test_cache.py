@@ -0,0 +1,74 @@
+import INTERNAL_functions
+from config2 import Cache
+from INTERNAL_functions import CARD_CACHE, CardKey, GetCard, InvalidateCards
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = Cache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.keys() == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = Cache(max_size=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+
+
+def test_stale_token_is_not_stored():
+    cache = Cache(max_size=10)
+    token = cache.token("a")
+    cache.delete("a") #A writer changed the value after the reader took its token
+    assert cache.set("a", "old", token) is False
+    assert cache.get("a") is None
+    assert cache.set("a", "new", cache.token("a")) is True
+
+
+def test_clear_makes_every_token_stale():
+    cache = Cache(max_size=10)
+    token = cache.token("a")
+    cache.clear()
+    assert cache.set("a", "old", token) is False
+
+
+def test_generations_stay_bounded():
+    cache = Cache(max_size=2)
+    for key in range(100):
+        cache.delete(key)
+    assert len(cache._generations) <= 8
+
+
+def test_get_card_does_not_cache_a_row_changed_while_reading(database, monkeypatch):
+    old_row = (1, "Old", 1, 1, 1, 1)
+
+    class Connection:
+        def execute(self, query, params):
+            InvalidateCards(database, 1) #Another thread commits an edit to card 1 mid read
+            return self
+
+        def fetchone(self):
+            return old_row
+
+    class Pool:
+        def connection(self):
+            return Connection()
+
+    monkeypatch.setattr(INTERNAL_functions, "get_pool", lambda DATABASE: Pool())
+    assert GetCard(database, 1) == old_row
+    assert CARD_CACHE.get(CardKey(database, 1)) is None
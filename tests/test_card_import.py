@@ -0,0 +1,44 @@
+import json
+
+from card_import import MAX_REJECTED_ROWS, ImportCards, validate_card
+
+
+def test_valid_card():
+    assert validate_card({"name": "Imp", "strength": "3", "speed": 4, "stealth": 5.0, "cunning": 20}) == \
+        (("Imp", 3, 4, 5, 20), None)
+
+
+def test_booleans_are_not_stats():
+    values, reason = validate_card({"name": "Imp", "strength": True, "speed": 4, "stealth": 5, "cunning": 6})
+    assert values is None
+    assert reason == "strength is not a whole number"
+
+
+def test_out_of_range_and_fractions_are_rejected():
+    assert validate_card({"name": "Imp", "strength": 21, "speed": 4, "stealth": 5, "cunning": 6})[0] is None
+    assert validate_card({"name": "Imp", "strength": 2.5, "speed": 4, "stealth": 5, "cunning": 6})[0] is None
+
+
+def test_rejected_rows_are_capped(empty_database, tmp_path):
+    path = tmp_path / "cards.jsonl"
+    bad = MAX_REJECTED_ROWS + 50
+    with open(path, "w") as handle:
+        for _ in range(bad):
+            handle.write(json.dumps({"name": "Bad", "strength": False, "speed": 1, "stealth": 1, "cunning": 1}) + "\n")
+        handle.write(json.dumps({"name": "Good", "strength": 1, "speed": 1, "stealth": 1, "cunning": 1}) + "\n")
+    report = ImportCards(empty_database, str(path))
+    assert report["inserted"] == 1
+    assert report["rejected"] == bad
+    assert len(report["rejected_rows"]) == MAX_REJECTED_ROWS
+
+
+def test_infinite_stats_are_rejected_not_raised(empty_database, tmp_path):
+    path = tmp_path / "cards.jsonl"
+    path.write_text('{"name": "Huge", "strength": 1e400, "speed": 1, "stealth": 1, "cunning": 1}\n'
+                    '{"name": "Inf", "strength": Infinity, "speed": 1, "stealth": 1, "cunning": 1}\n'
+                    '{"name": "NaN", "strength": NaN, "speed": 1, "stealth": 1, "cunning": 1}\n'
+                    '{"name": "Good", "strength": 1, "speed": 1, "stealth": 1, "cunning": 1}\n')
+    report = ImportCards(empty_database, str(path), batch_size=1)
+    assert report["inserted"] == 1
+    assert report["rejected_rows"] == [(1, "strength is not a whole number"), (2, "strength is not a whole number"),
+                                       (3, "strength is not a whole number")]
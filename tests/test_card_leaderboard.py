@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from card_leaderboard import (CardRank, LeaderboardError, PowerLeaderboard, TopCards, create_leaderboard,
+                              drop_leaderboard, leaderboards, main)
+from card_pool import get_pool
+from INTERNAL_functions import BatchEditCards, DeleteCard, InsertCard, STATS
+
+WEIGHTS = (2, 1, 1, 0.5)
+
+
+def brute_force(cards, weights):
+    #Every card's score the slow way, best first with ties in ID order
+    scores = {card[0]: sum(weight * (value or 0) for weight, value in zip(weights, card[2:6])) for card in cards}
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0])), scores
+
+
+def all_cards(database):
+    return get_pool(database).connection().execute(
+        "SELECT ID, Name, Strength, Speed, Stealth, Cunning FROM \"Monster Cards\"").fetchall()
+
+
+def test_top_and_rank_match_brute_force(database):
+    create_leaderboard(database, "power", WEIGHTS)
+    rng = random.Random(7)
+    for _ in range(60):
+        ids = [card[0] for card in all_cards(database)]
+        action = rng.random()
+        if action < 0.4:
+            InsertCard(database, "New", *(rng.choice([None, *range(1, 21)]) for _ in STATS))
+        elif action < 0.8:
+            BatchEditCards(database, [rng.choice(ids)], {rng.choice(STATS): rng.randint(1, 20)})
+        elif len(ids) > 5:
+            DeleteCard(database, rng.choice(ids))
+    ordered, scores = brute_force(all_cards(database), WEIGHTS)
+    top = TopCards(database, "power", 10)
+    assert [(card[0], card[-1]) for card in top] == ordered[:10]
+    for monster_id, score in scores.items():
+        above = sum(1 for other in scores.values() if other > score)
+        assert CardRank(database, "power", monster_id) == (above + 1, score)
+    assert CardRank(database, "power", 10 ** 9) is None
+
+
+def test_unknown_board_is_an_error(database, capsys):
+    with pytest.raises(LeaderboardError):
+        TopCards(database, "nosuch")
+    with pytest.raises(LeaderboardError):
+        CardRank(database, "nosuch", 1)
+    with pytest.raises(LeaderboardError):
+        drop_leaderboard(database, "nosuch")
+    assert main(["--db", database, "top", "nosuch"]) == 1
+    assert "no leaderboard called 'nosuch'" in capsys.readouterr().out
+
+
+def test_database_errors_are_reported(tmp_path, capsys):
+    junk = tmp_path / "junk.db"
+    junk.write_bytes(b"this is not a database" * 100)
+    assert main(["--db", str(junk), "list"]) == 1
+    assert "An error occurred" in capsys.readouterr().out
+
+
+def test_drop_removes_the_board(database):
+    create_leaderboard(database, "power", WEIGHTS)
+    assert "power" in leaderboards(database)
+    drop_leaderboard(database, "power")
+    assert leaderboards(database) == {}
+    columns = [row[1] for row in get_pool(database).connection().execute("PRAGMA table_xinfo(\"Monster Cards\")")]
+    assert "power_power" not in columns
+    with pytest.raises(LeaderboardError):
+        TopCards(database, "power")
+    InsertCard(database, "After", 1, 2, 3, 4) #The triggers went with it
+
+
+def test_power_leaderboard_matches_brute_force():
+    rng = random.Random(3)
+    board = PowerLeaderboard(WEIGHTS)
+    cards = {}
+    for step in range(5000):
+        action = rng.random()
+        if action < 0.3 or not cards:
+            monster_id = rng.randint(1, 300)
+            cards[monster_id] = [rng.randint(1, 20) for _ in STATS]
+            board.set(monster_id, cards[monster_id])
+        elif action < 0.85:
+            monster_id = rng.choice(list(cards))
+            stat = rng.randrange(len(STATS))
+            cards[monster_id][stat] = rng.randint(1, 20)
+            board.set_stat(monster_id, STATS[stat], cards[monster_id][stat])
+        else:
+            monster_id = rng.choice(list(cards))
+            del cards[monster_id]
+            assert board.remove(monster_id)
+        if step % 250 == 0:
+            ordered, scores = brute_force([(monster_id, None, *stats) for monster_id, stats in cards.items()], WEIGHTS)
+            assert board.top(10) == ordered[:10]
+            assert len(board) == len(cards)
+            for monster_id, score in scores.items():
+                assert board.rank(monster_id) == 1 + sum(1 for other in scores.values() if other > score)
+    assert not board.remove(10 ** 9)
+    assert board.rank(10 ** 9) is None
@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+
+import card_maintenance
+from card_maintenance import refresh_caches, run_once
+from config2 import Cache, Scheduler
+from INTERNAL_functions import CARD_CACHE, CardKey, GetCard, InvalidateCards
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_peek_does_not_count_or_reorder():
+    cache = Cache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    assert cache.peek("missing") is None
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 0
+    cache.set("c", 3) #"a" is still the least recently used
+    assert cache.keys() == ["b", "c"]
+
+
+def test_refresh_fixes_a_card_changed_by_another_program(database):
+    assert GetCard(database, 1)[1] != "Changed"
+    hits = CARD_CACHE.stats()["hits"]
+    other = sqlite3.connect(database)
+    other.execute("UPDATE \"Monster Cards\" SET Name = 'Changed' WHERE ID = 1")
+    other.execute("DELETE FROM \"Monster Cards\" WHERE ID = 2")
+    other.commit()
+    other.close()
+    GetCard(database, 2)
+    assert refresh_caches(database) >= 1
+    assert CARD_CACHE.peek(CardKey(database, 1))[1] == "Changed"
+    assert CARD_CACHE.peek(CardKey(database, 2)) is None
+    assert CARD_CACHE.stats()["hits"] == hits
+
+
+def test_replace_keeps_lru_order():
+    cache = Cache(max_size=3)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.replace("a", "A")
+    assert not cache.replace("missing", 1) #Only replaces, never adds
+    assert cache.keys() == ["a", "b", "c"]
+    assert cache.peek("a") == "A"
+
+
+def test_refresh_keeps_lru_order(database):
+    for monstersID in (1, 2, 3):
+        GetCard(database, monstersID)
+    keys = [key for key in CARD_CACHE.keys() if key[0] == database]
+    other = sqlite3.connect(database)
+    other.execute("UPDATE \"Monster Cards\" SET Name = 'Changed' WHERE ID = 1")
+    other.commit()
+    other.close()
+    assert refresh_caches(database) == 1
+    assert CARD_CACHE.peek(CardKey(database, 1))[1] == "Changed"
+    assert [key for key in CARD_CACHE.keys() if key[0] == database] == keys #ID 1 is still the oldest
+
+
+def test_refresh_does_not_undo_a_write_made_while_it_reads(database, monkeypatch):
+    GetCard(database, 1)
+    other = sqlite3.connect(database)
+    other.execute("UPDATE \"Monster Cards\" SET Name = 'Old' WHERE ID = 1")
+    other.commit()
+    other.close()
+    real_pool = card_maintenance.get_pool
+
+    class Pool:
+        def connection(self):
+            connection = real_pool(database).connection()
+
+            class Wrapped:
+                def execute(self, query, params):
+                    rows = connection.execute(query, params).fetchall() #Reads "Old"
+                    InvalidateCards(database, 1) #Then this process writes card 1 and drops it from the cache
+                    CARD_CACHE.set(CardKey(database, 1), (1, "New", 1, 1, 1, 1)) #And a reader caches the new row
+                    return rows
+            return Wrapped()
+
+    monkeypatch.setattr(card_maintenance, "get_pool", lambda DATABASE: Pool())
+    refresh_caches(database)
+    assert CARD_CACHE.peek(CardKey(database, 1))[1] == "New"
+
+
+def test_run_once(database):
+    report = run_once(database)
+    assert set(report) == {"optimize", "analyze", "checkpoint", "stale_cache_entries"}
+
+
+def test_scheduler_runs_due_tasks_in_order_and_repeats():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    scheduler.schedule(ran.append, 2, "later")
+    scheduler.schedule(ran.append, 1, "sooner")
+    repeating = scheduler.schedule(ran.append, 1, "tick", every=5)
+    clock.now = 1
+    assert scheduler.run_pending() == 2
+    assert ran == ["sooner", "tick"]
+    clock.now = 2
+    scheduler.run_pending()
+    clock.now = 6
+    scheduler.run_pending()
+    assert ran == ["sooner", "tick", "later", "tick"]
+    repeating.cancel()
+    clock.now = 100
+    assert scheduler.run_pending() == 0
+    assert len(scheduler) == 0
+
+
+def test_failing_task_does_not_stop_the_scheduler():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    failing = scheduler.schedule(lambda: 1 / 0, 0, every=1)
+    scheduler.run_pending()
+    assert isinstance(failing.last_error, ZeroDivisionError)
+    clock.now = 1
+    assert scheduler.run_pending() == 1
+
+
+def test_background_thread_runs_tasks():
+    scheduler = Scheduler()
+    done = threading.Event()
+    scheduler.schedule(done.set, 0.01)
+    scheduler.start()
+    try:
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
@@ -0,0 +1,29 @@
+import threading
+
+from card_pool import ConnectionPool
+
+
+def test_fresh_database_without_the_table_opens(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "new.db"))
+    connection = pool.connection()
+    assert connection.execute("SELECT 1").fetchone() == (1,)
+    pool.close_all()
+
+
+def test_hits_are_counted_from_every_thread(database):
+    pool = ConnectionPool(database)
+    calls = 2000
+
+    def work():
+        for _ in range(calls):
+            pool.connection()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = pool.stats()
+    assert stats["misses"] == 4
+    assert stats["hits"] + stats["misses"] == 4 * calls
+    pool.close_all()
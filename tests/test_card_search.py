@@ -0,0 +1,35 @@
+from card_pool import get_pool
+from card_search import SearchCards, check_plans, explain, migrate
+from INTERNAL_functions import InsertCard
+
+
+def test_every_search_and_sort_uses_an_index(database):
+    migrate(database)
+    assert check_plans(database) == {}
+
+
+def test_sorting_by_name_without_its_index_is_caught(database):
+    migrate(database)
+    get_pool(database).connection().execute("DROP INDEX idx_monster_cards_name_order")
+    failures = check_plans(database)
+    assert "{'order_by': 'name', 'descending': False}" in failures
+    assert any(step.startswith("USE TEMP B-TREE") for step in explain(database, order_by="name"))
+
+
+def test_search_matches_a_filter_by_hand(database):
+    cards = get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\"").fetchall()
+    expected = sorted((card for card in cards if card[3] is not None and 5 <= card[3] <= 15),
+                      key=lambda card: (-card[3], -card[0]))
+    found = SearchCards(database, speed=(5, 15), order_by="speed", descending=True, limit=1000)
+    assert found == expected
+
+
+def test_name_prefix_matches_nocase_by_hand(empty_database):
+    names = ["ab@x", "AB@Y", "ab[x", "ab_x", "abAx", "ab`", "abz", "Éclair", "éclair", "Zed", "zebra", "@home"]
+    for name in names:
+        InsertCard(empty_database, name, 1, 1, 1, 1)
+    fold = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz") #What NOCASE does
+    for prefix in ["ab@", "AB@", "ab[", "ab", "ab`", "É", "é", "@", "Z", "zE"]:
+        found = sorted(card[1] for card in SearchCards(empty_database, name_prefix=prefix, limit=100))
+        expected = sorted(name for name in names if name.translate(fold).startswith(prefix.translate(fold)))
+        assert found == expected, prefix
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import sqlite3
+
+import card_server
+from card_server import CardServer
+
+
+def exchange(database, data, **server_options):
+    #Sends raw bytes to a fresh server and returns everything it sends back before closing
+    async def run():
+        server = CardServer(database, workers=2, maintenance=False, **server_options)
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(data)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 10)
+            writer.close()
+            return response
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.executor.shutdown(wait=True)
+            if server.writes is not None:
+                server.writes.close()
+    return asyncio.run(run())
+
+
+def test_get_card(database):
+    response = exchange(database, b"GET /cards/1 HTTP/1.1\r\nConnection: close\r\n\r\n")
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert json.loads(body)["id"] == 1
+
+
+def test_pipelined_requests_are_answered_in_order(database):
+    response = exchange(database, b"GET /cards/1 HTTP/1.1\r\n\r\nGET /cards/999999 HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert response.index(b"200 OK") < response.index(b"404 Not Found")
+
+
+def test_request_line_too_long_gets_a_response(database):
+    response = exchange(database, b"GET /cards/" + b"1" * 70_000 + b" HTTP/1.1\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400 Bad Request")
+    assert b"request line too long" in response
+
+
+def test_header_line_too_long_gets_a_response(database):
+    response = exchange(database, b"GET /cards/1 HTTP/1.1\r\nX-Big: " + b"a" * 70_000 + b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 431")
+
+
+def test_database_error_mid_stream_aborts_instead_of_a_second_response(database, monkeypatch):
+    real_page = card_server._page
+    calls = []
+
+    def failing_page(*args):
+        calls.append(args)
+        if len(calls) > 1:
+            raise sqlite3.OperationalError("disk I/O error")
+        return real_page(*args)
+
+    monkeypatch.setattr(card_server, "_page", failing_page)
+    response = exchange(database, b"GET /cards?page_size=2 HTTP/1.1\r\n\r\n")
+    assert response.count(b"HTTP/1.1") == 1
+    assert not response.endswith(b"0\r\n\r\n") #No final chunk, so the client knows it's cut short
+
+
+def test_group_commit_insert(database):
+    body = json.dumps({"name": "Queued", "strength": 1, "speed": 2, "stealth": 3, "cunning": 4}).encode()
+    request = (b"POST /cards HTTP/1.1\r\nConnection: close\r\nContent-Length: "
+               + str(len(body)).encode() + b"\r\n\r\n" + body)
+    response = exchange(database, request, group_commit=True)
+    assert response.startswith(b"HTTP/1.1 201 Created")
+
+
+def post(path, body):
+    return (b"POST " + path + b" HTTP/1.1\r\nConnection: close\r\nContent-Length: "
+            + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+
+def test_huge_numbers_get_an_answer(database):
+    response = exchange(database, b"GET /cards/99999999999999999999 HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 404")
+    response = exchange(database, b"GET /search?min_speed=" + b"9" * 30 + b" HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400")
+    assert b"min_speed is out of range" in response
+    response = exchange(database, post(b"/cards", b'{"name": "Huge", "strength": 1e400, "speed": 1, '
+                                                  b'"stealth": 1, "cunning": 1}'))
+    assert response.startswith(b"HTTP/1.1 400")
+
+
+def test_negative_content_length(database):
+    response = exchange(database, b"POST /cards HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400")
+    assert b"bad Content-Length" in response
+
+
+def test_unexpected_errors_still_get_a_response(database, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(card_server, "GetCard", broken)
+    response = exchange(database, b"GET /cards/1 HTTP/1.1\r\n\r\nGET /cards/2 HTTP/1.1\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 500 Internal Server Error")
+    assert response.count(b"HTTP/1.1") == 1 #The connection is closed after it
+    assert b"Connection: close" in response
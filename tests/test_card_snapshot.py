@@ -0,0 +1,90 @@
+import pytest
+
+from card_pool import get_pool
+from card_snapshot import HEADER, RECORD_DTYPE, ExportSnapshot, ImportSnapshot, Snapshot, SnapshotError
+from card_store import MISSING_STAT
+from INTERNAL_functions import InsertCard
+
+
+def cards(database):
+    return get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\" ORDER BY ID").fetchall()
+
+
+def test_round_trip(database, empty_database, tmp_path):
+    path = str(tmp_path / "cards.snap")
+    assert ExportSnapshot(database, path, chunk_size=4) == len(cards(database))
+    with Snapshot(path) as snapshot:
+        assert [snapshot.card(index) for index in range(len(snapshot))] == cards(database)
+    assert ImportSnapshot(empty_database, path, keep_ids=True) == len(cards(database))
+    assert cards(empty_database) == cards(database)
+
+
+def test_card_with_id_zero_is_exported(database, tmp_path):
+    get_pool(database).connection().execute(
+        "INSERT INTO \"Monster Cards\" VALUES (0, 'Zero', 1, 2, 3, 4)")
+    get_pool(database).connection().commit()
+    path = str(tmp_path / "cards.snap")
+    ExportSnapshot(database, path)
+    with Snapshot(path) as snapshot:
+        assert snapshot.card(0) == (0, "Zero", 1, 2, 3, 4)
+
+
+def test_negative_id_is_an_error_not_a_silent_skip(database, tmp_path):
+    get_pool(database).connection().execute(
+        "INSERT INTO \"Monster Cards\" VALUES (-1, 'Minus', 1, 2, 3, 4)")
+    get_pool(database).connection().commit()
+    with pytest.raises(SnapshotError):
+        ExportSnapshot(database, str(tmp_path / "cards.snap"))
+
+
+def test_close_with_a_raw_view_still_around(database, tmp_path):
+    path = str(tmp_path / "cards.snap")
+    ExportSnapshot(database, path)
+    with Snapshot(path) as snapshot:
+        raw = snapshot.raw()
+        assert len(raw) == len(snapshot) * RECORD_DTYPE.itemsize
+    with pytest.raises(ValueError): #Released, not pointing at unmapped memory
+        raw[0]
+
+
+def test_close_with_a_records_slice_still_around(database, tmp_path):
+    path = str(tmp_path / "cards.snap")
+    ExportSnapshot(database, path)
+    with Snapshot(path) as snapshot:
+        first = snapshot.records[:3]
+    assert first["id"].tolist() == [card[0] for card in cards(database)[:3]]
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "junk"
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(SnapshotError):
+        Snapshot(str(path))
+
+
+def test_nulls_round_trip(database, empty_database, tmp_path):
+    blank = InsertCard(database, None, None, 7, None, 3)
+    path = str(tmp_path / "cards.snap")
+    ExportSnapshot(database, path)
+    with Snapshot(path) as snapshot:
+        assert snapshot.card(len(snapshot) - 1) == (blank, None, None, 7, None, 3)
+    ImportSnapshot(empty_database, path, keep_ids=True)
+    assert cards(empty_database) == cards(database)
+
+
+def test_stat_that_would_read_back_as_null_is_an_error(database, tmp_path):
+    InsertCard(database, "Big", MISSING_STAT, 1, 1, 1)
+    with pytest.raises(SnapshotError):
+        ExportSnapshot(database, str(tmp_path / "cards.snap"))
+
+
+def test_version_1_files_are_still_read(database, tmp_path):
+    path = tmp_path / "cards.snap"
+    ExportSnapshot(database, str(path))
+    data = bytearray(path.read_bytes())
+    magic, _, record_size, count = HEADER.unpack_from(data)
+    HEADER.pack_into(data, 0, magic, 1, record_size, count)
+    path.write_bytes(bytes(data))
+    with Snapshot(str(path)) as snapshot:
+        assert snapshot.version == 1
+        assert [snapshot.card(index) for index in range(len(snapshot))] == cards(database)
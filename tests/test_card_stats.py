@@ -0,0 +1,50 @@
+import math
+import statistics
+
+import card_search
+from card_pool import get_pool
+from card_stats import CardStatistics, StreamStatistics, aggregate_cards
+from INTERNAL_functions import InsertCard, STATS
+
+
+def test_matches_statistics_by_hand(database):
+    InsertCard(database, "Blank", None, 7, None, 3)
+    cards = get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\"").fetchall()
+    report = CardStatistics(database)
+    for index, stat in enumerate(STATS, start=2):
+        values = sorted(card[index] for card in cards if card[index] is not None)
+        assert report[stat]["count"] == len(values)
+        assert math.isclose(report[stat]["mean"], statistics.fmean(values))
+        assert math.isclose(report[stat]["std"], statistics.pstdev(values), abs_tol=1e-9)
+        assert report[stat]["min"] == values[0]
+        assert report[stat]["max"] == values[-1]
+        assert report[stat]["p50"] == values[math.ceil(len(values) / 2) - 1]
+
+
+def test_stream_statistics_agree_with_sql(database):
+    cards = get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\"").fetchall()
+    sql = CardStatistics(database)
+    stream = StreamStatistics(aggregate_cards(cards))
+    for stat in STATS:
+        for field in ("count", "min", "max", "p25", "p50", "p75"):
+            assert stream[stat][field] == sql[stat][field]
+        assert math.isclose(stream[stat]["mean"], sql[stat]["mean"])
+
+
+def test_schema_is_only_checked_once(database, monkeypatch):
+    CardStatistics(database, speed=(1, 20))
+    calls = []
+    monkeypatch.setattr(card_search, "migrate", lambda DATABASE: calls.append(DATABASE))
+    CardStatistics(database, speed=(1, 20))
+    assert calls == []
+
+
+def test_stream_statistics_skip_nulls_like_sql(database):
+    InsertCard(database, "Blank", None, 7, None, 3)
+    cards = get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\"").fetchall()
+    sql = CardStatistics(database)
+    stream = StreamStatistics(aggregate_cards(cards))
+    for stat in STATS:
+        assert stream[stat]["count"] == sql[stat]["count"]
+        assert math.isclose(stream[stat]["mean"], sql[stat]["mean"])
+        assert math.isclose(stream[stat]["std"], sql[stat]["std"], abs_tol=1e-9)
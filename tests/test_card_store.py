@@ -0,0 +1,74 @@
+import pytest
+
+from card_pool import get_pool
+from card_store import MISSING_STAT, CardStore
+from INTERNAL_functions import InsertCard
+
+
+def test_load_matches_the_database(database):
+    store = CardStore.load(database, page_size=4)
+    rows = get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\" ORDER BY ID").fetchall()
+    assert [card.as_tuple() for card in store] == rows
+
+
+def test_add_keeps_ids_sorted_and_edit_and_remove_work():
+    store = CardStore()
+    store.extend([(1, "A", 1, 2, 3, 4), (5, "E", 5, 5, 5, 5)])
+    store.add(3, "C", 9, 9, 9, 9)
+    assert list(store.ids) == [1, 3, 5]
+    assert store.get(3).name == "C"
+    assert store.edit(3, "Speed", 20)
+    assert store.get(3).speed == 20
+    assert store.remove(1)
+    assert [card.as_tuple() for card in store] == [(3, "C", 9, 20, 9, 9), (5, "E", 5, 5, 5, 5)]
+
+
+@pytest.mark.parametrize("stats", [(1, 2, 3, 256), (-1, 2, 3, 4), (1, "2", 3, 4), (1, 2, 3, MISSING_STAT)])
+def test_bad_stat_in_add_leaves_the_store_untouched(stats):
+    store = CardStore()
+    store.add(1, "A", 1, 2, 3, 4)
+    with pytest.raises(ValueError):
+        store.add(2, "B", *stats)
+    columns = (store.ids, store.strength, store.speed, store.stealth, store.cunning)
+    assert [len(column) for column in columns] == [1] * 5
+    assert len(store._names) == 14
+    assert [card.as_tuple() for card in store] == [(1, "A", 1, 2, 3, 4)]
+
+
+def test_bad_card_in_extend_adds_none_of_the_batch():
+    store = CardStore()
+    with pytest.raises(ValueError):
+        store.extend([(1, "A", 1, 2, 3, 4), (2, "B", 1, 2, 3, 300)])
+    assert len(store) == 0
+    with pytest.raises(ValueError):
+        store.extend([(2, "A", 1, 2, 3, 4), (1, "B", 1, 2, 3, 4)])
+    assert len(store) == 0
+
+
+def test_bad_edit_is_a_value_error():
+    store = CardStore()
+    store.add(1, "A", 1, 2, 3, 4)
+    with pytest.raises(ValueError):
+        store.edit(1, "cunning", 1000)
+    assert store.get(1).cunning == 4
+
+
+def test_nulls_load_and_come_back_as_none(database):
+    blank = InsertCard(database, None, None, 7, None, 3)
+    store = CardStore.load(database)
+    assert store.get(blank).as_tuple() == (blank, None, None, 7, None, 3)
+    assert store.column("strength")[store.index_of(blank)] == MISSING_STAT
+    assert store.edit(blank, "speed", None)
+    assert store.get(blank).speed is None
+
+
+def test_setters_check_the_value():
+    store = CardStore()
+    card = store.add(1, "A", 1, 2, 3, 4)
+    with pytest.raises(ValueError):
+        card.strength = 300
+    with pytest.raises(ValueError):
+        card.speed = -1
+    card.stealth = None
+    card.cunning = 20
+    assert card.as_tuple() == (1, "A", 1, 2, None, 20)
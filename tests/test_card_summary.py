@@ -0,0 +1,89 @@
+import math
+import sqlite3
+
+from card_pool import get_pool
+from card_stats import CardStatistics
+from card_summary import (CardSummary, SUMMARY_TABLE, check_summary, drop_summary, install_summary,
+                          summary_installed)
+from INTERNAL_functions import BatchEditCards, DeleteCard, InsertCard, STATS
+
+
+def scan(database):
+    #CardStatistics the slow way, with the summary out of the picture
+    drop_summary(database)
+    try:
+        return CardStatistics(database)
+    finally:
+        install_summary(database)
+
+
+def assert_same(summary, scanned):
+    for stat in STATS:
+        for field, value in scanned[stat].items():
+            if isinstance(value, float):
+                assert math.isclose(summary[stat][field], value, abs_tol=1e-9), (stat, field)
+            else:
+                assert summary[stat][field] == value, (stat, field)
+
+
+def test_triggers_leave_null_stats_out(database):
+    install_summary(database)
+    blank = InsertCard(database, "Blank", None, 7, None, 3)
+    InsertCard(database, "Partial", 4, None, 9, None)
+    BatchEditCards(database, [blank], {"strength": 12}) #NULL -> value
+    BatchEditCards(database, [1], {"speed": None}) #value -> NULL
+    DeleteCard(database, 2)
+    assert check_summary(database) == []
+    assert_same(CardSummary(database), scan(database))
+
+
+def test_all_null_stat_has_no_mean(empty_database):
+    install_summary(empty_database)
+    InsertCard(empty_database, "Blank", None, 5, 5, 5)
+    report = CardSummary(empty_database)
+    assert report["strength"]["count"] == 0
+    assert report["strength"]["mean"] is None
+    assert report["speed"]["count"] == 1
+    assert report["speed"]["mean"] == 5
+
+
+def test_check_summary_inside_a_transaction(database):
+    install_summary(database)
+    connection = get_pool(database).connection()
+    connection.execute("BEGIN")
+    connection.execute("INSERT INTO \"Monster Cards\" (name, strength, speed, stealth, cunning) VALUES ('Held', 1, 1, 1, 1)")
+    assert check_summary(database) == []
+    assert connection.in_transaction #Still the caller's to commit or roll back
+    connection.rollback()
+    assert check_summary(database) == []
+
+
+def test_dropped_by_another_program(database):
+    install_summary(database)
+    assert summary_installed(database)
+    other = sqlite3.connect(database)
+    other.execute(f"DROP TABLE \"{SUMMARY_TABLE}\"")
+    other.commit()
+    other.close()
+    assert not summary_installed(database)
+    assert CardStatistics(database)["speed"]["count"] > 0 #Falls back to reading the cards
+    #The triggers it left behind are gone too, or every write would fail with "no such table"
+    monster_id = InsertCard(database, "After", 1, 2, 3, 4)
+    BatchEditCards(database, [monster_id], {"speed": 5})
+    DeleteCard(database, monster_id)
+    install_summary(database)
+    assert check_summary(database) == []
+
+
+def test_older_summary_is_upgraded(database):
+    install_summary(database)
+    other = sqlite3.connect(database)
+    other.execute(f"DROP TABLE \"{SUMMARY_TABLE}\"")
+    other.execute(f"CREATE TABLE \"{SUMMARY_TABLE}\" (id INTEGER PRIMARY KEY CHECK (id = 1), cards INTEGER NOT NULL, "
+                  + ", ".join(f"{stat}_sum INTEGER NOT NULL, {stat}_squares INTEGER NOT NULL" for stat in STATS) + ")")
+    other.commit()
+    other.close()
+    assert not summary_installed(database)
+    install_summary(database)
+    assert summary_installed(database)
+    assert check_summary(database) == []
@@ -0,0 +1,93 @@
+import random
+from bisect import bisect_left
+
+import pytest
+
+from card_pool import get_pool
+from card_viewer import LAST_ID, CardWindow, parse_id
+
+
+@pytest.fixture
+def cards(empty_database):
+    #40 cards with gaps in the IDs
+    ids = sorted(random.Random(1).sample(range(1, 200), 40))
+    connection = get_pool(empty_database).connection()
+    connection.executemany("INSERT INTO \"Monster Cards\" VALUES (?, 'Card', 1, 2, 3, 4)", [(i,) for i in ids])
+    connection.commit()
+    return empty_database, ids
+
+
+def visible_ids(window):
+    return [card[0] for card in window.visible()]
+
+
+def test_matches_a_simple_model(cards):
+    #The window should always show ids[first:first + height], first moving the obvious way
+    database, ids = cards
+    height, margin = 5, 3
+    window = CardWindow(database, height, margin)
+    first = 0
+    last_first = len(ids) - height
+    rng = random.Random(2)
+    for _ in range(300):
+        action = rng.choice(["scroll", "scroll", "jump", "home", "end"])
+        if action == "scroll":
+            delta = rng.choice([1, -1, height, -height, 17, -17])
+            window.scroll(delta)
+            first = max(0, min(first + delta, last_first))
+        elif action == "jump":
+            target = rng.randint(0, 210)
+            window.jump(target)
+            first = min(bisect_left(ids, target), last_first)
+        elif action == "home":
+            window.home()
+            first = 0
+        else:
+            window.end()
+            first = last_first
+        assert visible_ids(window) == ids[first:first + height], action
+        assert len(window.rows) <= height + 2 * margin #Never holds more than the screen and its margins
+
+
+def test_resize_keeps_the_first_card(cards):
+    database, ids = cards
+    window = CardWindow(database, 5)
+    window.scroll(7)
+    window.resize(10)
+    assert visible_ids(window) == ids[7:17]
+    window.resize(3)
+    assert visible_ids(window) == ids[7:10]
+
+
+def test_fewer_cards_than_the_screen(empty_database):
+    connection = get_pool(empty_database).connection()
+    connection.executemany("INSERT INTO \"Monster Cards\" VALUES (?, 'Card', 1, 2, 3, 4)", [(3,), (8,)])
+    connection.commit()
+    window = CardWindow(empty_database, 10)
+    assert visible_ids(window) == [3, 8]
+    for move in (lambda: window.scroll(1), lambda: window.scroll(-5), window.end, lambda: window.jump(50)):
+        move()
+        assert visible_ids(window) == [3, 8]
+
+
+def test_empty_table(empty_database):
+    window = CardWindow(empty_database, 10)
+    window.scroll(3)
+    window.end()
+    window.jump(LAST_ID)
+    assert window.visible() == []
+
+
+def test_parse_id():
+    assert parse_id(" 42 ") == 42
+    assert parse_id(str(LAST_ID)) == LAST_ID
+    assert parse_id("99999999999999999999") is None #Too big for SQLite
+    for text in ("", "-1", "4.5", "abc", "²"):
+        assert parse_id(text) is None
+
+
+def test_jump_to_the_biggest_id(cards):
+    database, ids = cards
+    window = CardWindow(database, 5)
+    window.jump(parse_id(str(LAST_ID)))
+    assert visible_ids(window) == ids[-5:]
@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+from concurrent.futures import wait
+
+import pytest
+
+from card_pool import get_pool
+from card_writer import WriteQueue, get_write_queue
+
+
+def count(path):
+    return get_pool(path).connection().execute("SELECT COUNT(*) FROM \"Monster Cards\"").fetchone()[0]
+
+
+def test_batched_writes_resolve_and_land(empty_database):
+    with WriteQueue(empty_database, max_batch=50, max_delay_ms=20) as writes:
+        futures = [writes.insert(f"Imp{number}", 1, 2, 3, 4) for number in range(200)]
+        ids = [future.result(10) for future in futures]
+        assert sorted(ids) == list(range(1, 201))
+        assert writes.edit(ids[0], {"Speed": 9}).result(10) == 1
+        assert writes.delete(ids[1]).result(10) == 1
+        assert writes.delete(999999).result(10) == 0
+    assert count(empty_database) == 199
+    assert writes.stats()["batches"] < 200
+
+
+def test_one_bad_write_only_fails_itself(empty_database):
+    with WriteQueue(empty_database, max_delay_ms=50) as writes:
+        good = writes.insert("Imp", 1, 2, 3, 4)
+        bad = writes.submit(lambda connect: connect.execute("INSERT INTO nowhere VALUES (1)"))
+        also_good = writes.insert("Orc", 1, 2, 3, 4)
+        assert good.result(10) and also_good.result(10)
+        with pytest.raises(sqlite3.OperationalError):
+            bad.result(10)
+    assert count(empty_database) == 2
+
+
+def test_submit_racing_close_never_hangs(empty_database):
+    for _ in range(20):
+        writes = WriteQueue(empty_database, max_delay_ms=0.1)
+        futures = []
+        rejected = []
+        start = threading.Event()
+
+        def submitter():
+            start.wait()
+            for number in range(50):
+                try:
+                    futures.append(writes.insert("Racer", 1, 1, 1, 1))
+                except RuntimeError:
+                    rejected.append(number)
+                    return
+
+        threads = [threading.Thread(target=submitter) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        writes.close()
+        for thread in threads:
+            thread.join()
+        done, not_done = wait(futures, timeout=10)
+        assert not not_done #Every accepted write was answered
+        assert writes.closed
+
+
+def test_flush_after_close_returns(empty_database):
+    writes = WriteQueue(empty_database)
+    writes.insert("Imp", 1, 2, 3, 4)
+    writes.close()
+    writes.flush(5)
+    with pytest.raises(RuntimeError):
+        writes.insert("Late", 1, 2, 3, 4)
+
+
+def test_shared_queue_is_replaced_once_closed(empty_database):
+    first = get_write_queue(empty_database)
+    assert get_write_queue(empty_database) is first
+    first.close()
+    second = get_write_queue(empty_database)
+    assert second is not first and not second.closed
+    second.close()
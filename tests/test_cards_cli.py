@@ -0,0 +1,69 @@
+import io
+import json
+
+from cards_cli import run
+from INTERNAL_functions import GetCard
+
+
+def records(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_list(database, capsys):
+    assert run(["--db", database, "list", "--limit", "3", "--page-size", "2"]) == 0
+    assert [card["id"] for card in records(capsys.readouterr().out)] == [1, 2, 3]
+
+
+def test_list_tsv(database, capsys):
+    assert run(["--db", database, "--format", "tsv", "list", "--limit", "2"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "id\tname\tstrength\tspeed\tstealth\tcunning"
+    assert len(lines) == 3
+
+
+def test_add_edit_remove(database, capsys):
+    assert run(["--db", database, "add", "Imp", "1", "2", "3", "4"]) == 0
+    monster_id = records(capsys.readouterr().out)[0]["id"]
+    assert GetCard(database, monster_id)[1:] == ("Imp", 1, 2, 3, 4)
+    assert run(["--db", database, "edit", str(monster_id), "--speed", "9"]) == 0
+    assert records(capsys.readouterr().out) == [{"ok": True, "changed": 1}]
+    assert GetCard(database, monster_id)[3] == 9
+    assert run(["--db", database, "remove", str(monster_id)]) == 0
+    assert records(capsys.readouterr().out) == [{"ok": True, "removed": 1}]
+    assert GetCard(database, monster_id) is None
+
+
+def test_exit_codes(database, capsys):
+    assert run(["--db", database, "add", "Imp", "1", "2", "3", "99"]) == 1 #Invalid card
+    assert run(["--db", database, "get", "999999"]) == 1 #No such card
+    assert run(["--db", database, "edit", "1"]) == 1 #Nothing to change
+    assert run(["--db", database, "edit", "1", "--speed", "99"]) == 2 #argparse rejects it
+    assert run(["--db", database, "nosuch"]) == 2
+    assert "no card with ID 999999" in capsys.readouterr().err
+
+
+def test_search(database, capsys):
+    assert run(["--db", database, "search", "--min-speed", "10", "--order-by", "speed", "--desc"]) == 0
+    speeds = [card["speed"] for card in records(capsys.readouterr().out)]
+    assert speeds and all(speed >= 10 for speed in speeds)
+    assert speeds == sorted(speeds, reverse=True)
+
+
+def test_batch_keeps_going_after_a_bad_line(database, capsys, monkeypatch):
+    lines = ("# a comment\n"
+             "add 'Unclosed 1 2 3 4\n" #shlex can't split this
+             "add Imp 1 2 3 4\n"
+             "get 999999\n"
+             "add Gob 4 3 2 1\n")
+    monkeypatch.setattr("sys.stdin", io.StringIO(lines))
+    assert run(["--db", database, "batch"]) == 1
+    captured = capsys.readouterr()
+    assert len(records(captured.out)) == 2 #Both adds ran
+    assert "line 2: No closing quotation" in captured.err
+    assert "2 command(s) failed" in captured.err
+
+
+def test_batch_success(database, capsys, monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("get 1\n\nget 2\n"))
+    assert run(["--db", database, "batch"]) == 0
+    assert [card["id"] for card in records(capsys.readouterr().out)] == [1, 2]
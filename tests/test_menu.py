@@ -0,0 +1,55 @@
+import pytest
+
+import Main
+from Main import MENU_OPTIONS, MENU_STATES, SCREENS, build_menu
+
+
+def run_menu(monkeypatch, answers, results=None):
+    #Runs Main.main with every option screen swapped for one that records it was shown,
+    #the home page is the real one reading the answers in order
+    answers = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    shown = []
+    for state in MENU_STATES:
+        if state in SCREENS:
+            def screen(state=state):
+                shown.append(state)
+                return (results or {}).get(state, "menu")
+            monkeypatch.setitem(SCREENS, state, screen)
+    Main.main()
+    assert next(answers, None) is None #Every answer was used
+    return shown
+
+
+def test_every_state_has_a_screen_and_leads_home():
+    machine = build_menu()
+    assert machine.state == "menu"
+    for state in MENU_STATES:
+        assert machine.can_transition(state)
+        if state != "exit":
+            assert state in SCREENS
+    for state in MENU_STATES:
+        machine.set_state(state)
+        assert machine.can_transition("menu") or state == "exit"
+
+
+@pytest.mark.parametrize("option", [option for option, state in MENU_OPTIONS.items() if state != "exit"])
+def test_every_option_reaches_its_screen(monkeypatch, capsys, option):
+    assert run_menu(monkeypatch, [option, "5"]) == [MENU_OPTIONS[option]]
+
+
+@pytest.mark.parametrize("option", ["5", "Exit", "exit"])
+def test_exit(monkeypatch, capsys, option):
+    assert run_menu(monkeypatch, [option]) == []
+
+
+def test_invalid_input_stays_on_the_home_page(monkeypatch, capsys):
+    assert run_menu(monkeypatch, ["nonsense", "", "0", "11", "7", "5"]) == ["search"]
+    machine = build_menu()
+    assert not machine.transition("nonsense")
+    assert machine.state == "menu"
+
+
+def test_only_display_can_end_the_program(monkeypatch, capsys):
+    #Any other screen asking for "exit" is sent back to the home page
+    assert run_menu(monkeypatch, ["2", "1"], {"add": "exit", "display": "exit"}) == ["add", "display"]
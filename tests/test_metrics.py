@@ -0,0 +1,55 @@
+import math
+import random
+
+import pytest
+
+from config2 import Histogram, MetricsCollector
+
+
+def test_histogram_percentiles_are_within_precision():
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(12, 2)) for _ in range(20_000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for percent in (1, 50, 90, 99, 99.9):
+        exact = values[max(1, math.ceil(percent / 100 * len(values))) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=1 / 2 ** histogram.precision)
+    assert histogram.min == values[0]
+    assert histogram.max == values[-1]
+
+
+def test_merged_histograms_match_one_big_one():
+    left, right, both = Histogram(), Histogram(), Histogram()
+    for value in range(0, 100_000, 7):
+        (left if value % 2 else right).record(value)
+        both.record(value)
+    left.merge(right)
+    assert left._counts == both._counts
+    assert (left.count, left.total, left.min, left.max) == (both.count, both.total, both.min, both.max)
+
+
+def test_trace_times_calls_and_counts_errors():
+    metrics = MetricsCollector(enabled=True)
+
+    @metrics.trace("work")
+    def work(fail):
+        if fail:
+            raise ValueError("no")
+        return 1
+
+    assert work(False) == 1
+    with pytest.raises(ValueError):
+        work(True)
+    assert metrics.histogram("work").count == 2
+    assert metrics.counter("work.errors") == 1
+    assert metrics.snapshot()["timings"]["work"]["count"] == 2
+
+
+def test_disabled_collector_records_nothing():
+    metrics = MetricsCollector(enabled=False)
+    with metrics.timed("block"):
+        pass
+    metrics.trace("call")(lambda: None)()
+    assert metrics.snapshot()["timings"] == {}
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+from card_pool import get_pool
+from INTERNAL_functions import TABLE_BOTTOM, TABLE_TOP, CardPages, DisplayCards, FormatCard, InsertCard
+
+
+def all_cards(database):
+    return get_pool(database).connection().execute("SELECT * FROM \"Monster Cards\" ORDER BY ID").fetchall()
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 4, 1000])
+def test_pages_cover_every_card_once(database, page_size):
+    pages = list(CardPages(database, page_size))
+    assert [card for page in pages for card in page] == all_cards(database)
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= page_size
+
+
+def test_exact_multiple_of_the_page_size(empty_database):
+    for number in range(6):
+        InsertCard(empty_database, f"Card {number}", 1, 2, 3, 4)
+    pages = list(CardPages(empty_database, 3))
+    assert [len(page) for page in pages] == [3, 3] #No empty page on the end
+
+
+def test_start_id_and_gaps_in_ids(empty_database):
+    connection = get_pool(empty_database).connection()
+    connection.executemany("INSERT INTO \"Monster Cards\" VALUES (?, 'Card', 1, 2, 3, 4)",
+                           [(monster_id,) for monster_id in (2, 3, 10, 11, 50, 51, 52)])
+    connection.commit()
+    assert [[card[0] for card in page] for page in CardPages(empty_database, 2)] == [[2, 3], [10, 11], [50, 51], [52]]
+    assert [card[0] for page in CardPages(empty_database, 2, start_id=11) for card in page] == [11, 50, 51, 52]
+    assert [card[0] for page in CardPages(empty_database, 2, start_id=4) for card in page] == [10, 11, 50, 51, 52]
+    assert list(CardPages(empty_database, 2, start_id=53)) == []
+
+
+def test_empty_table(empty_database):
+    assert list(CardPages(empty_database)) == []
+    out = io.StringIO()
+    DisplayCards(DATABASE=empty_database, out=out)
+    assert out.getvalue() == TABLE_TOP + TABLE_BOTTOM
+
+
+def test_display_without_paginate_never_asks(database, monkeypatch):
+    def no_input(prompt):
+        raise AssertionError("paginate=False must not ask")
+
+    monkeypatch.setattr("builtins.input", no_input)
+    out = io.StringIO()
+    DisplayCards(page_size=2, DATABASE=database, out=out)
+    assert out.getvalue() == TABLE_TOP + "".join(map(FormatCard, all_cards(database))) + TABLE_BOTTOM
+
+
+def test_display_paginate_stops_on_q(database, monkeypatch):
+    answers = iter(["", "q"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    out = io.StringIO()
+    DisplayCards(page_size=2, paginate=True, DATABASE=database, out=out)
+    shown = all_cards(database)[:4] #Two pages, then q
+    assert out.getvalue() == TABLE_TOP + "".join(map(FormatCard, shown)) + TABLE_BOTTOM
@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+
+from card_pool import get_pool
+from INTERNAL_functions import BatchEditCards, EditCards, GetCard, StagedEdits
+
+
+def stored(database, monstersID):
+    #Straight from the database, not the card cache
+    connection = sqlite3.connect(database)
+    try:
+        return connection.execute("SELECT * FROM \"Monster Cards\" WHERE ID = ?", (monstersID,)).fetchone()
+    finally:
+        connection.close()
+
+
+def test_nothing_is_written_until_apply(database):
+    before = stored(database, 1)
+    edits = StagedEdits(database)
+    edits.stage(1, "Speed", 20)
+    edits.stage(1, "cunning", 1)
+    assert stored(database, 1) == before
+    assert edits.apply() == 1
+    assert stored(database, 1)[3] == 20 and stored(database, 1)[5] == 1
+    assert GetCard(database, 1)[3] == 20 #The cached copy was dropped
+    assert edits.pending == {}
+
+
+def test_diff_shows_old_and_new_values(database):
+    card = GetCard(database, 1)
+    edits = StagedEdits(database)
+    edits.stage(1, "speed", 20)
+    edits.stage(999999, "speed", 5)
+    assert edits.diff().splitlines() == [
+        f"ID 1 ({card[1]}): speed {card[3]} -> 20",
+        "ID 999999: no card with that ID, nothing will change",
+    ]
+
+
+def test_bad_stat_is_refused_when_staged(database):
+    with pytest.raises(ValueError):
+        StagedEdits(database).stage(1, "luck", 3)
+
+
+def test_discard_writes_nothing(database):
+    before = stored(database, 1)
+    edits = StagedEdits(database)
+    edits.stage(1, "speed", 20)
+    edits.discard()
+    assert edits.apply() == 0
+    assert stored(database, 1) == before
+
+
+def test_failed_batch_rolls_back_every_edit(database):
+    connection = get_pool(database).connection()
+    connection.execute("CREATE TRIGGER refuse BEFORE UPDATE ON \"Monster Cards\" WHEN NEW.ID = 3 "
+                       "BEGIN SELECT RAISE(ABORT, 'refused'); END")
+    connection.commit()
+    before = [stored(database, monstersID) for monstersID in (1, 2, 3)]
+    edits = StagedEdits(database)
+    edits.stage(1, "strength", 20) #A different statement from the one that fails
+    edits.stage(2, "speed", 20)
+    edits.stage(3, "speed", 20)
+    with pytest.raises(sqlite3.IntegrityError):
+        edits.apply()
+    assert [stored(database, monstersID) for monstersID in (1, 2, 3)] == before
+
+
+def test_batch_edit_is_one_transaction(database):
+    statements = []
+    connection = get_pool(database).connection()
+    connection.set_trace_callback(statements.append)
+    try:
+        assert BatchEditCards(database, [1, 2, 3, 999999], {"speed": 7, "stealth": 8}) == 3
+    finally:
+        connection.set_trace_callback(None)
+    assert sum(statement.startswith("BEGIN") for statement in statements) == 1
+    assert sum(statement == "COMMIT" for statement in statements) == 1
+    assert all(stored(database, monstersID)[3:5] == (7, 8) for monstersID in (1, 2, 3))
+
+
+@pytest.mark.parametrize("answer, changed", [("y", True), ("n", False)])
+def test_edit_cards_asks_first(database, monkeypatch, capsys, answer, changed):
+    before = stored(database, 1)
+    monkeypatch.setattr("builtins.input", lambda prompt: answer)
+    EditCards(database, 1, "speed", 19)
+    assert (stored(database, 1)[3] == 19) == changed
+    if not changed:
+        assert stored(database, 1) == before
+    output = capsys.readouterr().out
+    assert "speed" in output and "-> 19" in output
+    assert ("All changes have been commited" if changed else "nothing commited") in output
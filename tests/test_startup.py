@@ -0,0 +1,22 @@
+from benchmarks.importtime import LAZY_MODULES, measure_imports
+from state_machine import StateMachine
+
+
+def test_menu_imports_nothing_it_can_do_without():
+    imports = measure_imports("Main")
+    assert [name for name in LAZY_MODULES if name in imports] == []
+
+
+def test_state_machine_only_follows_its_transitions():
+    machine = StateMachine()
+    machine.add_state("home", ["search"])
+    machine.add_state("search", ["home"])
+    machine.set_state("home")
+    assert not machine.transition("home")
+    assert machine.transition("search")
+    assert machine.state == "search"
+
+
+def test_config2_still_exports_state_machine():
+    import config2
+    assert config2.StateMachine is StateMachine
@@ -0,0 +1,52 @@
+import pickle
+
+import numpy as np
+import pytest
+
+import tournament
+from tournament import RunTournaments, _Tally, _chunks
+
+
+def test_counts_add_up(database):
+    count, size = 200, 8
+    totals = RunTournaments(database, count, "bracket", size, seed=3, workers=1)
+    assert totals["titles"].sum() == count
+    assert totals["wins"].sum() == count * (size - 1) #Every match has one winner
+    assert totals["matches"].sum() == count * (2 * size - 2) #Both sides of every match
+
+
+def test_results_do_not_depend_on_how_the_work_is_split(database):
+    for kind in ("bracket", "round-robin"):
+        first = RunTournaments(database, 120, kind, 4, rounds=2, seed=11, workers=1, chunk_size=1)
+        second = RunTournaments(database, 120, kind, 4, rounds=2, seed=11, workers=2, chunk_size=25)
+        for key in ("titles", "wins", "matches"):
+            assert np.array_equal(first[key], second[key])
+
+
+def test_chunks_are_ranges():
+    chunks = list(_chunks(10, 4))
+    assert chunks == [range(0, 4), range(4, 8), range(8, 10)]
+
+
+def test_chunk_results_stay_small_with_many_cards(monkeypatch):
+    stats = np.random.default_rng(0).integers(1, 21, size=(500_000, 4), dtype=np.int64)
+    monkeypatch.setattr(tournament, "_stats", stats)
+    result = tournament._run_chunk(range(50), 0, "bracket", 8, 1)
+    assert len(pickle.dumps(result)) < 50_000 #A dense result would be 3 x 4 MB
+    assert result["titles"][1].sum() == 50
+
+
+def test_tally_sums_repeated_indices():
+    tally = _Tally()
+    tally.add("wins", np.array([3, 1]))
+    tally.add("wins", np.array([3]), 5)
+    indices, amounts = tally.sparse()["wins"]
+    assert indices.tolist() == [1, 3]
+    assert amounts.tolist() == [1, 6]
+
+
+def test_too_few_entrants_is_an_error(database):
+    for kind in tournament.KINDS:
+        for size in (-1, 0, 1):
+            with pytest.raises(ValueError, match="at least 2 entrants"):
+                RunTournaments(database, 10, kind, size, workers=1)
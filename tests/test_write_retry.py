@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from card_import import ImportCards
+from card_pool import BUSY_TIMEOUT_MS, get_pool
+from card_snapshot import ExportSnapshot, ImportSnapshot
+from config2 import RetryPolicy
+from INTERNAL_functions import WRITE_DEADLINE_SECONDS, WRITE_RETRY, InsertCard
+
+
+def locked(path, seconds):
+    #Another program holding the write lock for a while (longer than one busy_timeout)
+    get_pool(path).connection() #WAL mode is switched on first
+    ready = threading.Event()
+
+    def hold():
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.execute("BEGIN IMMEDIATE")
+        ready.set()
+        time.sleep(seconds)
+        connection.execute("ROLLBACK")
+        connection.close()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    ready.wait()
+    return thread
+
+
+def count(path):
+    return get_pool(path).connection().execute("SELECT COUNT(*) FROM \"Monster Cards\"").fetchone()[0]
+
+
+def test_import_waits_out_a_locked_database(empty_database, tmp_path):
+    path = tmp_path / "cards.csv"
+    path.write_text("name,strength,speed,stealth,cunning\nImp,1,2,3,4\nOrc,5,6,7,8\n")
+    holder = locked(empty_database, BUSY_TIMEOUT_MS / 1000 + 0.3)
+    report = ImportCards(empty_database, str(path))
+    holder.join()
+    assert report["inserted"] == 2
+    assert count(empty_database) == 2
+
+
+def test_snapshot_import_waits_out_a_locked_database(database, empty_database, tmp_path):
+    path = str(tmp_path / "cards.snap")
+    exported = ExportSnapshot(database, path)
+    holder = locked(empty_database, BUSY_TIMEOUT_MS / 1000 + 0.3)
+    assert ImportSnapshot(empty_database, path) == exported
+    holder.join()
+    assert count(empty_database) == exported
+
+
+def test_deadline_includes_the_last_attempts_busy_wait():
+    assert WRITE_RETRY.deadline_seconds + BUSY_TIMEOUT_MS / 1000 <= WRITE_DEADLINE_SECONDS
+
+
+def test_retry_gives_up_at_the_deadline():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    def busy():
+        now[0] += 1 #Each attempt waits out a one second busy_timeout
+        raise sqlite3.OperationalError("database is locked")
+
+    policy = RetryPolicy(max_attempts=100, delay_seconds=0.5, max_delay=2, deadline_seconds=5,
+                         sleep=sleep, clock=lambda: now[0])
+    with pytest.raises(sqlite3.OperationalError):
+        policy.execute(busy)
+    assert now[0] <= 5 + 1
+    assert policy.stats()["gave_up"] == 1
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise sqlite3.IntegrityError("UNIQUE constraint failed")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        RetryPolicy(max_attempts=5, delay_seconds=0, sleep=lambda seconds: None).execute(broken)
+    assert calls == [1]
+
+
+def test_insert_card(empty_database):
+    assert InsertCard(empty_database, "Imp", 1, 2, 3, 4) == 1
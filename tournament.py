@@ -0,0 +1,193 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from battle import load_stats
+from INTERNAL_functions import DATABASE
+
+KINDS = ("bracket", "round-robin")
+COUNTS = ("titles", "wins", "matches")
+
+Sparse = Dict[str, Tuple[np.ndarray, np.ndarray]] #count -> (card indices, how much each one gets)
+
+#Set in each worker by _attach, the card stats live in shared memory so no task ever pickles them
+_shm: Optional[shared_memory.SharedMemory] = None
+_stats: Optional[np.ndarray] = None
+
+
+def _attach(name: str, shape: Tuple[int, int], dtype: str) -> None:
+    global _shm, _stats
+    _shm = shared_memory.SharedMemory(name=name)
+    _stats = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+
+
+class _Tally:
+    #A chunk only ever touches the cards it drew, so instead of a full length array per count it keeps
+    #(indices, amounts) pieces and sums them at the end. What goes back to the parent is a few KB per chunk,
+    #however many cards there are
+    def __init__(self) -> None:
+        self.pieces: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {key: [] for key in COUNTS}
+
+    def add(self, key: str, indices: np.ndarray, amounts: object = 1) -> None:
+        indices = np.atleast_1d(indices)
+        self.pieces[key].append((indices, np.broadcast_to(np.asarray(amounts, dtype=np.int64), indices.shape)))
+
+    def sparse(self) -> Sparse:
+        result: Sparse = {}
+        for key, pieces in self.pieces.items():
+            if not pieces:
+                result[key] = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+                continue
+            indices = np.concatenate([piece[0] for piece in pieces])
+            amounts = np.concatenate([piece[1] for piece in pieces])
+            unique, inverse = np.unique(indices, return_inverse=True)
+            sums = np.zeros(len(unique), dtype=np.int64)
+            np.add.at(sums, inverse, amounts)
+            result[key] = (unique, sums)
+        return result
+
+
+def _bracket(stats: np.ndarray, rng: np.random.Generator, size: int, tally: _Tally) -> None:
+    #Single elimination, every match is fought on one stat picked at random, a tie is a coin flip
+    alive = rng.choice(len(stats), size=size, replace=False)
+    while len(alive) > 1:
+        left, right = alive[0::2], alive[1::2]
+        picks = rng.integers(0, stats.shape[1], size=len(left))
+        a = stats[left, picks]
+        b = stats[right, picks]
+        left_wins = (a > b) | ((a == b) & (rng.random(len(left)) < 0.5))
+        winners = np.where(left_wins, left, right)
+        tally.add("wins", winners)
+        tally.add("matches", alive)
+        alive = winners
+    tally.add("titles", alive[0])
+
+
+def _round_robin(stats: np.ndarray, rng: np.random.Generator, size: int, rounds: int, tally: _Tally) -> None:
+    #Everyone plays everyone `rounds` times on random stats, most wins takes the title (ties split at random)
+    entrants = rng.choice(len(stats), size=size, replace=False)
+    field = stats[entrants]
+    wins = np.zeros(size, dtype=np.int64)
+    upper = np.triu(np.ones((size, size), dtype=bool), k=1)
+    for _ in range(rounds):
+        picks = rng.integers(0, stats.shape[1], size=(size, size))
+        a = field[np.arange(size)[:, None], picks]
+        b = field[np.arange(size)[None, :], picks]
+        row_wins = (a > b) | ((a == b) & (rng.random((size, size)) < 0.5))
+        row_wins &= upper
+        col_wins = ~row_wins & upper
+        wins += row_wins.sum(axis=1) + col_wins.sum(axis=0)
+    tally.add("wins", entrants, wins)
+    tally.add("matches", entrants, rounds * (size - 1))
+    leaders = np.flatnonzero(wins == wins.max())
+    tally.add("titles", entrants[rng.choice(leaders)])
+
+
+def _run_chunk(tournaments: range, seed: int, kind: str, size: int, rounds: int) -> Sparse:
+    stats = _stats
+    tally = _Tally()
+    for number in tournaments:
+        #Each tournament gets its own stream from (seed, number), so results don't depend on
+        #how the work was split up or how many workers there were
+        rng = np.random.default_rng([seed, number])
+        if kind == "bracket":
+            _bracket(stats, rng, size, tally)
+        else:
+            _round_robin(stats, rng, size, rounds, tally)
+    return tally.sparse()
+
+
+def _merge(totals: Dict[str, np.ndarray], result: Sparse) -> None:
+    for key, (indices, amounts) in result.items():
+        totals[key][indices] += amounts #The indices are unique, so plain fancy indexing is safe
+
+
+def _chunks(count: int, chunk_size: int) -> Iterator[range]:
+    #Tournament numbers a chunk at a time, a range pickles as three numbers however long it is
+    for start in range(0, count, chunk_size):
+        yield range(start, min(start + chunk_size, count))
+
+
+def _run_in_process(initargs: Tuple, chunks: Iterable[range], seed: int, kind: str, size: int,
+                    rounds: int) -> List[Sparse]:
+    #Same work as the pool does, without starting any processes
+    global _shm, _stats
+    _attach(*initargs)
+    try:
+        return [_run_chunk(chunk, seed, kind, size, rounds) for chunk in chunks]
+    finally:
+        _stats = None
+        _shm.close()
+        _shm = None
+
+
+def RunTournaments(
+    DATABASE: str,
+    count: int = 1000,
+    kind: str = "bracket",
+    size: int = 8,
+    rounds: int = 1,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    if size < 2:
+        raise ValueError(f"a tournament needs at least 2 entrants, not {size}")
+    if kind == "bracket" and size & (size - 1):
+        raise ValueError("a bracket needs a power of two entrants")
+    ids, stats, _ = load_stats(DATABASE) #Cards with a NULL stat don't enter
+    if size > len(stats):
+        raise ValueError(f"only {len(stats)} cards, can't have {size} entrants")
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, count // (workers * 4)) #A few chunks per worker keeps them all busy
+    totals = {key: np.zeros(len(stats), dtype=np.int64) for key in COUNTS}
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, stats.nbytes))
+    try:
+        np.ndarray(stats.shape, dtype=stats.dtype, buffer=shm.buf)[:] = stats
+        initargs = (shm.name, stats.shape, stats.dtype.str)
+        chunks = _chunks(count, chunk_size)
+        if workers == 1:
+            results = _run_in_process(initargs, chunks, seed, kind, size, rounds)
+            for result in results:
+                _merge(totals, result)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=initargs) as pool:
+                futures = [pool.submit(_run_chunk, chunk, seed, kind, size, rounds) for chunk in chunks]
+                for future in as_completed(futures): #Merged as each chunk finishes, not all at the end
+                    _merge(totals, future.result())
+    finally:
+        shm.close()
+        shm.unlink()
+    totals["id"] = ids
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run lots of random tournaments between the cards")
+    parser.add_argument("--db", default=DATABASE)
+    parser.add_argument("--kind", choices=KINDS, default="bracket")
+    parser.add_argument("--count", type=int, default=1000, help="how many tournaments")
+    parser.add_argument("--size", type=int, default=8, help="entrants per tournament")
+    parser.add_argument("--rounds", type=int, default=1, help="round-robin only: games per pair")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+    totals = RunTournaments(args.db, args.count, args.kind, args.size, args.rounds, args.seed, args.workers)
+    order = np.argsort(-totals["titles"], kind="stable")[:args.top]
+    print("ID\ttitles\twins\tmatches")
+    for index in order:
+        print(f"{totals['id'][index]}\t{totals['titles'][index]}\t{totals['wins'][index]}\t{totals['matches'][index]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())